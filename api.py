@@ -0,0 +1,854 @@
+from functools import wraps
+import logging
+import os
+import re
+import time
+from datetime import date
+
+from flask import Response, request, jsonify, g, stream_with_context
+from sqlalchemy import insert
+
+from app import app, csrf, db
+from models import User, Calculation, Job, ProductScenario, Shipment, ShipmentItem
+from routes import (tax_calculator, currency_service, rate_store, benefit_engine, analytics_rollup,
+                    freight_estimator, export_calculations, export_response)
+from services.calculation_export import CalculationExporter
+from services.batch_executor import BatchExecutor
+from services.freight_estimator import FreightEstimator
+from services.job_queue import JobQueue
+from services.risk_simulation import RiskSimulation
+from services.scenario_repricing import ScenarioRepricer
+from services.scenario_sweep import ScenarioSweep
+from services.shipment_costing import ShipmentCosting
+from services.tax_benefits import TaxBenefitEngine
+from services.tax_calculator import BenefitContext
+
+scenario_sweep = ScenarioSweep(tax_calculator, freight_estimator)
+risk_simulation = RiskSimulation(tax_calculator)
+scenario_repricer = ScenarioRepricer(tax_calculator, currency_service)
+shipment_costing = ShipmentCosting(tax_calculator, freight_estimator)
+job_queue = JobQueue()
+
+# Sorteios por requisição síncrona (simulações maiores via tarefa risk_simulation)
+API_MAX_DRAWS = 200_000
+# Itens por tarefa de cotação em lote
+BATCH_MAX_ITEMS = 1_000_000
+# Linhas por requisição síncrona de estimativa de frete
+FREIGHT_MAX_ITEMS = 10_000
+# Linhas por remessa (pedido de compra)
+SHIPMENT_MAX_ITEMS = 10_000
+
+# API JSON v1 (integrações como ERP): autenticação por token, sem sessão nem CSRF
+
+# Tokens verificados recentemente: token -> (user_id, expira_em); a verificação
+# consulta o usuário no banco, então exclusão e troca de senha valem após o TTL
+TOKEN_CACHE_TTL = 60
+TOKEN_CACHE_MAX = 4096
+_token_cache = {}
+
+def _token_user_id(token):
+    """Verificação do token (assinatura, validade e usuário), memorizada por TOKEN_CACHE_TTL segundos"""
+    now = time.monotonic()
+    cached = _token_cache.get(token)
+    if cached is not None and cached[1] > now:
+        return cached[0]
+    user_id = User.verify_api_token(token)
+    if user_id:
+        if len(_token_cache) >= TOKEN_CACHE_MAX:
+            _token_cache.clear()
+        _token_cache[token] = (user_id, now + TOKEN_CACHE_TTL)
+    else:
+        _token_cache.pop(token, None)
+    return user_id
+
+def token_required(view):
+    """Exige token de API válido no cabeçalho Authorization: Bearer <token>"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        user_id = _token_user_id(token.strip()) if scheme.lower() == 'bearer' else None
+        if not user_id:
+            return jsonify({'success': False, 'error': 'Token de API inválido ou ausente'}), 401
+        g.api_user_id = user_id
+        return view(*args, **kwargs)
+    return csrf.exempt(wrapper)
+
+def _get_number(data, field, default=None, minimum=None, integer=False):
+    """Lê um campo numérico do payload JSON, levantando ValueError se inválido"""
+    value = data.get(field, default)
+    if value is None:
+        raise ValueError(f'Campo obrigatório: {field}')
+    try:
+        value = int(value) if integer else float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'Valor inválido para {field}')
+    if minimum is not None and value < minimum:
+        raise ValueError(f'{field} deve ser maior ou igual a {minimum}')
+    return value
+
+def _get_benefit_context(data):
+    """Origem, ex-tarifário e regime declarados na operação (BenefitContext ou None)"""
+    origin_country = data.get('origin_country')
+    if origin_country is not None and not isinstance(origin_country, str):
+        raise ValueError('origin_country deve ser texto')
+    ex = _get_number(data, 'ex', minimum=1, integer=True) if data.get('ex') is not None else None
+    regime = str(data.get('regime') or '').strip().upper() or None
+    if regime is not None and regime not in TaxBenefitEngine.REGIMES:
+        raise ValueError(f'Regime inválido: {regime}')
+    return BenefitContext.build(origin_country, ex, regime)
+
+def _get_transport_mode(data, default='MARITIME'):
+    """Modal de transporte (MARITIME, AIR ou ROAD)"""
+    mode = str(data.get('transport_mode') or default).strip().upper()
+    if mode not in FreightEstimator.MODES:
+        raise ValueError(f'Modal de transporte inválido: {mode}')
+    return mode
+
+def _wants_freight_estimate(data):
+    """Frete ausente e peso bruto ou volume informados: frete (e seguro ausente) pela tabela do modal"""
+    return data.get('freight_usd') is None and (data.get('gross_weight_kg') is not None
+                                                or data.get('volume_m3') is not None)
+
+def _get_date(data, field, default=None):
+    """Lê uma data AAAA-MM-DD do payload, levantando ValueError se inválida"""
+    value = data.get(field)
+    if value in (None, ''):
+        return default
+    try:
+        return date.fromisoformat(str(value))
+    except ValueError:
+        raise ValueError(f'Data inválida para {field} (use AAAA-MM-DD)')
+
+def _get_json_payload():
+    """Payload JSON da requisição (objeto), levantando ValueError se ausente"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        raise ValueError('Corpo da requisição deve ser um objeto JSON')
+    return data
+
+def _get_axis(data, field, base, integer=False):
+    """
+    Eixo de simulação: lista explícita de valores ou {"spread_pct": X, "steps": N}
+    em torno do valor base do cenário ("base" no objeto substitui o do cenário;
+    sem valor base no cenário, base=None, ela é obrigatória)
+    """
+    spec = data.get(field)
+    if spec is None:
+        values = [base]
+    elif isinstance(spec, list):
+        values = [_get_number({field: value}, field, minimum=0) for value in spec]
+    elif isinstance(spec, dict):
+        if spec.get('base') is None and base is None:
+            raise ValueError(f'{field} com spread_pct exige o valor base')
+        values = ScenarioSweep.build_axis(
+            _get_number(spec, 'base', default=base, minimum=0),
+            _get_number(spec, 'spread_pct', minimum=0),
+            _get_number(spec, 'steps', minimum=1, integer=True)
+        )
+    else:
+        raise ValueError(f'Formato inválido para {field}')
+    if integer:
+        values = [max(int(round(value)), 1) for value in values]
+    return values
+
+@app.route('/api/v1/token', methods=['POST'])
+@csrf.exempt
+def api_issue_token():
+    """Emite token de API a partir de e-mail e senha"""
+    data = request.get_json(silent=True) or {}
+    user = User.query.filter_by(email=data.get('email')).first()
+    if not user or not user.check_password(data.get('password') or ''):
+        return jsonify({'success': False, 'error': 'E-mail ou senha incorretos'}), 401
+    return jsonify({'success': True, 'data': {'token': user.generate_api_token()}})
+
+@app.route('/api/v1/quote', methods=['POST'])
+@token_required
+def api_quote():
+    """Cotação de importação sem persistência (impostos e, opcionalmente, rentabilidade)"""
+    try:
+        data = _get_json_payload()
+        ncm_code = str(data.get('ncm_code') or '').strip()
+        if not ncm_code:
+            raise ValueError('Campo obrigatório: ncm_code')
+
+        exchange_rate = data.get('exchange_rate')
+        if exchange_rate is None:
+            exchange_rate = currency_service.get_usd_brl_rate()
+
+        destination_state = tax_calculator.icms_matrix.normalize_state(data.get('destination_state'))
+        context = _get_benefit_context(data)
+        unit_value_usd = _get_number(data, 'unit_value_usd', minimum=0.01)
+        quantity = _get_number(data, 'quantity', minimum=1, integer=True)
+        freight_estimate = None
+        if _wants_freight_estimate(data):
+            freight_estimate = freight_estimator.estimate(
+                _get_transport_mode(data), data.get('origin_country'), unit_value_usd * quantity,
+                _get_number(data, 'gross_weight_kg', default=0, minimum=0),
+                _get_number(data, 'volume_m3', default=0, minimum=0)
+            )
+            freight_usd = freight_estimate['freight_usd']
+            insurance_default = freight_estimate['insurance_usd']
+        else:
+            freight_usd = _get_number(data, 'freight_usd', default=0, minimum=0)
+            insurance_default = 0
+
+        quote = tax_calculator.calculate_all_taxes(
+            unit_value_usd=unit_value_usd,
+            quantity=quantity,
+            ncm_code=ncm_code,
+            freight_usd=freight_usd,
+            insurance_usd=_get_number(data, 'insurance_usd', default=insurance_default, minimum=0),
+            exchange_rate=_get_number({'exchange_rate': exchange_rate}, 'exchange_rate', minimum=0.0001),
+            destination_state=destination_state,
+            context=context
+        )
+
+        result = {'quote': quote}
+        if freight_estimate is not None:
+            result['freight_estimate'] = freight_estimate
+
+        profitability = data.get('profitability')
+        if profitability is not None:
+            if not isinstance(profitability, dict):
+                raise ValueError('profitability deve ser um objeto JSON')
+            # Revenda a partir da UF de destino da importação; customer_state: venda interestadual
+            customer_state = tax_calculator.icms_matrix.normalize_state(profitability.get('customer_state'))
+            result['profitability'] = tax_calculator.calculate_profitability(
+                total_cost_brl=quote['summary']['total_cost'],
+                selling_price_brl=_get_number(profitability, 'selling_price_brl', minimum=0.01),
+                additional_costs={
+                    'storage': _get_number(profitability, 'storage', default=0, minimum=0),
+                    'marketing': _get_number(profitability, 'marketing', default=0, minimum=0),
+                    'platform_fees_rate': _get_number(profitability, 'platform_fees_rate', default=0, minimum=0)
+                },
+                sale_icms_rate=tax_calculator.get_sale_icms_rate(ncm_code, destination_state, customer_state)
+            )
+
+        return jsonify({'success': True, 'data': result})
+
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logging.error(f"Erro na cotação via API: {str(e)}")
+        return jsonify({'success': False, 'error': 'Erro ao calcular cotação'}), 500
+
+def _get_additional_costs(data):
+    """Custos adicionais de venda (armazenagem, marketing, taxa de plataforma em %)"""
+    additional_costs = data.get('additional_costs') or {}
+    if not isinstance(additional_costs, dict):
+        raise ValueError('additional_costs deve ser um objeto JSON')
+    return {
+        'storage': _get_number(additional_costs, 'storage', default=0, minimum=0),
+        'marketing': _get_number(additional_costs, 'marketing', default=0, minimum=0),
+        'platform_fees_rate': _get_number(additional_costs, 'platform_fees_rate', default=0, minimum=0)
+    }
+
+@app.route('/api/v1/pricing', methods=['POST'])
+@token_required
+def api_pricing():
+    """
+    Preço de equilíbrio e preço para margem líquida/ROI alvo em lote:
+    cálculos salvos (calculation_ids) e/ou custos avulsos (total_costs_brl)
+    """
+    try:
+        data = _get_json_payload()
+        calculation_ids = data.get('calculation_ids') or []
+        total_costs = data.get('total_costs_brl') or []
+        if not isinstance(calculation_ids, list) or not isinstance(total_costs, list):
+            raise ValueError('calculation_ids e total_costs_brl devem ser listas')
+        if not calculation_ids and not total_costs:
+            raise ValueError('Informe calculation_ids ou total_costs_brl')
+        if len(calculation_ids) + len(total_costs) > 1000:
+            raise ValueError('Máximo de 1000 itens por requisição')
+
+        target_net_margin = data.get('target_net_margin')
+        if target_net_margin is not None:
+            target_net_margin = _get_number(data, 'target_net_margin')
+        target_roi = data.get('target_roi')
+        if target_roi is not None:
+            target_roi = _get_number(data, 'target_roi')
+
+        items = []
+        if calculation_ids:
+            # Uma única consulta para todos os cálculos do usuário
+            calculations = {
+                row.id: row for row in Calculation.query
+                .with_entities(Calculation.id, Calculation.final_cost_brl,
+                               Calculation.ncm_code, Calculation.destination_state)
+                .filter(Calculation.user_id == g.api_user_id,
+                        Calculation.id.in_([str(calc_id) for calc_id in calculation_ids]))
+                .all()
+            }
+            missing = [calc_id for calc_id in calculation_ids if str(calc_id) not in calculations]
+            if missing:
+                return jsonify({'success': False, 'error': f'Cálculos não encontrados: {missing}'}), 404
+            # ICMS da venda pela NCM e UF de destino de cada cálculo
+            items.extend({
+                'calculation_id': str(calc_id),
+                'cost': calculations[str(calc_id)].final_cost_brl,
+                'sale_icms_rate': tax_calculator.get_sale_icms_rate(calculations[str(calc_id)].ncm_code,
+                                                                    calculations[str(calc_id)].destination_state)
+            } for calc_id in calculation_ids)
+        if total_costs:
+            # Custos avulsos: NCM e UF de destino opcionais do payload
+            sale_icms_rate = tax_calculator.get_sale_icms_rate(
+                str(data.get('ncm_code') or '').strip(),
+                tax_calculator.icms_matrix.normalize_state(data.get('destination_state'))
+            )
+            items.extend({'cost': _get_number({'total_cost_brl': cost}, 'total_cost_brl', minimum=0),
+                          'sale_icms_rate': sale_icms_rate}
+                         for cost in total_costs)
+
+        # Uma chamada por alíquota de ICMS na venda, preservando a ordem dos itens
+        groups = {}
+        for index, item in enumerate(items):
+            groups.setdefault(item['sale_icms_rate'], []).append(index)
+        results = [None] * len(items)
+        additional_costs = _get_additional_costs(data)
+        for sale_icms_rate, indexes in groups.items():
+            solved = tax_calculator.solve_selling_prices(
+                [items[index]['cost'] for index in indexes],
+                additional_costs=additional_costs,
+                target_net_margin=target_net_margin,
+                target_roi=target_roi,
+                sale_icms_rate=sale_icms_rate
+            )
+            for index, result in zip(indexes, solved):
+                results[index] = result
+        for item, result in zip(items, results):
+            if 'calculation_id' in item:
+                result['calculation_id'] = item['calculation_id']
+
+        return jsonify({'success': True, 'data': results})
+
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logging.error(f"Erro no cálculo de preços alvo: {str(e)}")
+        return jsonify({'success': False, 'error': 'Erro ao calcular preços alvo'}), 500
+
+def _get_risk_params(data, max_draws):
+    """Parâmetros de RiskSimulation.run a partir do payload JSON"""
+    ncm_code = str(data.get('ncm_code') or '').strip()
+    if not ncm_code:
+        raise ValueError('Campo obrigatório: ncm_code')
+
+    spot_rate = data.get('exchange_rate')
+    if spot_rate is None:
+        spot_rate = currency_service.get_usd_brl_rate()
+
+    selling_price = data.get('selling_price_brl')
+    if selling_price is not None:
+        selling_price = _get_number(data, 'selling_price_brl', minimum=0.01)
+
+    seed = data.get('seed')
+    if seed is not None:
+        seed = _get_number(data, 'seed', minimum=0, integer=True)
+
+    draws = _get_number(data, 'draws', default=10_000, minimum=1, integer=True)
+    if draws > max_draws:
+        raise ValueError(f'draws deve ser menor ou igual a {max_draws}')
+
+    return {
+        'unit_value_usd': _get_number(data, 'unit_value_usd', minimum=0.01),
+        'quantity': _get_number(data, 'quantity', minimum=1, integer=True),
+        'ncm_code': ncm_code,
+        'freight_usd': _get_number(data, 'freight_usd', default=0, minimum=0),
+        'insurance_usd': _get_number(data, 'insurance_usd', default=0, minimum=0),
+        'spot_rate': _get_number({'exchange_rate': spot_rate}, 'exchange_rate', minimum=0.0001),
+        'draws': draws,
+        'horizon_days': _get_number(data, 'horizon_days', default=30, minimum=1, integer=True),
+        'method': str(data.get('method') or 'bootstrap'),
+        'freight_sigma': _get_number(data, 'freight_sigma', default=0.15, minimum=0),
+        'insurance_sigma': _get_number(data, 'insurance_sigma', default=0.05, minimum=0),
+        'selling_price': selling_price,
+        'additional_costs': _get_additional_costs(data),
+        'seed': seed,
+        'destination_state': tax_calculator.icms_matrix.normalize_state(data.get('destination_state')),
+        'context': _get_benefit_context(data)
+    }
+
+def _load_risk_history(data):
+    """Histórico de câmbio da simulação (dias configuráveis no payload)"""
+    return risk_simulation.load_history(
+        currency_service, days=_get_number(data, 'history_days', default=365, minimum=2, integer=True)
+    )
+
+@app.route('/api/v1/risk', methods=['POST'])
+@token_required
+def api_risk_simulation():
+    """Simulação de Monte Carlo do custo final (e margem) sobre cenários de câmbio"""
+    try:
+        data = _get_json_payload()
+        params = _get_risk_params(data, API_MAX_DRAWS)
+        result = risk_simulation.run(history=_load_risk_history(data), **params)
+        return jsonify({'success': True, 'data': result})
+
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logging.error(f"Erro na simulação de risco: {str(e)}")
+        return jsonify({'success': False, 'error': 'Erro ao simular risco'}), 500
+
+@app.route('/api/v1/scenarios/<scenario_id>/sweep', methods=['POST'])
+@token_required
+def api_scenario_sweep(scenario_id):
+    """Grade "e se" de um cenário salvo: câmbio × quantidade × frete (× preço de venda)"""
+    scenario = ProductScenario.query.filter_by(id=scenario_id, user_id=g.api_user_id).first()
+    if not scenario:
+        return jsonify({'success': False, 'error': 'Cenário não encontrado'}), 404
+
+    try:
+        data = _get_json_payload()
+        base_rate = scenario.exchange_rate or currency_service.get_usd_brl_rate()
+
+        freights = data.get('freight')
+        cargo = data.get('cargo')
+        if cargo is not None:
+            # Frete e seguro estimados por modal (freight: lista de modais, padrão o do cenário)
+            if not isinstance(cargo, dict):
+                raise ValueError('cargo deve ser um objeto JSON')
+            if cargo.get('unit_weight_kg') is None and cargo.get('unit_volume_m3') is None:
+                raise ValueError('cargo deve informar unit_weight_kg ou unit_volume_m3')
+            if freights is None:
+                freights = [scenario.transport_mode]
+            elif not isinstance(freights, list):
+                raise ValueError('Com cargo, freight deve ser uma lista de modais')
+            freights = [_get_transport_mode({'transport_mode': mode}) for mode in freights]
+            cargo = {
+                'origin_country': scenario.origin_country,
+                'unit_weight_kg': _get_number(cargo, 'unit_weight_kg', default=0, minimum=0),
+                'unit_volume_m3': _get_number(cargo, 'unit_volume_m3', default=0, minimum=0)
+            }
+        elif freights is None:
+            freights = [scenario.freight_cost or 0]
+        elif isinstance(freights, dict):
+            freights = {mode: _get_number(freights, mode, minimum=0) for mode in freights}
+        else:
+            freights = _get_axis(data, 'freight', scenario.freight_cost or 0)
+
+        selling_prices = None
+        if data.get('selling_price') is not None:
+            selling_prices = _get_axis(data, 'selling_price', None)
+
+        result = scenario_sweep.run(
+            unit_value_usd=scenario.unit_value_usd,
+            ncm_code=scenario.ncm_code,
+            insurance_usd=scenario.insurance_cost or 0,
+            exchange_rates=_get_axis(data, 'exchange_rate', base_rate),
+            quantities=_get_axis(data, 'quantity', scenario.default_quantity or 1, integer=True),
+            freights=freights,
+            selling_prices=selling_prices,
+            additional_costs=_get_additional_costs(data),
+            cargo=cargo,
+            destination_state=scenario.destination_state,
+            context=BenefitContext.build(scenario.origin_country, scenario.ex, scenario.customs_regime)
+        )
+        return jsonify({'success': True, 'data': result})
+
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logging.error(f"Erro na simulação de cenário: {str(e)}")
+        return jsonify({'success': False, 'error': 'Erro ao simular cenário'}), 500
+
+@app.route('/api/v1/freight/estimate', methods=['POST'])
+@token_required
+def api_freight_estimate():
+    """
+    Frete e seguro estimados para linhas de remessa (items: transport_mode,
+    origin_country, fob_usd, gross_weight_kg, volume_m3), em uma única passada
+    """
+    try:
+        data = _get_json_payload()
+        items = data.get('items')
+        if not isinstance(items, list) or not items:
+            raise ValueError('items deve ser uma lista não vazia')
+        if len(items) > FREIGHT_MAX_ITEMS:
+            raise ValueError(f'Máximo de {FREIGHT_MAX_ITEMS} itens por requisição')
+        if not all(isinstance(item, dict) for item in items):
+            raise ValueError('Cada item deve ser um objeto JSON')
+        columns = freight_estimator.estimate_columns(
+            [_get_transport_mode(item, data.get('transport_mode') or 'MARITIME') for item in items],
+            [item.get('origin_country', data.get('origin_country')) for item in items],
+            [_get_number(item, 'fob_usd', minimum=0) for item in items],
+            [_get_number(item, 'gross_weight_kg', default=0, minimum=0) for item in items],
+            [_get_number(item, 'volume_m3', default=0, minimum=0) for item in items]
+        )
+        return jsonify({'success': True, 'data': {
+            'items': [
+                {'freight_usd': freight, 'insurance_usd': insurance, 'chargeable_weight_kg': round(weight, 3)}
+                for freight, insurance, weight in zip(columns['freight_usd'], columns['insurance_usd'],
+                                                      columns['chargeable_weight_kg'])
+            ],
+            'total_freight_usd': round(sum(columns['freight_usd']), 2),
+            'total_insurance_usd': round(sum(columns['insurance_usd']), 2)
+        }})
+
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logging.error(f"Erro na estimativa de frete: {str(e)}")
+        return jsonify({'success': False, 'error': 'Erro ao estimar frete'}), 500
+
+@app.route('/api/v1/calculations/export')
+@token_required
+def api_export_calculations():
+    """Exportação em streaming dos cálculos do usuário (?format=csv|ndjson|xlsx)"""
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in CalculationExporter.FORMATS:
+        return jsonify({'success': False, 'error': f'Formato de exportação inválido: {export_format}'}), 400
+    return export_response(g.api_user_id, export_format)
+
+@app.route('/api/v1/rates/<ncm_code>')
+@token_required
+def api_tax_rates(ncm_code):
+    """Alíquotas de um NCM vigentes numa data (?date=AAAA-MM-DD, padrão: hoje) e histórico de versões"""
+    try:
+        as_of = _get_date(request.args, 'date', default=date.today())
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, 'data': {
+        'ncm_code': ncm_code,
+        'date': as_of.isoformat(),
+        'rates': tax_calculator.get_tax_rates(ncm_code, as_of),
+        'versions': [version.to_dict() for version in rate_store.versions_for(ncm_code)]
+    }})
+
+@app.route('/api/v1/benefits/<ncm_code>')
+@token_required
+def api_tax_benefits(ncm_code):
+    """
+    Benefícios fiscais do NCM: os aplicáveis a uma operação (?origin_country=&ex=&regime=&date=),
+    todas as regras cadastradas para prefixos do código e a preferência tarifária da origem
+    """
+    try:
+        as_of = _get_date(request.args, 'date', default=date.today())
+        context = _get_benefit_context(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, 'data': {
+        'ncm_code': ncm_code,
+        'date': as_of.isoformat(),
+        'applicable': benefit_engine.applicable(ncm_code, context, as_of),
+        'rules': benefit_engine.rules_for(ncm_code),
+        'trade_preference': tax_calculator.get_trade_preference(ncm_code, as_of, context)
+    }})
+
+@app.route('/api/v1/analytics/summary')
+@token_required
+def api_analytics_summary():
+    """Totais e quebras por mês, capítulo NCM e origem (?since=AAAA-MM&limit=)"""
+    since_month = request.args.get('since')
+    if since_month and not re.fullmatch(r'\d{4}-\d{2}', since_month):
+        return jsonify({'success': False, 'error': 'since deve estar no formato AAAA-MM'}), 400
+    limit = request.args.get('limit', 10, type=int)
+    summary = analytics_rollup.summary(g.api_user_id, since_month=since_month, limit=max(1, min(limit, 100)))
+    return jsonify({'success': True, 'data': summary})
+
+def _price_shipment(data):
+    """
+    Remessa do payload validada e custeada por ShipmentCosting;
+    retorna (campos da remessa, linhas validadas, resultado do custeio)
+    """
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        raise ValueError('items deve ser uma lista não vazia')
+    if len(items) > SHIPMENT_MAX_ITEMS:
+        raise ValueError(f'Máximo de {SHIPMENT_MAX_ITEMS} linhas por remessa')
+
+    lines = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise ValueError('Cada item deve ser um objeto JSON')
+        ncm_code = str(item.get('ncm_code') or '').strip()
+        if not ncm_code:
+            raise ValueError('Campo obrigatório: ncm_code')
+        context = _get_benefit_context({'ex': item.get('ex'), 'regime': item.get('regime')})
+        lines.append({
+            'product_name': str(item.get('product_name') or '')[:200] or None,
+            'ncm_code': ncm_code,
+            'unit_value_usd': _get_number(item, 'unit_value_usd', minimum=0.01),
+            'quantity': _get_number(item, 'quantity', minimum=1, integer=True),
+            'gross_weight_kg': (_get_number(item, 'gross_weight_kg', minimum=0)
+                                if item.get('gross_weight_kg') is not None else None),
+            'ex': context.ex if context else None,
+            'regime': context.regime if context else None
+        })
+
+    origin_country = data.get('origin_country')
+    if origin_country is not None and not isinstance(origin_country, str):
+        raise ValueError('origin_country deve ser texto')
+    basis = str(data.get('allocation_basis') or 'VALUE').strip().upper()
+    if basis not in ShipmentCosting.ALLOCATION_BASES:
+        raise ValueError(f'Base de rateio inválida: {basis}')
+    exchange_rate = data.get('exchange_rate')
+    if exchange_rate is None:
+        exchange_rate = currency_service.get_usd_brl_rate()
+
+    shipment = {
+        'reference': str(data.get('reference') or '')[:100] or None,
+        'origin_country': origin_country,
+        'transport_mode': _get_transport_mode(data),
+        'destination_state': tax_calculator.icms_matrix.normalize_state(data.get('destination_state')),
+        'exchange_rate': _get_number({'exchange_rate': exchange_rate}, 'exchange_rate', minimum=0.0001),
+        'allocation_basis': basis,
+        'clearance_fees_brl': _get_number(data, 'clearance_fees_brl', default=0, minimum=0),
+        'broker_fees_brl': _get_number(data, 'broker_fees_brl', default=0, minimum=0)
+    }
+    priced = shipment_costing.price(
+        lines,
+        exchange_rate=shipment['exchange_rate'],
+        freight_usd=_get_number(data, 'freight_usd', minimum=0) if data.get('freight_usd') is not None else None,
+        insurance_usd=(_get_number(data, 'insurance_usd', minimum=0)
+                       if data.get('insurance_usd') is not None else None),
+        fees_brl=shipment['clearance_fees_brl'] + shipment['broker_fees_brl'],
+        basis=basis,
+        transport_mode=shipment['transport_mode'],
+        origin_country=origin_country,
+        destination_state=shipment['destination_state'],
+        volume_m3=_get_number(data, 'volume_m3', default=0, minimum=0),
+        as_of=_get_date(data, 'date')
+    )
+    shipment['freight_usd'] = priced['totals']['freight_usd']
+    shipment['insurance_usd'] = priced['totals']['insurance_usd']
+    return shipment, lines, priced
+
+def _shipment_item_rows(lines, priced):
+    """Linhas no formato das colunas de shipment_items, valores arredondados"""
+    columns = priced['lines']
+    return [
+        {
+            'line': index + 1,
+            'product_name': line['product_name'],
+            'ncm_code': line['ncm_code'],
+            'unit_value_usd': line['unit_value_usd'],
+            'quantity': line['quantity'],
+            'gross_weight_kg': line['gross_weight_kg'],
+            'ex': line['ex'],
+            'customs_regime': line['regime'],
+            **{field: round(columns[column][index], 2) for field, column in ShipmentItem.COST_COLUMNS.items()}
+        }
+        for index, line in enumerate(lines)
+    ]
+
+@app.route('/api/v1/shipments/quote', methods=['POST'])
+@token_required
+def api_shipment_quote():
+    """Custeio de uma remessa com várias linhas (rateio de frete, seguro e despesas), sem persistência"""
+    try:
+        shipment, lines, priced = _price_shipment(_get_json_payload())
+        return jsonify({'success': True, 'data': {
+            **shipment,
+            'freight_estimate': priced['freight_estimate'],
+            'totals': priced['totals'],
+            'items': _shipment_item_rows(lines, priced)
+        }})
+
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logging.error(f"Erro no custeio de remessa: {str(e)}")
+        return jsonify({'success': False, 'error': 'Erro ao custear remessa'}), 500
+
+@app.route('/api/v1/shipments', methods=['POST'])
+@token_required
+def api_create_shipment():
+    """Custeia e grava uma remessa com suas linhas"""
+    try:
+        shipment_data, lines, priced = _price_shipment(_get_json_payload())
+        totals = priced['totals']
+        shipment = Shipment(
+            user_id=g.api_user_id,
+            total_fob_usd=totals['fob_usd'],
+            total_cif_brl=totals['cif_brl'],
+            total_taxes_brl=totals['total_taxes'],
+            total_cost_brl=totals['landed_cost'],
+            **shipment_data
+        )
+        db.session.add(shipment)
+        db.session.flush()  # Para obter o ID
+        rows = _shipment_item_rows(lines, priced)
+        for row in rows:
+            row['shipment_id'] = shipment.id
+        db.session.execute(insert(ShipmentItem), rows)
+        db.session.commit()
+        return jsonify({'success': True, 'data': {**shipment.to_dict(), 'totals': totals}}), 201
+
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Erro ao gravar remessa: {str(e)}")
+        return jsonify({'success': False, 'error': 'Erro ao gravar remessa'}), 500
+
+@app.route('/api/v1/shipments')
+@token_required
+def api_list_shipments():
+    """Remessas do usuário, mais recentes primeiro (?limit=)"""
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    shipments = Shipment.query.filter_by(user_id=g.api_user_id)\
+                              .order_by(Shipment.created_at.desc()).limit(limit).all()
+    return jsonify({'success': True, 'data': [shipment.to_dict() for shipment in shipments]})
+
+@app.route('/api/v1/shipments/<shipment_id>')
+@token_required
+def api_get_shipment(shipment_id):
+    """Remessa com as linhas rateadas e custeadas"""
+    shipment = Shipment.query.filter_by(id=shipment_id, user_id=g.api_user_id).first()
+    if not shipment:
+        return jsonify({'success': False, 'error': 'Remessa não encontrada'}), 404
+    return jsonify({'success': True, 'data': {
+        **shipment.to_dict(),
+        'items': [item.to_dict() for item in shipment.items]
+    }})
+
+# Tarefas em segundo plano (executadas por `flask --app main worker`)
+
+@job_queue.handler('risk_simulation')
+def run_risk_simulation_job(job, payload):
+    """Simulação de risco sem o limite de sorteios da requisição síncrona"""
+    params = _get_risk_params(payload, RiskSimulation.MAX_DRAWS)
+    job_queue.report_progress(job, 0.05, 'Carregando histórico de câmbio')
+    history = _load_risk_history(payload)
+    job_queue.report_progress(job, 0.1, 'Simulando')
+    return risk_simulation.run(history=history, workers=os.cpu_count() or 1, **params)
+
+@job_queue.handler('batch_quote')
+def run_batch_quote_job(job, payload):
+    """Cotação de um lote de itens (pedido de compra ou arquivo de importação)"""
+    items = _get_batch_items(payload)
+    job_queue.report_progress(job, 0.1, f'Calculando {len(items)} itens')
+    return BatchExecutor(tax_calculator=tax_calculator).calculate(items)
+
+def _get_batch_items(data):
+    """Itens de cotação em lote, validados"""
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        raise ValueError('items deve ser uma lista não vazia')
+    if len(items) > BATCH_MAX_ITEMS:
+        raise ValueError(f'Máximo de {BATCH_MAX_ITEMS} itens por lote')
+    default_rate = data.get('exchange_rate')
+    validated = []
+    # Itens com frete a estimar: posição e colunas da estimativa (uma chamada para o lote)
+    estimate_rows, estimate_columns = [], ([], [], [], [], [])
+    for item in items:
+        if not isinstance(item, dict):
+            raise ValueError('Cada item deve ser um objeto JSON')
+        ncm_code = str(item.get('ncm_code') or '').strip()
+        if not ncm_code:
+            raise ValueError('Campo obrigatório: ncm_code')
+        exchange_rate = item.get('exchange_rate', default_rate)
+        validated.append({
+            'unit_value_usd': _get_number(item, 'unit_value_usd', minimum=0.01),
+            'quantity': _get_number(item, 'quantity', minimum=1, integer=True),
+            'ncm_code': ncm_code,
+            'freight_usd': _get_number(item, 'freight_usd', default=0, minimum=0),
+            'insurance_usd': _get_number(item, 'insurance_usd', default=0, minimum=0),
+            'exchange_rate': _get_number({'exchange_rate': exchange_rate}, 'exchange_rate', minimum=0.0001),
+            'destination_state': tax_calculator.icms_matrix.normalize_state(
+                item.get('destination_state', data.get('destination_state')))
+        })
+        context = _get_benefit_context(item)
+        if context is not None:
+            validated[-1].update(context._asdict())
+        if _wants_freight_estimate(item):
+            estimate_rows.append(len(validated) - 1)
+            for column, value in zip(estimate_columns, (
+                    _get_transport_mode(item, data.get('transport_mode') or 'MARITIME'),
+                    item.get('origin_country'),
+                    validated[-1]['unit_value_usd'] * validated[-1]['quantity'],
+                    _get_number(item, 'gross_weight_kg', default=0, minimum=0),
+                    _get_number(item, 'volume_m3', default=0, minimum=0))):
+                column.append(value)
+
+    if estimate_rows:
+        estimate = freight_estimator.estimate_columns(*estimate_columns)
+        for row, freight, insurance in zip(estimate_rows, estimate['freight_usd'], estimate['insurance_usd']):
+            validated[row]['freight_usd'] = freight
+            if items[row].get('insurance_usd') is None:
+                validated[row]['insurance_usd'] = insurance
+    return validated
+
+@job_queue.handler('export_calculations')
+def run_export_job(job, payload):
+    """Exportação do histórico gravada em blocos como resultado da tarefa"""
+    export_format = payload.get('format', 'csv')
+    return export_calculations(job.user_id, export_format), CalculationExporter.FORMATS[export_format][0]
+
+def _validate_export_payload(payload):
+    if payload.get('format', 'csv') not in CalculationExporter.FORMATS:
+        raise ValueError(f"Formato de exportação inválido: {payload.get('format')}")
+
+@job_queue.handler('refresh_rollups')
+def run_refresh_rollups_job(job, payload):
+    """Recálculo dos agregados do dashboard do usuário"""
+    return {'rows': analytics_rollup.refresh(job.user_id)}
+
+@job_queue.handler('reprice_scenarios')
+def run_reprice_scenarios_job(job, payload):
+    """Custo dos cenários do usuário com as alíquotas de as_of comparado ao de compare_to"""
+    as_of, compare_to = _get_reprice_dates(payload)
+    return scenario_repricer.reprice(as_of, compare_to, user_id=job.user_id)
+
+def _get_reprice_dates(payload):
+    as_of = _get_date(payload, 'as_of')
+    if as_of is None:
+        raise ValueError('Campo obrigatório: as_of')
+    return as_of, _get_date(payload, 'compare_to')
+
+# Validação do payload no momento do enfileiramento, por tipo de tarefa
+JOB_VALIDATORS = {
+    'export_calculations': _validate_export_payload,
+    'risk_simulation': lambda payload: _get_risk_params(payload, RiskSimulation.MAX_DRAWS),
+    'batch_quote': _get_batch_items,
+    'refresh_rollups': lambda payload: None,
+    'reprice_scenarios': _get_reprice_dates
+}
+
+@app.route('/api/v1/jobs', methods=['POST'])
+@token_required
+def api_create_job():
+    """Enfileira uma tarefa em segundo plano ({"kind": ..., "payload": {...}})"""
+    try:
+        data = _get_json_payload()
+        kind = data.get('kind')
+        if kind not in JOB_VALIDATORS:
+            raise ValueError(f'Tipo de tarefa inválido: {kind}')
+        payload = data.get('payload') or {}
+        if not isinstance(payload, dict):
+            raise ValueError('payload deve ser um objeto JSON')
+        if kind == 'batch_quote' and payload.get('exchange_rate') is None:
+            # Cotação fixada no enfileiramento: o lote não depende de quando roda
+            payload['exchange_rate'] = currency_service.get_usd_brl_rate()
+        JOB_VALIDATORS[kind](payload)
+
+        job = job_queue.enqueue(kind, payload, user_id=g.api_user_id)
+        return jsonify({'success': True, 'data': job.to_dict()}), 202
+
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logging.error(f"Erro ao enfileirar tarefa: {str(e)}")
+        return jsonify({'success': False, 'error': 'Erro ao enfileirar tarefa'}), 500
+
+@app.route('/api/v1/jobs/<job_id>')
+@token_required
+def api_get_job(job_id):
+    """Status e progresso de uma tarefa"""
+    job = Job.query.filter_by(id=job_id, user_id=g.api_user_id).first()
+    if not job:
+        return jsonify({'success': False, 'error': 'Tarefa não encontrada'}), 404
+    return jsonify({'success': True, 'data': job.to_dict()})
+
+@app.route('/api/v1/jobs/<job_id>/result')
+@token_required
+def api_get_job_result(job_id):
+    """Resultado de uma tarefa concluída, com o tipo de conteúdo gravado pelo handler"""
+    job = Job.query.filter_by(id=job_id, user_id=g.api_user_id).first()
+    if not job:
+        return jsonify({'success': False, 'error': 'Tarefa não encontrada'}), 404
+    if job.status != 'SUCCEEDED':
+        return jsonify({'success': False, 'error': f'Tarefa ainda não concluída ({job.status})'}), 409
+    return Response(stream_with_context(job_queue.iter_result(job)), mimetype=job.result_content_type)
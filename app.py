@@ -14,6 +14,7 @@ class Base(DeclarativeBase):
     pass
 
 db = SQLAlchemy(model_class=Base)
+csrf = CSRFProtect()
 
 def create_app():
     app = Flask(__name__)
@@ -27,10 +28,18 @@ def create_app():
         "pool_pre_ping": True,
     }
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    # Gravar também as linhas de tax_details (além de calculations.tax_breakdown)
+    app.config["TAX_DETAIL_ROWS"] = os.environ.get("TAX_DETAIL_ROWS", "1") == "1"
+    # Idade (dias) a partir da qual cálculos são arquivados por `flask archive-calculations`
+    app.config["ARCHIVE_AFTER_DAYS"] = int(os.environ.get("ARCHIVE_AFTER_DAYS", "365"))
+    # Tabela local de fretes em JSON (vazio: tarifas de referência de FreightEstimator)
+    app.config["FREIGHT_TARIFFS_FILE"] = os.environ.get("FREIGHT_TARIFFS_FILE")
+    # Validade dos tokens da API JSON (dias)
+    app.config["API_TOKEN_MAX_AGE"] = int(os.environ.get("API_TOKEN_MAX_AGE_DAYS", "30")) * 86400
 
     # Initialize extensions
     db.init_app(app)
-    csrf = CSRFProtect(app)
+    csrf.init_app(app)
     
     # Initialize Flask-Login
     login_manager = LoginManager()
@@ -44,12 +53,8 @@ def create_app():
         from models import User
         return User.query.get(user_id)
 
-    with app.app_context():
-        # Import models to ensure tables are created
-        import models
-        db.create_all()
-        logging.info("Database tables created successfully")
-
+    # O esquema não é criado aqui (cada worker faria isso na partida):
+    # use `flask --app main migrate` antes de iniciar o servidor
     return app
 
 app = create_app()
@@ -0,0 +1,94 @@
+"""
+Benchmark do executor de lotes em processos paralelos (BatchExecutor)
+
+Calcula um lote sintético com 1, 2, 4 e 8 processos e confere que as colunas
+de saída são idênticas entre as execuções e às de calculate_all_taxes. Com
+--mixed-states, cada item tem uma UF de destino sorteada (ICMS da IcmsMatrix);
+com --estimate-freight, frete e seguro vêm do FreightEstimator (modal, origem,
+peso e volume sorteados), estimados em uma única chamada colunar.
+
+Uso: python benchmarks/bench_batch.py [--rows 1000000] [--workers 1,2,4,8] [--mixed-states]
+                                      [--estimate-freight]
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.batch_executor import BatchExecutor
+from services.freight_estimator import FreightEstimator
+from services.icms_matrix import IcmsMatrix
+from services.tax_calculator import BrazilianTaxCalculator
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--workers', default='1,2,4,8')
+    parser.add_argument('--mixed-states', action='store_true', help='UF de destino sorteada por item')
+    parser.add_argument('--estimate-freight', action='store_true', help='frete e seguro pelo FreightEstimator')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    rnd = random.Random(0)
+    ncm_codes = ['85171200', '85176200', '62034200', '87032300', '84713012', '95030099']
+    states = list(IcmsMatrix.STATES) + [None] if args.mixed_states else [None]
+    items = [{
+        'unit_value_usd': round(rnd.uniform(1, 500), 2),
+        'quantity': rnd.randint(1, 1000),
+        'ncm_code': rnd.choice(ncm_codes),
+        'freight_usd': round(rnd.uniform(0, 2000), 2),
+        'insurance_usd': round(rnd.uniform(0, 200), 2),
+        'exchange_rate': 5.25,
+        'destination_state': rnd.choice(states)
+    } for _ in range(args.rows)]
+    print(f"cpus disponíveis: {os.cpu_count()}")
+
+    if args.estimate_freight:
+        origins = ['CN', 'US', 'DE', 'AR', 'IN', 'JP', 'MX']
+        columns = (
+            [rnd.choice(('MARITIME', 'AIR')) for _ in items],
+            [rnd.choice(origins) for _ in items],
+            [item['unit_value_usd'] * item['quantity'] for item in items],
+            [rnd.uniform(1, 5000) for _ in items],
+            [rnd.uniform(0, 20) for _ in items]
+        )
+        start = time.perf_counter()
+        estimate = FreightEstimator().estimate_columns(*columns)
+        elapsed = time.perf_counter() - start
+        print(f"frete estimado: {args.rows:,} itens em {elapsed:.2f} s ({args.rows / elapsed:,.0f} itens/s)")
+        for item, freight, insurance in zip(items, estimate['freight_usd'], estimate['insurance_usd']):
+            item['freight_usd'] = freight
+            item['insurance_usd'] = insurance
+
+    reference = None
+    baseline = None
+    for workers in [int(value) for value in args.workers.split(',')]:
+        start = time.perf_counter()
+        result = BatchExecutor(workers=workers).calculate(items)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"{workers} processo(s): {args.rows:,} itens em {elapsed:.2f} s "
+              f"({args.rows / elapsed:,.0f} itens/s, speedup {baseline / elapsed:.2f}x)")
+        if reference is None:
+            reference = result
+        assert result == reference, 'resultado depende do número de processos'
+
+    calculator = BrazilianTaxCalculator()
+    for index in rnd.sample(range(args.rows), 100):
+        item = items[index]
+        expected = calculator.calculate_all_taxes(
+            item['unit_value_usd'], item['quantity'], item['ncm_code'],
+            item['freight_usd'], item['insurance_usd'], item['exchange_rate'],
+            destination_state=item['destination_state']
+        )['summary']['total_cost']
+        assert reference['total_cost'][index] == expected, (index, expected)
+    print("conferência contra calculate_all_taxes: ok")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark da coleta concorrente de páginas NCM (NcmCrawler)
+
+Sobe um servidor HTTP local de fixture (latência artificial, ETag, 503
+ocasional) e mede: coleta sequencial x concorrente com cache vazio,
+revalidação com GET condicional (304) e retomada após interrupção.
+
+Uso: python benchmarks/bench_crawler.py [--pages 400] [--latency 0.05] [--workers 1,8,16]
+"""
+import argparse
+import hashlib
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.ncm_crawler import NcmCrawler
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    latency = 0.05
+    counts = {'requests': 0, 'not_modified': 0}
+    failed_once = set()
+    lock = threading.Lock()
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        code = self.path.rsplit('/', 1)[-1]
+        with self.lock:
+            self.counts['requests'] += 1
+            # Um em cada 50 códigos falha na primeira tentativa
+            fail = int(code) % 50 == 0 and code not in self.failed_once
+            self.failed_once.add(code)
+        if fail:
+            self.send_response(503)
+            self.send_header('Retry-After', '0')
+            self.end_headers()
+            return
+        etag = '"' + hashlib.sha1(code.encode()).hexdigest()[:12] + '"'
+        if self.headers.get('If-None-Match') == etag:
+            with self.lock:
+                self.counts['not_modified'] += 1
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = f'<html><body><h1>NCM {code}</h1><p>Descrição do código {code}.</p></body></html>'.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, default=400)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--workers', default='1,8,16')
+    parser.add_argument('--rate', type=float, default=0, help='Requisições/s por host (0 = sem limite)')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    FixtureHandler.latency = args.latency
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    urls = [f'http://127.0.0.1:{server.server_port}/ncm/{10000000 + index}' for index in range(args.pages)]
+    NcmCrawler.RETRY_DELAY = 0.01
+
+    def run(cache_dir, workers, subset, checkpoint='bench'):
+        FixtureHandler.counts.update(requests=0, not_modified=0)
+        crawler = NcmCrawler(cache_dir, max_workers=workers, requests_per_second=args.rate)
+        start = time.perf_counter()
+        results = crawler.crawl(subset, checkpoint=checkpoint)
+        elapsed = time.perf_counter() - start
+        assert all(result.error is None and result.body for result in results), 'páginas com erro'
+        return elapsed, dict(FixtureHandler.counts)
+
+    baseline = None
+    for workers in [int(value) for value in args.workers.split(',')]:
+        cache_dir = tempfile.mkdtemp()
+        FixtureHandler.failed_once = set()
+        elapsed, counts = run(cache_dir, workers, urls)
+        baseline = baseline or elapsed
+        print(f"{workers:>2} thread(s), cache vazio: {args.pages} páginas em {elapsed:.2f} s "
+              f"({args.pages / elapsed:,.0f} páginas/s, speedup {baseline / elapsed:.1f}x, "
+              f"{counts['requests']} requisições)")
+        shutil.rmtree(cache_dir)
+
+    workers = max(int(value) for value in args.workers.split(','))
+    cache_dir = tempfile.mkdtemp()
+    FixtureHandler.failed_once = set(code.rsplit('/', 1)[-1] for code in urls)
+    run(cache_dir, workers, urls, checkpoint='primeira')
+    elapsed, counts = run(cache_dir, workers, urls, checkpoint='revalidacao')
+    print(f"revalidação (GET condicional): {elapsed:.2f} s, {counts['not_modified']} de "
+          f"{counts['requests']} respostas 304")
+
+    half = args.pages // 2
+    run(cache_dir, workers, urls[:half], checkpoint='retomada')
+    elapsed, counts = run(cache_dir, workers, urls, checkpoint='retomada')
+    print(f"retomada após interrupção na metade: {counts['requests']} requisições "
+          f"para {args.pages - half} páginas restantes ({elapsed:.2f} s)")
+    assert counts['requests'] == args.pages - half
+    shutil.rmtree(cache_dir)
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark da API de cotação sem persistência (POST /api/v1/quote)
+
+Mede, em um único processo/núcleo:
+  1. calculate_all_taxes chamado diretamente
+  2. requisição WSGI completa (token, parsing JSON, cálculo, serialização),
+     chamando o app WSGI diretamente como o gunicorn faz (sem cliente de teste)
+
+Uso: python benchmarks/bench_quote.py [--requests N]
+(usa SQLite temporário se DATABASE_URL não estiver definido)
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20000)
+    args = parser.parse_args()
+
+    import main as application  # noqa: F401 (registra rotas)
+    from app import app
+    from models import User
+    from routes import tax_calculator
+    logging.disable(logging.CRITICAL)
+
+    payload = {
+        'unit_value_usd': 250.0,
+        'quantity': 100,
+        'ncm_code': '85171200',
+        'freight_usd': 800.0,
+        'insurance_usd': 120.0,
+        'exchange_rate': 5.25,
+        'profitability': {'selling_price_brl': 450000.0, 'platform_fees_rate': 12}
+    }
+
+    start = time.perf_counter()
+    for _ in range(args.requests):
+        tax_calculator.calculate_all_taxes(250.0, 100, '85171200', 800.0, 120.0, 5.25)
+    elapsed = time.perf_counter() - start
+    print(f"calculate_all_taxes: {args.requests / elapsed:,.0f} chamadas/s")
+
+    with app.app_context():
+        token = User(id='bench').generate_api_token()
+    from werkzeug.test import EnvironBuilder
+    body = json.dumps(payload).encode('utf-8')
+    base_environ = EnvironBuilder(
+        path='/api/v1/quote', method='POST', data=body,
+        content_type='application/json',
+        headers={'Authorization': f'Bearer {token}'}
+    ).get_environ()
+
+    statuses = []
+
+    def start_response(status, headers, exc_info=None):
+        statuses.append(status)
+
+    def call():
+        environ = dict(base_environ)
+        environ['wsgi.input'] = io.BytesIO(body)
+        return b''.join(app(environ, start_response))
+
+    call()
+    assert statuses[-1].startswith('200'), statuses[-1]
+
+    start = time.perf_counter()
+    for _ in range(args.requests):
+        call()
+    elapsed = time.perf_counter() - start
+    print(f"POST /api/v1/quote: {args.requests / elapsed:,.0f} req/s "
+          f"({elapsed / args.requests * 1e6:.0f} µs/req, 1 núcleo, sem rede)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Benchmark da simulação de Monte Carlo de custo final (RiskSimulation)
+
+Gera um histórico sintético de cotações e executa a simulação com 1, 2, ...
+processos, conferindo que o resultado é idêntico para a mesma semente
+independentemente do número de processos.
+
+Uso: python benchmarks/bench_risk.py [--draws 1000000] [--workers 1,2,4] [--method bootstrap]
+"""
+import argparse
+import logging
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.risk_simulation import RiskSimulation
+from services.tax_calculator import BrazilianTaxCalculator
+
+
+def synthetic_history(days, spot=5.25, volatility=0.01, seed=0):
+    """Passeio aleatório lognormal com volatilidade diária fixa"""
+    rnd = random.Random(seed)
+    rates = [spot]
+    for _ in range(days - 1):
+        rates.append(rates[-1] * math.exp(rnd.gauss(0, volatility)))
+    return rates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--draws', type=int, default=1_000_000)
+    parser.add_argument('--workers', default='1,2,4')
+    parser.add_argument('--method', default='bootstrap', choices=RiskSimulation.METHODS)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    simulation = RiskSimulation(BrazilianTaxCalculator())
+    history = synthetic_history(365)
+    params = dict(unit_value_usd=250.0, quantity=100, ncm_code='85171200', freight_usd=1500.0,
+                  insurance_usd=120.0, spot_rate=history[-1], history=history, draws=args.draws,
+                  method=args.method, selling_price=3500.0, seed=42)
+
+    reference = None
+    for workers in [int(value) for value in args.workers.split(',')]:
+        start = time.perf_counter()
+        result = simulation.run(workers=workers, **params)
+        elapsed = time.perf_counter() - start
+        print(f"{workers} processo(s): {args.draws:,} sorteios em {elapsed:.2f} s "
+              f"(p5={result['total_cost']['p5']:,.2f} p50={result['total_cost']['p50']:,.2f} "
+              f"p95={result['total_cost']['p95']:,.2f})")
+        if reference is None:
+            reference = result
+        assert result == reference, 'resultado depende do número de processos'
+    print("reprodutibilidade entre números de processos: ok")
+
+
+if __name__ == '__main__':
+    main()
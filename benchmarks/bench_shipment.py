@@ -0,0 +1,78 @@
+"""
+Benchmark do custeio de remessas com muitas linhas (ShipmentCosting)
+
+Pedido de compra sintético (padrão: 2.000 linhas, NCMs e pesos sorteados)
+custeado com rateio por valor, peso e quantidade. Confere que as parcelas
+rateadas somam exatamente os totais da remessa e que cada linha bate com
+calculate_all_taxes usando o frete e o seguro rateados.
+
+Uso: python benchmarks/bench_shipment.py [--lines 2000] [--repeat 20]
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.shipment_costing import ShipmentCosting, allocate
+from services.tax_calculator import BenefitContext, BrazilianTaxCalculator
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--lines', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    rnd = random.Random(0)
+    ncm_codes = ['85171200', '85176200', '62034200', '87032300', '84713012', '95030099']
+    lines = [{
+        'ncm_code': rnd.choice(ncm_codes),
+        'unit_value_usd': round(rnd.uniform(1, 500), 2),
+        'quantity': rnd.randint(1, 1000),
+        'gross_weight_kg': round(rnd.uniform(0.5, 800), 3)
+    } for _ in range(args.lines)]
+    shipment = dict(exchange_rate=5.25, freight_usd=18_450.37, insurance_usd=1_203.11, fees_brl=9_876.54,
+                    origin_country='CN', destination_state='SP')
+
+    calculator = BrazilianTaxCalculator()
+    costing = ShipmentCosting(calculator)
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        allocate(shipment['freight_usd'], [line['gross_weight_kg'] for line in lines])
+    elapsed = (time.perf_counter() - start) / args.repeat
+    print(f"rateio: {args.lines:,} linhas em {elapsed * 1000:.2f} ms")
+
+    for basis in ShipmentCosting.ALLOCATION_BASES:
+        costing.price(lines, basis=basis, **shipment)  # alíquotas já resolvidas nas repetições
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            result = costing.price(lines, basis=basis, **shipment)
+        elapsed = (time.perf_counter() - start) / args.repeat
+        print(f"custeio por {basis}: {args.lines:,} linhas em {elapsed * 1000:.2f} ms "
+              f"(custo final R$ {result['totals']['landed_cost']:,.2f})")
+
+        columns = result['lines']
+        for column, total in (('freight_usd', shipment['freight_usd']),
+                              ('insurance_usd', shipment['insurance_usd']), ('fees_brl', shipment['fees_brl'])):
+            assert round(sum(columns[column]) * 100) == round(total * 100), (basis, column)
+
+    for index in rnd.sample(range(args.lines), 100):
+        line = lines[index]
+        expected = calculator.calculate_all_taxes(
+            line['unit_value_usd'], line['quantity'], line['ncm_code'],
+            result['lines']['freight_usd'][index], result['lines']['insurance_usd'][index],
+            shipment['exchange_rate'], destination_state='SP',
+            context=BenefitContext.build('CN', None, None)
+        )['summary']['total_cost']
+        assert abs(result['lines']['total_cost'][index] - expected) < 0.01, (index, expected)
+    print("conferência contra calculate_all_taxes: ok")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark de partida a frio da aplicação
+
+Em processos Python novos, mede o tempo de `import main` (o que cada worker
+do gunicorn paga sem preload_app), da primeira requisição, da construção do
+catálogo NCM e da primeira busca, e quantas conexões ao banco o import abre.
+Com --importtime, mostra os módulos de maior custo de import (python -X
+importtime). Sai com código 1 se a mediana do import ou da primeira
+requisição passar dos limites (uso em CI como teste de regressão).
+
+Uso: python benchmarks/bench_startup.py [--runs 5] [--database-url sqlite:///...]
+         [--importtime] [--top 20] [--max-import-ms 1000] [--max-first-request-ms 200]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = '''
+import json, logging, time
+start = time.perf_counter()
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+connections = []
+event.listen(Engine, 'connect', lambda *args: connections.append(1))
+import main
+imported = time.perf_counter()
+import_connections = len(connections)
+logging.disable(logging.CRITICAL)
+from app import app
+client = app.test_client()
+client.get('/login')
+first_request = time.perf_counter()
+from routes import ncm_service
+ncm_service.catalogue_version
+catalogue = time.perf_counter()
+ncm_service.search_ncm('smartphone')
+first_search = time.perf_counter()
+print(json.dumps({
+    'import': imported - start,
+    'first_request': first_request - imported,
+    'catalogue': catalogue - first_request,
+    'first_search': first_search - catalogue,
+    'import_connections': import_connections
+}))
+'''
+
+METRICS = ('import', 'first_request', 'catalogue', 'first_search')
+
+
+def run_probe(env, importtime=False):
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', PROBE]
+    completed = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        sys.exit(completed.stderr.strip().splitlines()[-1])
+    return json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr
+
+
+def import_costs(stderr):
+    """(cumulativo µs, próprio µs, profundidade, módulo) de cada linha do -X importtime"""
+    costs = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        costs.append((int(cumulative_us), int(self_us), depth, name.strip()))
+    return costs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--database-url', default=None,
+                        help='Padrão: SQLite temporário migrado por `flask migrate`')
+    parser.add_argument('--importtime', action='store_true', help='Mostra os imports mais custosos')
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--max-import-ms', type=float, default=None)
+    parser.add_argument('--max-first-request-ms', type=float, default=None)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if args.database_url:
+        env['DATABASE_URL'] = args.database_url
+    else:
+        env['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'startup.db')}"
+        subprocess.run([sys.executable, '-m', 'flask', '--app', 'main', 'migrate'],
+                       cwd=ROOT, env=env, capture_output=True)
+
+    samples = [run_probe(env)[0] for _ in range(args.runs)]
+    medians = {}
+    for key in METRICS:
+        values = [sample[key] * 1000 for sample in samples]
+        medians[key] = statistics.median(values)
+        print(f"{key:>14}: mediana {medians[key]:8.1f} ms "
+              f"(mín {min(values):.1f}, máx {max(values):.1f})")
+    print(f"conexões ao banco durante o import: {samples[0]['import_connections']}")
+
+    if args.importtime:
+        # Módulos de primeiro nível (pacotes e módulos do projeto), por custo cumulativo
+        costs = import_costs(run_probe(env, importtime=True)[1])
+        top_level = sorted((cost for cost in costs if '.' not in cost[3]), reverse=True)
+        print(f"\n{'cumulativo':>12} {'próprio':>10}  módulo")
+        for cumulative_us, self_us, depth, name in top_level[:args.top]:
+            print(f"{cumulative_us / 1000:10.1f} ms {self_us / 1000:7.1f} ms  {'  ' * depth}{name}")
+
+    failures = []
+    if args.max_import_ms is not None and medians['import'] > args.max_import_ms:
+        failures.append(f"import {medians['import']:.1f} ms > {args.max_import_ms:.1f} ms")
+    if args.max_first_request_ms is not None and medians['first_request'] > args.max_first_request_ms:
+        failures.append(f"primeira requisição {medians['first_request']:.1f} ms > "
+                        f"{args.max_first_request_ms:.1f} ms")
+    if failures:
+        sys.exit('Regressão de partida: ' + '; '.join(failures))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark do motor de simulação de cenários (ScenarioSweep)
+
+Grade padrão 100 câmbios × 100 quantidades × 10 fretes, com e sem
+eixo de preço de venda. Confere algumas células contra calculate_all_taxes.
+
+Uso: python benchmarks/bench_sweep.py [--rates 100] [--quantities 100] [--freights 10] [--prices 10]
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.scenario_sweep import ScenarioSweep
+from services.tax_calculator import BrazilianTaxCalculator
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rates', type=int, default=100)
+    parser.add_argument('--quantities', type=int, default=100)
+    parser.add_argument('--freights', type=int, default=10)
+    parser.add_argument('--prices', type=int, default=10)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    calculator = BrazilianTaxCalculator()
+    sweep = ScenarioSweep(calculator)
+    exchange_rates = ScenarioSweep.build_axis(5.25, 15, args.rates)
+    quantities = [10 * (i + 1) for i in range(args.quantities)]
+    freights = [500.0 * (i + 1) for i in range(args.freights)]
+    prices = [1500.0 + 100 * i for i in range(args.prices)]
+    params = dict(unit_value_usd=250.0, ncm_code='85171200', insurance_usd=120.0,
+                  exchange_rates=exchange_rates, quantities=quantities, freights=freights)
+
+    start = time.perf_counter()
+    result = sweep.run(**params)
+    elapsed = time.perf_counter() - start
+    cells = len(result['total_cost'])
+    print(f"custo: {cells:,} células em {elapsed * 1000:.1f} ms")
+
+    start = time.perf_counter()
+    with_prices = sweep.run(selling_prices=prices, **params)
+    elapsed = time.perf_counter() - start
+    print(f"custo + margem: {len(with_prices['net_margin']):,} células em {elapsed * 1000:.1f} ms")
+
+    # Conferência por amostragem contra a cascata completa
+    rnd = random.Random(0)
+    for _ in range(100):
+        r, q, f = (rnd.randrange(len(exchange_rates)), rnd.randrange(len(quantities)),
+                   rnd.randrange(len(freights)))
+        expected = calculator.calculate_all_taxes(250.0, quantities[q], '85171200', freights[f],
+                                                  120.0, exchange_rates[r])['summary']['total_cost']
+        index = (r * len(quantities) + q) * len(freights) + f
+        assert abs(result['total_cost'][index] - expected) < 0.01, (index, expected)
+        p = rnd.randrange(len(prices))
+        margin = calculator.calculate_profitability(
+            expected, prices[p] * quantities[q])['net_margin']
+        assert abs(with_prices['net_margin'][index * len(prices) + p] - margin) < 0.01, (index, margin)
+    print("conferência contra calculate_all_taxes: ok")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+import json
+
+import click
+
+from app import app
+from api import job_queue, scenario_repricer
+from routes import (calculation_exporter, calculation_archiver, analytics_rollup, ncm_service, rate_store,
+                    benefit_engine, trade_agreements)
+from services.analytics_export import AnalyticsExporter
+from services.ncm_ingestion import NcmIngestion
+from services.schema_migrations import SchemaMigrator
+
+# Comandos de linha de comando (flask --app main <comando>)
+
+@app.cli.command('migrate')
+def migrate():
+    """Cria ou atualiza o esquema do banco (executar antes de iniciar o servidor)"""
+    summary = SchemaMigrator(analytics_rollup).migrate()
+    click.echo(f"Esquema atualizado: {len(summary['columns'])} coluna(s) e "
+               f"{len(summary['indexes'])} índice(s) adicionados, "
+               f"tax_breakdown preenchido em {summary['tax_breakdowns']} cálculo(s), "
+               f"{summary['rollups']} linha(s) de agregados carregadas")
+
+@app.cli.command('worker')
+@click.option('--once', is_flag=True, help='Encerra quando não houver tarefas pendentes')
+@click.option('--poll-interval', default=1.0, show_default=True, help='Segundos entre consultas à fila')
+@click.option('--max-jobs', type=int, default=None, help='Encerra após executar este número de tarefas')
+def run_worker(once, poll_interval, max_jobs):
+    """Processa tarefas em segundo plano da tabela jobs"""
+    processed = job_queue.work(once=once, poll_interval=poll_interval, max_jobs=max_jobs)
+    click.echo(f"{processed} tarefa(s) executada(s)")
+
+@app.cli.command('export-analytics')
+@click.option('--output-dir', default='analytics', show_default=True, help='Diretório raiz dos arquivos Parquet')
+@click.option('--full', is_flag=True, help="Ignora a marca d'água e exporta todos os cálculos")
+def export_analytics(output_dir, full):
+    """Exporta cálculos novos ou alterados em Parquet particionado por mês"""
+    summary = AnalyticsExporter(calculation_exporter).export(output_dir, full=full)
+    click.echo(f"{summary['rows']} cálculo(s) exportado(s) em {len(summary['files'])} arquivo(s); "
+               f"marca d'água: {summary['watermark']}")
+
+@app.cli.command('backfill-tax-breakdown')
+@click.option('--batch-size', default=1000, show_default=True)
+def backfill_tax_breakdown(batch_size):
+    """Adiciona calculations.tax_breakdown, preenche a partir de tax_details e cria a visão de compatibilidade"""
+    migrator = SchemaMigrator()
+    for column in migrator.add_missing_columns():
+        click.echo(f"coluna adicionada: {column}")
+    for index in migrator.create_missing_indexes():
+        click.echo(f"índice criado: {index}")
+    click.echo(f"{migrator.backfill_tax_breakdown(batch_size)} cálculo(s) preenchido(s)")
+    migrator.create_tax_details_view()
+    click.echo(f"visão {SchemaMigrator.TAX_DETAILS_VIEW} criada")
+
+@app.cli.command('archive-calculations')
+@click.option('--older-than-days', type=int, default=None, help='Padrão: ARCHIVE_AFTER_DAYS')
+@click.option('--batch-size', type=int, default=None)
+def archive_calculations(older_than_days, batch_size):
+    """Move cálculos antigos para calculation_archives (compactados)"""
+    days = older_than_days if older_than_days is not None else app.config['ARCHIVE_AFTER_DAYS']
+    archived = calculation_archiver.archive(days, batch_size=batch_size)
+    click.echo(f"{archived} cálculo(s) arquivado(s)")
+
+@app.cli.command('refresh-rollups')
+@click.option('--user-id', default=None, help='Apenas este usuário (padrão: todos)')
+def refresh_rollups(user_id):
+    """Recalcula os agregados do dashboard (calculation_rollups)"""
+    rows = analytics_rollup.refresh(user_id)
+    click.echo(f"{rows} linha(s) de agregados gravada(s)")
+
+@app.cli.command('sync-ncm')
+@click.option('--nomenclature', default=NcmIngestion.NOMENCLATURE_URL, show_default=True,
+              help='JSON da nomenclatura NCM do Siscomex (arquivo ou URL)')
+@click.option('--tec', default=None, help='CSV da TEC com alíquotas do II (arquivo ou URL)')
+@click.option('--tipi', default=None, help='CSV da TIPI com alíquotas do IPI (arquivo ou URL)')
+@click.option('--valid-from', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Início de vigência das alíquotas da TEC/TIPI (padrão: hoje)')
+@click.option('--dry-run', is_flag=True, help='Apenas mostra as diferenças')
+def sync_ncm(nomenclature, tec, tipi, valid_from, dry_run):
+    """Sincroniza ncm_entries com a tabela oficial, aplicando apenas as mudanças"""
+    try:
+        summary = NcmIngestion().sync(nomenclature, tec=tec, tipi=tipi, dry_run=dry_run, rate_store=rate_store,
+                                      valid_from=valid_from.date() if valid_from else None)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"{summary['codes']} código(s): {summary['added']} novo(s), {summary['changed']} alterado(s), "
+               f"{summary['removed']} removido(s); versão {summary['version']}"
+               + (' (simulação)' if dry_run else ''))
+    for tax_type, written in summary['rate_versions'].items():
+        click.echo(f"{written} alíquota(s) de {tax_type} gravada(s) com vigência")
+
+@app.cli.command('crawl-ncm')
+@click.option('--url-template', required=True, help='URL da página de detalhe, com {code}')
+@click.option('--codes-file', type=click.File('r'), default=None,
+              help='Um código por linha (padrão: todos os códigos do catálogo)')
+@click.option('--cache-dir', default='ncm_crawl', show_default=True)
+@click.option('--workers', default=8, show_default=True)
+@click.option('--rate', default=2.0, show_default=True, help='Requisições por segundo por host')
+@click.option('--restart', is_flag=True, help='Ignora o checkpoint e recomeça a coleta')
+@click.option('--output', type=click.File('w'), default=None, help='NDJSON com o texto de cada código')
+def crawl_ncm(url_template, codes_file, cache_dir, workers, rate, restart, output):
+    """Coleta páginas de detalhe de NCM (concorrente, com cache e retomada)"""
+    from web_scraper import ncm_scraper
+
+    codes = [line.strip() for line in codes_file if line.strip()] if codes_file else sorted(ncm_service.ncm_database)
+    texts = ncm_scraper.crawl_ncm_pages(codes, url_template, cache_dir, max_workers=workers,
+                                        requests_per_second=rate, restart=restart)
+    if output:
+        for code, text in texts.items():
+            output.write(json.dumps({'code': code, 'text': text}, ensure_ascii=False) + '\n')
+    click.echo(f"{sum(1 for text in texts.values() if text)} de {len(texts)} página(s) com texto")
+
+@app.cli.command('load-rates')
+@click.option('--file', 'source', required=True, help='CSV com NCM e alíquota em % (arquivo ou URL)')
+@click.option('--tax-type', type=click.Choice(['II', 'IPI', 'PIS', 'COFINS', 'ICMS']), default='II', show_default=True)
+@click.option('--valid-from', type=click.DateTime(formats=['%Y-%m-%d']), required=True)
+@click.option('--source-name', default=None, help='Ato legal ou identificação da tabela')
+def load_rates(source, tax_type, valid_from, source_name):
+    """Grava alíquotas com vigência a partir de uma data (ex.: nova TEC)"""
+    ingestion = NcmIngestion()
+    rates = ingestion.parse_rates_csv(ingestion.read_source(source), (tax_type, 'TEC', 'ALÍQUOTA', 'ALIQUOTA'))
+    try:
+        written = rate_store.add_versions(tax_type, rates, valid_from.date(), source=source_name or source)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"{written} alíquota(s) de {tax_type} gravada(s) de {len(rates)} código(s) lidos")
+
+@app.cli.command('load-benefits')
+@click.argument('rules_file', type=click.File('r'))
+@click.option('--replace', is_flag=True, help='Substitui todas as regras cadastradas')
+def load_benefits(rules_file, replace):
+    """Grava regras de benefícios fiscais de um arquivo JSON (lista de regras)"""
+    rules = json.load(rules_file)
+    if not isinstance(rules, list):
+        raise click.ClickException('O arquivo deve conter uma lista JSON de regras')
+    try:
+        written = benefit_engine.load_rules(rules, replace=replace)
+    except (KeyError, ValueError) as e:
+        raise click.ClickException(str(e))
+    click.echo(f"{written} regra(s) de benefício gravada(s)")
+
+@app.cli.command('load-preferences')
+@click.argument('preferences_file', type=click.File('r'), required=False)
+@click.option('--defaults', is_flag=True, help='Inclui as preferências integrais de Mercosul e ACEs')
+@click.option('--replace', is_flag=True, help='Substitui todas as preferências cadastradas')
+def load_preferences(preferences_file, defaults, replace):
+    """Grava preferências tarifárias por país e prefixo de NCM (lista JSON e/ou padrões)"""
+    preferences = trade_agreements.default_preferences() if defaults else []
+    if preferences_file:
+        loaded = json.load(preferences_file)
+        if not isinstance(loaded, list):
+            raise click.ClickException('O arquivo deve conter uma lista JSON de preferências')
+        preferences.extend(loaded)
+    if not preferences:
+        raise click.ClickException('Informe um arquivo de preferências e/ou --defaults')
+    try:
+        written = trade_agreements.load(preferences, replace=replace)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"{written} preferência(s) tarifária(s) gravada(s)")
+
+@app.cli.command('reprice-scenarios')
+@click.option('--as-of', type=click.DateTime(formats=['%Y-%m-%d']), required=True)
+@click.option('--compare-to', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Padrão: véspera de --as-of')
+@click.option('--user-id', default=None, help='Apenas os cenários deste usuário')
+@click.option('--output', type=click.File('w'), default=None, help='JSON com o resultado por cenário')
+def reprice_scenarios(as_of, compare_to, user_id, output):
+    """Compara o custo dos cenários salvos entre duas datas de vigência de alíquotas"""
+    result = scenario_repricer.reprice(as_of.date(), compare_to.date() if compare_to else None, user_id=user_id)
+    if output:
+        json.dump(result, output, ensure_ascii=False, indent=2)
+    click.echo(f"{result['changed']} de {result['scenarios']} cenário(s) alterado(s) entre "
+               f"{result['compare_to']} e {result['as_of']}; variação total R$ {result['total_cost_delta']:,.2f}")
@@ -1,8 +1,10 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, FloatField, IntegerField, SelectField, TextAreaField, SubmitField
+from wtforms import StringField, PasswordField, FloatField, IntegerField, SelectField, TextAreaField, SubmitField, BooleanField
 from wtforms.validators import DataRequired, Email, Length, NumberRange, EqualTo, Optional
 from wtforms.widgets import NumberInput
 
+from services.icms_matrix import IcmsMatrix
+
 class LoginForm(FlaskForm):
     email = StringField('E-mail', validators=[DataRequired(), Email()], 
                        render_kw={'placeholder': 'seu@email.com', 'class': 'form-control'})
@@ -42,12 +44,27 @@ class ProductForm(FlaskForm):
     transport_mode = SelectField('Modalidade de Transporte', 
                                 choices=[('MARITIME', 'Marítimo'), ('AIR', 'Aéreo'), ('ROAD', 'Rodoviário')],
                                 validators=[DataRequired()], render_kw={'class': 'form-select'})
+    destination_state = SelectField('UF de Destino (ICMS)',
+                                    choices=[('', 'Média nacional')] + [(state, state) for state in IcmsMatrix.STATES],
+                                    validators=[Optional()], render_kw={'class': 'form-select'})
+    ex = IntegerField('Ex-tarifário (nº)', validators=[Optional(), NumberRange(min=1, max=999)],
+                      render_kw={'placeholder': 'Ex: 1', 'class': 'form-control'})
+    customs_regime = SelectField('Regime Aduaneiro',
+                                 choices=[('', 'Comum'), ('DRAWBACK', 'Drawback (suspensão)'), ('RECOF', 'Recof'),
+                                          ('REPETRO', 'Repetro'), ('ZFM', 'Zona Franca de Manaus')],
+                                 validators=[Optional()], render_kw={'class': 'form-select'})
 
 class CostForm(FlaskForm):
     freight_usd = FloatField('Frete Internacional (USD)', validators=[Optional(), NumberRange(min=0)], 
                             widget=NumberInput(step=0.01), render_kw={'placeholder': '0.00', 'class': 'form-control', 'value': '0'})
     insurance_usd = FloatField('Seguro (USD)', validators=[Optional(), NumberRange(min=0)], 
                               widget=NumberInput(step=0.01), render_kw={'placeholder': '0.00', 'class': 'form-control', 'value': '0'})
+    estimate_freight = BooleanField('Estimar frete e seguro pela tabela do modal',
+                                    render_kw={'class': 'form-check-input'})
+    gross_weight_kg = FloatField('Peso Bruto Total (kg)', validators=[Optional(), NumberRange(min=0)],
+                                 widget=NumberInput(step=0.001), render_kw={'placeholder': '0.000', 'class': 'form-control'})
+    volume_m3 = FloatField('Volume Total (m³)', validators=[Optional(), NumberRange(min=0)],
+                           widget=NumberInput(step=0.001), render_kw={'placeholder': '0.000', 'class': 'form-control'})
     clearance_fees_brl = FloatField('Taxas de Desembaraço (BRL)', validators=[Optional(), NumberRange(min=0)], 
                                    widget=NumberInput(step=0.01), render_kw={'placeholder': '0.00', 'class': 'form-control', 'value': '0'})
     broker_fees_brl = FloatField('Honorários Despachante (BRL)', validators=[Optional(), NumberRange(min=0)], 
@@ -0,0 +1,32 @@
+# Configuração do gunicorn (gunicorn --config gunicorn.conf.py main:app)
+#
+# preload_app importa a aplicação uma vez no processo mestre; o catálogo NCM
+# é carregado ali (when_ready) e os workers o herdam por fork, compartilhando
+# as páginas de memória (copy-on-write) em vez de cada um reconstruí-lo.
+# O esquema do banco é aplicado antes, por `flask --app main migrate`.
+import gc
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+preload_app = True
+reuse_port = True
+
+
+def when_ready(server):
+    """Processo mestre, após o preload e antes do fork dos workers"""
+    from app import app
+    from routes import ncm_service
+    with app.app_context():
+        ncm_service.warm_up()
+    # Objetos do mestre ficam fora das coletas do gc: contagens de referência
+    # à parte, as páginas herdadas não são copiadas pelos workers
+    gc.freeze()
+    server.log.info("Catálogo NCM pré-carregado no processo mestre")
+
+
+def post_fork(server, worker):
+    """Cada worker abre suas próprias conexões (nunca as herdadas do mestre)"""
+    from app import app, db
+    with app.app_context():
+        db.engine.dispose(close=False)
@@ -1,5 +1,11 @@
 from app import app
 import routes
+import api
+import commands
 
 if __name__ == "__main__":
+    # Servidor de desenvolvimento: aplica o esquema antes de iniciar
+    from services.schema_migrations import SchemaMigrator
+    with app.app_context():
+        SchemaMigrator(routes.analytics_rollup).migrate()
     app.run(host="0.0.0.0", port=5000, debug=True)
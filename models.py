@@ -1,6 +1,11 @@
 from datetime import datetime, timedelta
+import hashlib
 import secrets
+import uuid
+from flask import current_app
 from flask_login import UserMixin
+from sqlalchemy.dialects.postgresql import JSONB
+from itsdangerous import URLSafeTimedSerializer, BadSignature
 from werkzeug.security import generate_password_hash, check_password_hash
 from app import db
 
@@ -21,6 +26,7 @@ class User(UserMixin, db.Model):
     # Relationships
     calculations = db.relationship('Calculation', backref='user', lazy=True, cascade='all, delete-orphan')
     product_scenarios = db.relationship('ProductScenario', backref='user', lazy=True, cascade='all, delete-orphan')
+    shipments = db.relationship('Shipment', backref='user', lazy=True, cascade='all, delete-orphan')
     
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -46,9 +52,34 @@ class User(UserMixin, db.Model):
         """Clear the reset token after successful password reset"""
         self.reset_token = None
         self.reset_token_expires = None
+    
+    def _api_token_fingerprint(self):
+        """Fragment of the password hash: changing the password revokes issued API tokens"""
+        return hashlib.sha256(self.password_hash.encode()).hexdigest()[:16]
+    
+    def generate_api_token(self):
+        """Generate a signed API token that expires after API_TOKEN_MAX_AGE seconds"""
+        return URLSafeTimedSerializer(current_app.secret_key, salt='api-token').dumps(
+            {'uid': self.id, 'pwd': self._api_token_fingerprint()})
+    
+    @staticmethod
+    def verify_api_token(token):
+        """Return the id of the user of a valid, unexpired and unrevoked API token, or None"""
+        try:
+            data = URLSafeTimedSerializer(current_app.secret_key, salt='api-token').loads(
+                token, max_age=current_app.config['API_TOKEN_MAX_AGE'])
+        except BadSignature:
+            return None
+        user = db.session.get(User, data.get('uid')) if isinstance(data, dict) else None
+        if user is None or data.get('pwd') != user._api_token_fingerprint():
+            return None
+        return user.id
 
 class Calculation(db.Model):
     __tablename__ = 'calculations'
+    __table_args__ = (
+        db.Index('ix_calculations_user_created', 'user_id', 'created_at'),
+    )
     
     id = db.Column(db.String, primary_key=True, default=lambda: str(datetime.now().timestamp()).replace('.', ''))
     user_id = db.Column(db.String, db.ForeignKey('users.id'), nullable=False)
@@ -60,6 +91,11 @@ class Calculation(db.Model):
     quantity = db.Column(db.Integer, nullable=False)
     origin_country = db.Column(db.String(100), nullable=False)
     transport_mode = db.Column(db.Enum('MARITIME', 'AIR', 'ROAD', name='transport_mode'), nullable=False)
+    # UF de destino do ICMS (None: alíquota média nacional)
+    destination_state = db.Column(db.String(2), nullable=True)
+    # Ex-tarifário e regime aduaneiro declarados (benefícios fiscais)
+    ex = db.Column(db.Integer, nullable=True)
+    customs_regime = db.Column(db.String(30), nullable=True)
     exchange_rate = db.Column(db.Float, nullable=False)
     total_cost_usd = db.Column(db.Float, nullable=False)
     total_cost_brl = db.Column(db.Float, nullable=False)
@@ -68,18 +104,35 @@ class Calculation(db.Model):
     suggested_price = db.Column(db.Float, nullable=True)
     expected_revenue = db.Column(db.Float, nullable=True)
     profit_margin = db.Column(db.Float, nullable=True)
+    # Impostos desnormalizados: {tipo: {rate, base_value, amount}} (JSONB no PostgreSQL)
+    tax_breakdown = db.Column(db.JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), 'postgresql'), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     taxes = db.relationship('TaxDetail', backref='calculation', lazy=True, cascade='all, delete-orphan')
     costs = db.relationship('CostDetail', backref='calculation', lazy=True, cascade='all, delete-orphan')
+    
+    @staticmethod
+    def build_tax_breakdown(taxes):
+        """Dicionário de impostos a partir de calculate_all_taxes()['taxes'] ou de linhas TaxDetail"""
+        if isinstance(taxes, dict):
+            return {tax_type: {'rate': tax['rate'], 'base_value': tax['base_value'], 'amount': tax['amount']}
+                    for tax_type, tax in taxes.items()}
+        return {tax.tax_type: {'rate': tax.rate, 'base_value': tax.base_value, 'amount': tax.amount}
+                for tax in taxes}
+    
+    def get_tax_breakdown(self):
+        """Impostos do cálculo; cálculos anteriores à coluna tax_breakdown leem TaxDetail"""
+        if self.tax_breakdown is not None:
+            return self.tax_breakdown
+        return self.build_tax_breakdown(self.taxes)
 
 class TaxDetail(db.Model):
     __tablename__ = 'tax_details'
     
     id = db.Column(db.String, primary_key=True, default=lambda: str(datetime.now().timestamp()).replace('.', ''))
-    calculation_id = db.Column(db.String, db.ForeignKey('calculations.id'), nullable=False)
+    calculation_id = db.Column(db.String, db.ForeignKey('calculations.id'), nullable=False, index=True)
     tax_type = db.Column(db.Enum('II', 'IPI', 'PIS', 'COFINS', 'ICMS', 'OTHERS', name='tax_type'), nullable=False)
     rate = db.Column(db.Float, nullable=False)
     base_value = db.Column(db.Float, nullable=False)
@@ -90,7 +143,7 @@ class CostDetail(db.Model):
     __tablename__ = 'cost_details'
     
     id = db.Column(db.String, primary_key=True, default=lambda: str(datetime.now().timestamp()).replace('.', ''))
-    calculation_id = db.Column(db.String, db.ForeignKey('calculations.id'), nullable=False)
+    calculation_id = db.Column(db.String, db.ForeignKey('calculations.id'), nullable=False, index=True)
     cost_type = db.Column(db.Enum('FREIGHT', 'INSURANCE', 'CLEARANCE_FEES', 'BROKER_FEES', 'STORAGE', 'DOMESTIC_FREIGHT', 'MARKETING', 'PLATFORM_FEES', 'OTHER_COSTS', name='cost_type'), nullable=False)
     amount_usd = db.Column(db.Float, nullable=True)
     amount_brl = db.Column(db.Float, nullable=False)
@@ -112,9 +165,106 @@ class ProductScenario(db.Model):
     default_quantity = db.Column(db.Integer, default=1)
     freight_cost = db.Column(db.Float, nullable=True)
     insurance_cost = db.Column(db.Float, nullable=True)
+    # UF de destino do ICMS (None: alíquota média nacional)
+    destination_state = db.Column(db.String(2), nullable=True)
+    # Ex-tarifário e regime aduaneiro declarados (benefícios fiscais)
+    ex = db.Column(db.Integer, nullable=True)
+    customs_regime = db.Column(db.String(30), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class Shipment(db.Model):
+    """
+    Remessa (pedido de compra) com várias linhas de NCM: frete, seguro e
+    despesas de desembaraço/despachante da remessa são rateados entre as
+    linhas por allocation_basis (VALUE, WEIGHT ou QUANTITY). Custeada por
+    ShipmentCosting; os totais ficam gravados para listagem.
+    """
+    __tablename__ = 'shipments'
+    __table_args__ = (
+        db.Index('ix_shipments_user_created', 'user_id', 'created_at'),
+    )
+
+    id = db.Column(db.String, primary_key=True, default=lambda: str(datetime.now().timestamp()).replace('.', ''))
+    user_id = db.Column(db.String, db.ForeignKey('users.id'), nullable=False)
+    reference = db.Column(db.String(100), nullable=True)  # número do pedido / invoice
+    origin_country = db.Column(db.String(100), nullable=True)
+    transport_mode = db.Column(db.Enum('MARITIME', 'AIR', 'ROAD', name='transport_mode'), nullable=False)
+    destination_state = db.Column(db.String(2), nullable=True)
+    exchange_rate = db.Column(db.Float, nullable=False)
+    allocation_basis = db.Column(db.String(10), nullable=False, default='VALUE')
+    freight_usd = db.Column(db.Float, nullable=False, default=0)
+    insurance_usd = db.Column(db.Float, nullable=False, default=0)
+    clearance_fees_brl = db.Column(db.Float, nullable=False, default=0)
+    broker_fees_brl = db.Column(db.Float, nullable=False, default=0)
+    total_fob_usd = db.Column(db.Float, nullable=False)
+    total_cif_brl = db.Column(db.Float, nullable=False)
+    total_taxes_brl = db.Column(db.Float, nullable=False)
+    total_cost_brl = db.Column(db.Float, nullable=False)  # custo final, com despesas rateadas
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    items = db.relationship('ShipmentItem', backref='shipment', lazy=True, cascade='all, delete-orphan',
+                            order_by='ShipmentItem.line')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'reference': self.reference,
+            'origin_country': self.origin_country,
+            'transport_mode': self.transport_mode,
+            'destination_state': self.destination_state,
+            'exchange_rate': self.exchange_rate,
+            'allocation_basis': self.allocation_basis,
+            'freight_usd': self.freight_usd,
+            'insurance_usd': self.insurance_usd,
+            'clearance_fees_brl': self.clearance_fees_brl,
+            'broker_fees_brl': self.broker_fees_brl,
+            'total_fob_usd': self.total_fob_usd,
+            'total_cif_brl': self.total_cif_brl,
+            'total_taxes_brl': self.total_taxes_brl,
+            'total_cost_brl': self.total_cost_brl,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class ShipmentItem(db.Model):
+    """Linha de uma remessa, com as parcelas rateadas e os impostos calculados"""
+    __tablename__ = 'shipment_items'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    shipment_id = db.Column(db.String, db.ForeignKey('shipments.id'), nullable=False, index=True)
+    line = db.Column(db.Integer, nullable=False)
+    product_name = db.Column(db.String(200), nullable=True)
+    ncm_code = db.Column(db.String(10), nullable=False)
+    unit_value_usd = db.Column(db.Float, nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    gross_weight_kg = db.Column(db.Float, nullable=True)
+    ex = db.Column(db.Integer, nullable=True)
+    customs_regime = db.Column(db.String(30), nullable=True)
+    freight_usd = db.Column(db.Float, nullable=False)
+    insurance_usd = db.Column(db.Float, nullable=False)
+    fees_brl = db.Column(db.Float, nullable=False)
+    cif_brl = db.Column(db.Float, nullable=False)
+    ii = db.Column(db.Float, nullable=False)
+    ipi = db.Column(db.Float, nullable=False)
+    pis = db.Column(db.Float, nullable=False)
+    cofins = db.Column(db.Float, nullable=False)
+    icms = db.Column(db.Float, nullable=False)
+    total_taxes_brl = db.Column(db.Float, nullable=False)
+    total_cost_brl = db.Column(db.Float, nullable=False)  # custo final da linha, com despesas rateadas
+
+    # Colunas de ShipmentCosting.price()['lines'] gravadas em cada linha
+    COST_COLUMNS = {
+        'freight_usd': 'freight_usd', 'insurance_usd': 'insurance_usd', 'fees_brl': 'fees_brl',
+        'cif_brl': 'cif_brl', 'ii': 'II', 'ipi': 'IPI', 'pis': 'PIS', 'cofins': 'COFINS', 'icms': 'ICMS',
+        'total_taxes_brl': 'total_taxes', 'total_cost_brl': 'landed_cost'
+    }
+
+    def to_dict(self):
+        data = {column.name: getattr(self, column.name) for column in self.__table__.columns}
+        del data['shipment_id']
+        return data
+
 class NcmCache(db.Model):
     __tablename__ = 'ncm_cache'
     
@@ -130,6 +280,107 @@ class NcmCache(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     expires_at = db.Column(db.DateTime, nullable=False)
 
+class NcmEntry(db.Model):
+    """Código NCM da tabela oficial (Siscomex/TEC/TIPI), mantido por NcmIngestion"""
+    __tablename__ = 'ncm_entries'
+
+    # Chave natural: a carga completa insere ~10 mil códigos de uma vez
+    code = db.Column(db.String(8), primary_key=True)
+    description = db.Column(db.Text, nullable=False)
+    ii_rate = db.Column(db.Float, nullable=True)   # TEC (também em tax_rate_versions); None = catálogo interno
+    ipi_rate = db.Column(db.Float, nullable=True)  # TIPI
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class TaxRateVersion(db.Model):
+    """
+    Alíquota de um imposto para um NCM em um intervalo de vigência
+    [valid_from, valid_to); ncm_code '*' vale para todos os NCMs sem versão própria
+    """
+    __tablename__ = 'tax_rate_versions'
+    __table_args__ = (
+        db.Index('ix_tax_rate_versions_lookup', 'ncm_code', 'tax_type', 'valid_from'),
+    )
+
+    # Inteiro sequencial: versões são gravadas em lote (ex.: uma TEC inteira)
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    ncm_code = db.Column(db.String(8), nullable=False)
+    tax_type = db.Column(db.String(10), nullable=False)  # II, IPI, PIS, COFINS, ICMS
+    rate = db.Column(db.Float, nullable=False)
+    valid_from = db.Column(db.Date, nullable=False)
+    valid_to = db.Column(db.Date, nullable=True)  # exclusivo; None = vigente
+    source = db.Column(db.String(200), nullable=True)  # ato legal ou arquivo de origem
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'ncm_code': self.ncm_code,
+            'tax_type': self.tax_type,
+            'rate': self.rate,
+            'valid_from': self.valid_from.isoformat(),
+            'valid_to': self.valid_to.isoformat() if self.valid_to else None,
+            'source': self.source
+        }
+
+class TaxBenefit(db.Model):
+    """
+    Benefício fiscal declarado como dado (ex-tarifário, Drawback, regimes
+    especiais): alíquota substituta de um imposto para os NCMs que começam
+    por ncm_prefix, opcionalmente restrita a origem, número de ex e regime,
+    vigente em [valid_from, valid_to). Aplicado por TaxBenefitEngine.
+    """
+    __tablename__ = 'tax_benefits'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    name = db.Column(db.String(200), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)  # EX_TARIFARIO, DRAWBACK, REGIME, REDUCAO
+    ncm_prefix = db.Column(db.String(8), nullable=False)
+    tax_type = db.Column(db.String(10), nullable=False)  # II, IPI, PIS, COFINS, ICMS
+    rate = db.Column(db.Float, nullable=False)  # alíquota substituta (0 = isenção/suspensão)
+    origin_country = db.Column(db.String(100), nullable=True)  # None = qualquer origem
+    ex = db.Column(db.Integer, nullable=True)  # número do ex-tarifário (mesmo campo de NcmCache.ex)
+    regime = db.Column(db.String(30), nullable=True)  # regime que a operação precisa declarar
+    valid_from = db.Column(db.Date, nullable=True)
+    valid_to = db.Column(db.Date, nullable=True)  # exclusivo
+    priority = db.Column(db.Integer, nullable=False, default=0)
+    source = db.Column(db.String(200), nullable=True)  # ato legal (ex.: Resolução Gecex)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'kind': self.kind,
+            'ncm_prefix': self.ncm_prefix,
+            'tax_type': self.tax_type,
+            'rate': self.rate,
+            'origin_country': self.origin_country,
+            'ex': self.ex,
+            'regime': self.regime,
+            'valid_from': self.valid_from.isoformat() if self.valid_from else None,
+            'valid_to': self.valid_to.isoformat() if self.valid_to else None,
+            'priority': self.priority,
+            'source': self.source
+        }
+
+class TradePreference(db.Model):
+    """
+    Preferência tarifária de acordo comercial (Mercosul, ACEs): redução
+    percentual (margin, em fração) do II para mercadorias originárias de
+    country_code cujo NCM começa por ncm_prefix ('' = todos os NCMs),
+    vigente em [valid_from, valid_to). Aplicada por TradeAgreements.
+    """
+    __tablename__ = 'trade_preferences'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    agreement = db.Column(db.String(100), nullable=False)
+    country_code = db.Column(db.String(2), nullable=False)  # ISO 3166-1 alfa-2
+    ncm_prefix = db.Column(db.String(8), nullable=False, default='')
+    margin = db.Column(db.Float, nullable=False)  # 1.0 = isenção total do II; 0 = exclusão
+    valid_from = db.Column(db.Date, nullable=True)
+    valid_to = db.Column(db.Date, nullable=True)  # exclusivo
+    source = db.Column(db.String(200), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class ExchangeRateHistory(db.Model):
     __tablename__ = 'exchange_rate_history'
     
@@ -146,3 +397,95 @@ class SystemConfig(db.Model):
     value = db.Column(db.Text, nullable=False)
     description = db.Column(db.Text, nullable=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('ix_jobs_status_run_after', 'status', 'run_after'),
+    )
+    
+    # uuid: tarefas enfileiradas em sequência (lotes, testes) colidiriam com ids por timestamp
+    id = db.Column(db.String, primary_key=True, default=lambda: uuid.uuid4().hex)
+    user_id = db.Column(db.String, db.ForeignKey('users.id'), nullable=True)
+    kind = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.Enum('PENDING', 'RUNNING', 'SUCCEEDED', 'FAILED', name='job_status'), default='PENDING', nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')  # JSON
+    
+    # Progresso (0 a 1) e mensagem opcional
+    progress = db.Column(db.Float, default=0)
+    progress_message = db.Column(db.String(200), nullable=True)
+    
+    # Tentativas e reagendamento
+    attempts = db.Column(db.Integer, default=0)
+    max_attempts = db.Column(db.Integer, default=3)
+    run_after = db.Column(db.DateTime, default=datetime.utcnow)
+    locked_by = db.Column(db.String(100), nullable=True)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    
+    # Resultado (handlers em streaming gravam em job_result_chunks e deixam result vazio)
+    result = db.Column(db.LargeBinary, nullable=True)
+    result_size = db.Column(db.BigInteger, nullable=True)  # bytes
+    result_content_type = db.Column(db.String(100), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': self.progress,
+            'progress_message': self.progress_message,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'error': self.error,
+            'has_result': self.result is not None or self.result_size is not None,
+            'result_size': self.result_size,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class JobResultChunk(db.Model):
+    """Bloco do resultado de uma tarefa gravado em streaming (JobQueue.run)"""
+    __tablename__ = 'job_result_chunks'
+
+    job_id = db.Column(db.String, db.ForeignKey('jobs.id', ondelete='CASCADE'), primary_key=True)
+    position = db.Column(db.Integer, primary_key=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+
+class CalculationArchive(db.Model):
+    __tablename__ = 'calculation_archives'
+    __table_args__ = (
+        db.Index('ix_calculation_archives_user_month', 'user_id', 'month'),
+    )
+    
+    # uuid: um lote grava vários registros antes do flush (ids por timestamp colidiriam)
+    id = db.Column(db.String, primary_key=True, default=lambda: uuid.uuid4().hex)
+    user_id = db.Column(db.String, db.ForeignKey('users.id'), nullable=False)
+    month = db.Column(db.String(7), nullable=False)  # AAAA-MM de created_at
+    row_count = db.Column(db.Integer, nullable=False)
+    first_created_at = db.Column(db.DateTime, nullable=False)
+    last_created_at = db.Column(db.DateTime, nullable=False)
+    # NDJSON compactado com zlib (linhas no formato de CalculationExporter.COLUMNS)
+    data = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class CalculationRollup(db.Model):
+    """Agregados de cálculos por usuário, mês, capítulo NCM e origem (mantidos por AnalyticsRollup)"""
+    __tablename__ = 'calculation_rollups'
+
+    user_id = db.Column(db.String, db.ForeignKey('users.id'), primary_key=True)
+    month = db.Column(db.String(7), primary_key=True)  # AAAA-MM de created_at
+    ncm_chapter = db.Column(db.String(2), primary_key=True)
+    origin_country = db.Column(db.String(100), primary_key=True)
+    calculation_count = db.Column(db.Integer, nullable=False, default=0)
+    cif_brl_sum = db.Column(db.Float, nullable=False, default=0)
+    taxes_brl_sum = db.Column(db.Float, nullable=False, default=0)
+    # Soma das alíquotas efetivas (impostos / CIF) de cada cálculo; média = soma / contagem
+    effective_rate_sum = db.Column(db.Float, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
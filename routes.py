@@ -1,19 +1,40 @@
-from flask import render_template, request, redirect, url_for, flash, jsonify, session
+from flask import render_template, request, redirect, url_for, flash, jsonify, session, Response, stream_with_context
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import check_password_hash
+from datetime import date, datetime, timedelta, timezone
+import hashlib
 import logging
+import math
+import re
 
 from app import app, db
 from models import User, Calculation, TaxDetail, CostDetail, ProductScenario
 from forms import LoginForm, RegisterForm, ProductForm, CostForm, ProfitabilityForm, ScenarioForm, ForgotPasswordForm, ResetPasswordForm
-from services.tax_calculator import BrazilianTaxCalculator
+from services.tax_calculator import BenefitContext, BrazilianTaxCalculator
+from services.rate_store import RateStore
+from services.tax_benefits import TaxBenefitEngine
+from services.trade_agreements import TradeAgreements
 from services.currency_service import CurrencyService
+from services.freight_estimator import FreightEstimator
 from services.ncm_service import NCMService
+from services.calculation_export import CalculationExporter
+from services.calculation_archive import CalculationArchiver
+from services.analytics_rollup import AnalyticsRollup
+from services.tax_spec import TAX_SPEC
 
 # Initialize services
-tax_calculator = BrazilianTaxCalculator()
+rate_store = RateStore()
+benefit_engine = TaxBenefitEngine()
+trade_agreements = TradeAgreements()
+tax_calculator = BrazilianTaxCalculator(rate_store=rate_store, benefit_engine=benefit_engine,
+                                        trade_agreements=trade_agreements)
 currency_service = CurrencyService()
+freight_estimator = (FreightEstimator.from_file(app.config['FREIGHT_TARIFFS_FILE'])
+                     if app.config['FREIGHT_TARIFFS_FILE'] else FreightEstimator())
 ncm_service = NCMService()
+calculation_exporter = CalculationExporter()
+calculation_archiver = CalculationArchiver(calculation_exporter)
+analytics_rollup = AnalyticsRollup(calculation_archiver)
 
 @app.route('/')
 def index():
@@ -26,8 +47,12 @@ def index():
 @login_required
 def dashboard():
     """Dashboard principal do usuário"""
-    # Estatísticas do usuário
-    total_calculations = Calculation.query.filter_by(user_id=current_user.id).count()
+    # Estatísticas do usuário (agregados incluem cálculos arquivados); cálculos
+    # anteriores aos agregados ainda não carregados por migrate são somados agora
+    analytics_rollup.refresh_missing(current_user.id)
+    since_month = (datetime.utcnow() - timedelta(days=365)).strftime('%Y-%m')
+    summary = analytics_rollup.summary(current_user.id, since_month=since_month, limit=5)
+    total_calculations = analytics_rollup.totals(current_user.id)['calculations']
     recent_calculations = Calculation.query.filter_by(user_id=current_user.id)\
                                          .order_by(Calculation.created_at.desc())\
                                          .limit(5).all()
@@ -36,7 +61,8 @@ def dashboard():
     return render_template('dashboard.html', 
                          total_calculations=total_calculations,
                          recent_calculations=recent_calculations,
-                         saved_scenarios=saved_scenarios)
+                         saved_scenarios=saved_scenarios,
+                         summary=summary)
 
 # Rotas de Autenticação
 @app.route('/login', methods=['GET', 'POST'])
@@ -171,7 +197,10 @@ def new_calculation():
     return render_template('calculator/new_calculation.html', 
                          product_form=product_form,
                          cost_form=cost_form,
-                         current_rate=current_rate)
+                         current_rate=current_rate,
+                         ncm_catalogue_version=ncm_service.catalogue_version,
+                         tax_spec=TAX_SPEC,
+                         icms_matrix=tax_calculator.icms_matrix.to_dict())
 
 @app.route('/calcular', methods=['POST'])
 @login_required
@@ -185,14 +214,31 @@ def calculate():
             # Obter cotação atual
             exchange_rate = currency_service.get_usd_brl_rate()
             
+            # Frete e seguro: digitados ou estimados pela tabela do modal
+            freight_usd = cost_form.freight_usd.data or 0
+            insurance_usd = cost_form.insurance_usd.data or 0
+            if cost_form.estimate_freight.data:
+                freight_estimate = freight_estimator.estimate(
+                    product_form.transport_mode.data,
+                    product_form.origin_country.data,
+                    product_form.unit_value_usd.data * product_form.quantity.data,
+                    cost_form.gross_weight_kg.data or 0,
+                    cost_form.volume_m3.data or 0
+                )
+                freight_usd = freight_estimate['freight_usd']
+                insurance_usd = freight_estimate['insurance_usd']
+            
             # Realizar cálculos
             calculation_result = tax_calculator.calculate_all_taxes(
                 unit_value_usd=product_form.unit_value_usd.data,
                 quantity=product_form.quantity.data,
                 ncm_code=product_form.ncm_code.data,
-                freight_usd=cost_form.freight_usd.data or 0,
-                insurance_usd=cost_form.insurance_usd.data or 0,
-                exchange_rate=exchange_rate
+                freight_usd=freight_usd,
+                insurance_usd=insurance_usd,
+                exchange_rate=exchange_rate,
+                destination_state=product_form.destination_state.data or None,
+                context=BenefitContext.build(product_form.origin_country.data, product_form.ex.data,
+                                             product_form.customs_regime.data)
             )
             
             # Salvar no banco
@@ -205,31 +251,39 @@ def calculate():
                 quantity=product_form.quantity.data,
                 origin_country=product_form.origin_country.data,
                 transport_mode=product_form.transport_mode.data,
+                destination_state=product_form.destination_state.data or None,
+                ex=product_form.ex.data,
+                customs_regime=product_form.customs_regime.data or None,
                 exchange_rate=exchange_rate,
                 total_cost_usd=calculation_result['customs_values']['cif_usd'],
                 total_cost_brl=calculation_result['customs_values']['cif_brl'],
                 total_taxes_brl=calculation_result['summary']['total_taxes'],
-                final_cost_brl=calculation_result['summary']['total_cost']
+                final_cost_brl=calculation_result['summary']['total_cost'],
+                tax_breakdown=Calculation.build_tax_breakdown(calculation_result['taxes'])
             )
             
             db.session.add(calculation)
             db.session.flush()  # Para obter o ID
+            analytics_rollup.record(calculation)
             
-            # Salvar detalhes dos impostos
-            for tax_type, tax_data in calculation_result['taxes'].items():
-                tax_detail = TaxDetail(
-                    calculation_id=calculation.id,
-                    tax_type=tax_type,
-                    rate=tax_data['rate'],
-                    base_value=tax_data['base_value'],
-                    amount=tax_data['amount']
-                )
-                db.session.add(tax_detail)
+            # Salvar detalhes dos impostos (compatibilidade; ver TAX_DETAIL_ROWS)
+            if app.config['TAX_DETAIL_ROWS']:
+                for tax_type, tax_data in calculation_result['taxes'].items():
+                    tax_detail = TaxDetail(
+                        calculation_id=calculation.id,
+                        tax_type=tax_type,
+                        rate=tax_data['rate'],
+                        base_value=tax_data['base_value'],
+                        amount=tax_data['amount']
+                    )
+                    db.session.add(tax_detail)
             
             # Salvar custos adicionais
             additional_costs = [
-                ('FREIGHT', cost_form.freight_usd.data, cost_form.freight_usd.data * exchange_rate if cost_form.freight_usd.data else 0, 'Frete Internacional'),
-                ('INSURANCE', cost_form.insurance_usd.data, cost_form.insurance_usd.data * exchange_rate if cost_form.insurance_usd.data else 0, 'Seguro'),
+                ('FREIGHT', freight_usd, freight_usd * exchange_rate,
+                 'Frete Internacional (estimado)' if cost_form.estimate_freight.data else 'Frete Internacional'),
+                ('INSURANCE', insurance_usd, insurance_usd * exchange_rate,
+                 'Seguro (estimado)' if cost_form.estimate_freight.data else 'Seguro'),
                 ('CLEARANCE_FEES', None, cost_form.clearance_fees_brl.data or 0, 'Taxas de Desembaraço'),
                 ('BROKER_FEES', None, cost_form.broker_fees_brl.data or 0, 'Honorários Despachante'),
                 ('STORAGE', None, cost_form.storage_cost_brl.data or 0, 'Custo de Armazenagem'),
@@ -256,7 +310,11 @@ def calculate():
             
             flash('Cálculo realizado com sucesso!', 'success')
             return redirect(url_for('calculation_results', calc_id=calculation.id))
-            
+
+        except ValueError as e:
+            # Ex.: modal sem tarifa de frete para a origem informada
+            db.session.rollback()
+            flash(str(e), 'danger')
         except Exception as e:
             db.session.rollback()
             flash('Erro ao realizar cálculo. Tente novamente.', 'danger')
@@ -275,7 +333,10 @@ def calculate():
     return render_template('calculator/new_calculation.html', 
                          product_form=product_form,
                          cost_form=cost_form,
-                         current_rate=current_rate)
+                         current_rate=current_rate,
+                         ncm_catalogue_version=ncm_service.catalogue_version,
+                         tax_spec=TAX_SPEC,
+                         icms_matrix=tax_calculator.icms_matrix.to_dict())
 
 @app.route('/resultados/<calc_id>')
 @login_required
@@ -284,16 +345,15 @@ def calculation_results(calc_id):
     calculation = Calculation.query.filter_by(id=calc_id, user_id=current_user.id).first_or_404()
     
     # Obter detalhes dos impostos e custos
-    taxes = TaxDetail.query.filter_by(calculation_id=calc_id).all()
     costs = CostDetail.query.filter_by(calculation_id=calc_id).all()
     
     # Preparar dados para exibição
     tax_breakdown = {}
-    for tax in taxes:
-        tax_breakdown[tax.tax_type] = {
-            'rate': tax.rate * 100,
-            'base_value': tax.base_value,
-            'amount': tax.amount
+    for tax_type, tax in calculation.get_tax_breakdown().items():
+        tax_breakdown[tax_type] = {
+            'rate': tax['rate'] * 100,
+            'base_value': tax['base_value'],
+            'amount': tax['amount']
         }
     
     cost_breakdown = []
@@ -333,7 +393,8 @@ def calculate_profitability(calc_id):
                     'storage': form.storage_cost_brl.data or 0,
                     'marketing': form.marketing_cost_brl.data or 0,
                     'platform_fees_rate': form.platform_fees_rate.data or 0
-                }
+                },
+                sale_icms_rate=tax_calculator.get_sale_icms_rate(calculation.ncm_code, calculation.destination_state)
             )
             
             # Atualizar cálculo
@@ -363,6 +424,63 @@ def calculate_profitability(calc_id):
         'error': 'Dados inválidos'
     }), 400
 
+def _get_query_number(field, default=None, minimum=None, maximum=None, exclusive=False):
+    """
+    Parâmetro numérico da query string (None se ausente e sem padrão), levantando
+    ValueError se inválido ou fora de [minimum, maximum] (exclusive: limites abertos)
+    """
+    value = request.args.get(field)
+    if value is None or value == '':
+        return default
+    try:
+        value = float(value)
+    except ValueError:
+        value = None
+    if value is None or not math.isfinite(value):
+        raise ValueError(f'Valor inválido para {field}')
+    if minimum is not None and (value <= minimum if exclusive else value < minimum):
+        raise ValueError(f'{field} deve ser maior que {minimum}' if exclusive
+                         else f'{field} deve ser maior ou igual a {minimum}')
+    if maximum is not None and (value >= maximum if exclusive else value > maximum):
+        raise ValueError(f'{field} deve ser menor que {maximum}' if exclusive
+                         else f'{field} deve ser menor ou igual a {maximum}')
+    return value
+
+@app.route('/api/preco-alvo/<calc_id>')
+@login_required
+def api_target_price(calc_id):
+    """Preço de equilíbrio e preço para margem/ROI alvo (sem gravar no cálculo)"""
+    calculation = Calculation.query.filter_by(id=calc_id, user_id=current_user.id).first_or_404()
+    
+    try:
+        # Margem líquida alvo abaixo de 100%, ROI alvo acima de -100%, taxa de plataforma em %
+        target_net_margin = _get_query_number('margem', maximum=100, exclusive=True)
+        target_roi = _get_query_number('roi', minimum=-100, exclusive=True)
+        result = tax_calculator.solve_selling_price(
+            total_cost_brl=calculation.final_cost_brl,
+            additional_costs={
+                'storage': _get_query_number('armazenagem', 0, minimum=0),
+                'marketing': _get_query_number('marketing', 0, minimum=0),
+                'platform_fees_rate': _get_query_number('taxa_plataforma', 0, minimum=0, maximum=100)
+            },
+            target_net_margin=target_net_margin,
+            target_roi=target_roi,
+            sale_icms_rate=tax_calculator.get_sale_icms_rate(calculation.ncm_code, calculation.destination_state)
+        )
+        return jsonify({
+            'success': True,
+            'data': result
+        })
+        
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logging.error(f"Erro no cálculo de preço alvo: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Erro ao calcular preço alvo'
+        }), 500
+
 @app.route('/historico')
 @login_required
 def calculation_history():
@@ -372,7 +490,48 @@ def calculation_history():
                                    .order_by(Calculation.created_at.desc())\
                                    .paginate(page=page, per_page=20, error_out=False)
     
-    return render_template('calculator/history.html', calculations=calculations)
+    return render_template('calculator/history.html',
+                         calculations=calculations,
+                         archived_months=calculation_archiver.list_months(current_user.id))
+
+@app.route('/historico/arquivo/<month>')
+@login_required
+def archived_calculations(month):
+    """Cálculos arquivados de um mês (AAAA-MM), paginados"""
+    if not re.fullmatch(r'\d{4}-(0[1-9]|1[0-2])', month):
+        flash('Mês inválido.', 'danger')
+        return redirect(url_for('calculation_history'))
+    page = max(request.args.get('page', 1, type=int), 1)
+    archive = calculation_archiver.page(current_user.id, month, page, per_page=50)
+    if not archive['total']:
+        flash('Nenhum cálculo arquivado neste mês.', 'warning')
+        return redirect(url_for('calculation_history'))
+    return render_template('calculator/archive.html', month=month, archive=archive)
+
+def export_calculations(user_id, export_format):
+    """Exportação do histórico de um usuário, incluindo cálculos arquivados"""
+    return calculation_exporter.export(user_id, export_format,
+                                       archived_chunks=calculation_archiver.iter_chunks(user_id))
+
+def export_response(user_id, export_format):
+    """Resposta em streaming com a exportação do histórico de um usuário"""
+    mimetype = CalculationExporter.FORMATS[export_format][0]
+    response = Response(stream_with_context(export_calculations(user_id, export_format)),
+                        mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{calculation_exporter.filename(export_format)}"'
+    # Evita que proxies acumulem a resposta antes de repassá-la
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/historico/exportar')
+@login_required
+def export_calculation_history():
+    """Exportar histórico de cálculos (CSV, NDJSON ou XLSX)"""
+    export_format = request.args.get('formato', 'csv')
+    if export_format not in CalculationExporter.FORMATS:
+        flash('Formato de exportação inválido.', 'danger')
+        return redirect(url_for('calculation_history'))
+    return export_response(current_user.id, export_format)
 
 @app.route('/cenarios')
 @login_required
@@ -401,7 +560,10 @@ def save_scenario(calc_id):
                 origin_country=calculation.origin_country,
                 transport_mode=calculation.transport_mode,
                 exchange_rate=calculation.exchange_rate,
-                default_quantity=calculation.quantity
+                default_quantity=calculation.quantity,
+                destination_state=calculation.destination_state,
+                ex=calculation.ex,
+                customs_regime=calculation.customs_regime
             )
             
             db.session.add(scenario)
@@ -418,6 +580,33 @@ def save_scenario(calc_id):
     return jsonify({'success': False, 'error': 'Nome inválido'}), 400
 
 # APIs de apoio
+def _conditional_json(etag, build_payload, max_age, private=False, last_modified=None):
+    """
+    Resposta JSON com suporte a requisições condicionais (ETag / Last-Modified).
+    O payload só é construído e serializado quando o cliente não tem a versão atual.
+    """
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    elif last_modified is not None and request.if_modified_since is not None:
+        not_modified = last_modified.replace(microsecond=0) <= request.if_modified_since
+    else:
+        not_modified = False
+    
+    if not_modified:
+        response = app.response_class(status=304)
+    else:
+        response = jsonify(build_payload())
+    
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    if private:
+        response.cache_control.private = True
+    else:
+        response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    return response
+
 @app.route('/api/ncm/buscar')
 def api_search_ncm():
     """API para buscar códigos NCM"""
@@ -426,30 +615,131 @@ def api_search_ncm():
         if len(query) < 2:
             return jsonify([])
         
-        results = ncm_service.search_ncm(query)
-        return jsonify(results if results else [])
+        query_hash = hashlib.sha1(query.lower().encode('utf-8')).hexdigest()[:16]
+        etag = f"ncm-{ncm_service.catalogue_version}-{query_hash}"
+        return _conditional_json(
+            etag,
+            lambda: ncm_service.search_ncm(query) or [],
+            max_age=3600
+        )
     except Exception as e:
         logging.error(f"Erro na busca NCM: {str(e)}")
         return jsonify([])  # Retorna lista vazia ao invés de erro
 
+@app.route('/api/ncm/catalogo')
+def api_ncm_catalogue():
+    """API com o catálogo NCM completo e comprimido para busca offline"""
+    version = ncm_service.catalogue_version
+    etag = f"catalogue-{version}"
+
+    encoding = 'identity'
+    for candidate in ncm_service.get_catalogue_encodings():
+        if candidate in request.accept_encodings:
+            encoding = candidate
+            break
+
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(ncm_service.get_catalogue_blob(encoding),
+                                      mimetype='application/json')
+        if encoding != 'identity':
+            response.content_encoding = encoding
+
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    if request.args.get('v') == version:
+        # URL versionada: conteúdo nunca muda
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.max_age = 300
+    return response
+
 @app.route('/api/ncm/<ncm_code>')
 @login_required
 def api_get_ncm(ncm_code):
     """API para obter informações de um NCM"""
+    etag = f"ncm-{ncm_service.catalogue_version}-{ncm_code}"
+    if request.if_none_match.contains(etag):
+        return _conditional_json(etag, dict, max_age=3600, private=True)
+    
     ncm_info = ncm_service.get_ncm_info(ncm_code)
     if ncm_info:
-        return jsonify(ncm_info)
+        return _conditional_json(etag, lambda: ncm_info, max_age=3600, private=True)
     return jsonify({'error': 'NCM não encontrado'}), 404
 
+@app.route('/api/aliquotas/<ncm_code>')
+@login_required
+def api_get_tax_rates(ncm_code):
+    """
+    Alíquotas resolvidas pelo servidor para a prévia de cálculo (TaxCascade):
+    especificação, versões do RateStore, ICMS da UF (uf), benefícios do
+    ex-tarifário (ex) e do regime (regime) e preferência tarifária do país de
+    origem (origem) vigentes hoje
+    """
+    try:
+        ncm_code = ncm_code.strip()
+        if not re.fullmatch(r'\d{8}', ncm_code):
+            raise ValueError('Código NCM deve ter 8 dígitos')
+        state = tax_calculator.icms_matrix.normalize_state(request.args.get('uf'))
+        ex = _get_query_number('ex', minimum=1)
+        if ex is not None and not ex.is_integer():
+            raise ValueError('Valor inválido para ex')
+        regime = request.args.get('regime', '').strip().upper() or None
+        if regime is not None and regime not in TaxBenefitEngine.REGIMES:
+            raise ValueError(f'Regime inválido: {regime}')
+        context = BenefitContext.build(request.args.get('origem'), int(ex) if ex is not None else None, regime)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    today = date.today()
+    operation = '-'.join(str(value or '') for value in (state, *(context or BenefitContext())))
+    etag = f"aliquotas-{tax_calculator.rates_version()}-{today.isoformat()}-{ncm_code}-{operation}"
+    return _conditional_json(
+        etag,
+        lambda: {
+            'success': True,
+            'data': {
+                'ncm_code': ncm_code,
+                'destination_state': state,
+                'spec_version': TAX_SPEC['version'],
+                'origin_country': context.origin_country if context else None,
+                'rates': tax_calculator.get_tax_rates(ncm_code, today, state, context),
+                'benefits': tax_calculator.get_benefits(ncm_code, today, context),
+                'trade_preference': tax_calculator.get_trade_preference(ncm_code, today, context)
+            }
+        },
+        max_age=300,
+        private=True
+    )
+
 @app.route('/api/cotacao')
 @login_required
 def api_get_exchange_rate():
     """API para obter cotação atual"""
     rate = currency_service.get_usd_brl_rate()
-    return jsonify({
+    payload = lambda: {
         'rate': rate,
         'formatted': currency_service.format_currency_brl(rate)
-    })
+    }
+    
+    timestamp = currency_service.get_rate_timestamp()
+    if timestamp is None:
+        # Cotação padrão (APIs indisponíveis): não deve ser reaproveitada
+        response = jsonify(payload())
+        response.cache_control.no_cache = True
+        return response
+    
+    last_modified = timestamp.astimezone(timezone.utc)
+    etag = f"rate-{int(last_modified.timestamp())}-{rate:.6f}"
+    return _conditional_json(
+        etag, payload,
+        max_age=currency_service.get_cache_remaining_seconds(),
+        private=True,
+        last_modified=last_modified
+    )
 
 # Error handlers
 @app.errorhandler(404)
@@ -0,0 +1,156 @@
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import or_
+
+from app import db
+from models import Calculation, SystemConfig
+from services.calculation_export import CalculationExporter, CALCULATION_COLUMNS
+
+class AnalyticsExporter:
+    """
+    Exportação incremental de cálculos em Parquet para BI.
+
+    Uma linha por cálculo com impostos e custos pivotados em colunas,
+    particionada por mês de criação (month=AAAA-MM/). Cada execução exporta
+    apenas cálculos alterados desde a marca d'água gravada em system_config
+    (maior updated_at exportado e os ids exportados com esse mesmo
+    updated_at, para não perder cálculos gravados depois com horário igual)
+    e cria um novo arquivo por mês afetado; como cálculos podem ser
+    atualizados, o consumidor deve manter a versão de maior updated_at por id.
+
+    Requer pyarrow (dependência opcional, importada apenas aqui).
+    """
+
+    WATERMARK_KEY = 'analytics_export_watermark'
+    ANALYTICS_COLUMNS = ('user_id',) + CALCULATION_COLUMNS + ('updated_at',)
+    # Colunas de baixa cardinalidade gravadas com codificação de dicionário
+    DICTIONARY_COLUMNS = ('ncm_code', 'origin_country', 'transport_mode')
+    # Linhas por row group e limite de linhas em memória somando todos os meses
+    ROW_GROUP_SIZE = 64_000
+    MAX_BUFFERED_ROWS = 256_000
+
+    def __init__(self, calculation_exporter: CalculationExporter):
+        self.logger = logging.getLogger(__name__)
+        self.calculation_exporter = calculation_exporter
+
+    def get_watermark(self) -> Tuple[Optional[datetime], List[str]]:
+        """Maior updated_at exportado e ids já exportados com exatamente esse updated_at"""
+        config = SystemConfig.query.filter_by(key=self.WATERMARK_KEY).first()
+        if config is None:
+            return None, []
+        try:
+            data = json.loads(config.value)
+        except ValueError:
+            # Formato anterior (só o horário): cálculos nesse horário são reexportados
+            return datetime.fromisoformat(config.value), []
+        return datetime.fromisoformat(data['updated_at']), data['ids']
+
+    def set_watermark(self, watermark: datetime, ids: List[str]):
+        config = SystemConfig.query.filter_by(key=self.WATERMARK_KEY).first()
+        if config is None:
+            config = SystemConfig(key=self.WATERMARK_KEY,
+                                  description="Maior updated_at já exportado para Parquet e ids nesse horário")
+            db.session.add(config)
+        config.value = json.dumps({'updated_at': watermark.isoformat(), 'ids': ids})
+        db.session.commit()
+
+    def _schema(self, pa):
+        """Esquema Arrow: texto, números, datas e colunas de dicionário"""
+        fields = []
+        for name in self.ANALYTICS_COLUMNS + tuple(CalculationExporter.PIVOT_COLUMNS):
+            if name in self.DICTIONARY_COLUMNS:
+                field_type = pa.dictionary(pa.int32(), pa.string())
+            elif name in ('id', 'user_id', 'product_name', 'description'):
+                field_type = pa.string()
+            elif name == 'quantity':
+                field_type = pa.int64()
+            elif name in ('created_at', 'updated_at'):
+                field_type = pa.timestamp('us')
+            else:
+                field_type = pa.float64()
+            fields.append(pa.field(name, field_type))
+        return pa.schema(fields)
+
+    def export(self, output_dir: str, full: bool = False) -> Dict:
+        """
+        Exporta os cálculos novos ou alterados desde a última execução
+        (full=True ignora a marca d'água). Retorna um resumo da execução.
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError('Exportação Parquet requer o pacote pyarrow (pip install pyarrow)')
+
+        watermark, watermark_ids = (None, []) if full else self.get_watermark()
+        criteria = []
+        if watermark is not None:
+            # >= com desempate pelos ids já exportados no próprio horário da marca d'água
+            criteria.append(Calculation.updated_at >= watermark)
+            if watermark_ids:
+                criteria.append(or_(Calculation.updated_at > watermark, Calculation.id.notin_(watermark_ids)))
+        schema = self._schema(pa)
+        run_id = datetime.utcnow().strftime('%Y%m%dT%H%M%S')
+
+        writers = {}
+        buffers = {}
+        rows_exported = 0
+        new_watermark, new_ids = watermark, list(watermark_ids)
+
+        def flush(month):
+            if month not in writers:
+                partition = os.path.join(output_dir, f'month={month}')
+                os.makedirs(partition, exist_ok=True)
+                path = os.path.join(partition, f'part-{run_id}.parquet')
+                writers[month] = (path, pq.ParquetWriter(
+                    path + '.tmp', schema, compression='zstd',
+                    use_dictionary=list(self.DICTIONARY_COLUMNS)
+                ))
+            writers[month][1].write_table(pa.Table.from_pylist(buffers.pop(month), schema=schema))
+
+        try:
+            for rows in self.calculation_exporter.iter_pivoted_chunks(
+                    self.ANALYTICS_COLUMNS, criteria, [Calculation.updated_at, Calculation.id]):
+                for row in rows:
+                    buffers.setdefault(row['created_at'].strftime('%Y-%m'), []).append(row)
+                    # Linhas em ordem de (updated_at, id)
+                    if new_watermark is None or row['updated_at'] > new_watermark:
+                        new_watermark, new_ids = row['updated_at'], [row['id']]
+                    elif row['updated_at'] == new_watermark:
+                        new_ids.append(row['id'])
+                rows_exported += len(rows)
+
+                for month in [month for month, buffer in buffers.items() if len(buffer) >= self.ROW_GROUP_SIZE]:
+                    flush(month)
+                if sum(len(buffer) for buffer in buffers.values()) > self.MAX_BUFFERED_ROWS:
+                    for month in list(buffers):
+                        flush(month)
+
+            for month in list(buffers):
+                flush(month)
+        except Exception:
+            for path, writer in writers.values():
+                writer.close()
+                os.remove(path + '.tmp')
+            raise
+
+        # Arquivos só ficam visíveis (e a marca d'água só avança) após a gravação completa
+        files = []
+        for path, writer in writers.values():
+            writer.close()
+            os.replace(path + '.tmp', path)
+            files.append(path)
+        if new_watermark is not None and (new_watermark, new_ids) != (watermark, watermark_ids):
+            self.set_watermark(new_watermark, new_ids)
+
+        self.logger.info(f"Exportação analítica: {rows_exported} cálculos em {len(files)} arquivo(s)")
+        return {
+            'rows': rows_exported,
+            'files': sorted(files),
+            'previous_watermark': watermark.isoformat() if watermark else None,
+            'watermark': new_watermark.isoformat() if new_watermark else None
+        }
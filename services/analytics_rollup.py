@@ -0,0 +1,197 @@
+import logging
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import case, delete, exists, func, select, union
+
+from app import db
+from models import Calculation, CalculationArchive, CalculationRollup
+from services.calculation_archive import CalculationArchiver
+
+class AnalyticsRollup:
+    """
+    Agregados de cálculos por usuário × mês × capítulo NCM × país de origem
+    (contagem, soma do CIF, soma dos impostos e alíquota efetiva média).
+
+    Cada cálculo novo é somado à sua linha em calculation_rollups por um
+    upsert atômico na mesma transação do cálculo; refresh() recalcula os
+    agregados de um usuário a partir de calculations e dos cálculos
+    arquivados (correção de divergências) e refresh_missing() faz a carga
+    inicial de quem tem cálculos mas nenhum agregado (executado por
+    SchemaMigrator.migrate e pelo dashboard). O dashboard lê apenas esta
+    tabela, cujo tamanho não depende do número de cálculos.
+    """
+
+    GROUP_BY = ('month', 'ncm_chapter', 'origin_country')
+    SUMS = ('calculation_count', 'cif_brl_sum', 'taxes_brl_sum', 'effective_rate_sum')
+
+    def __init__(self, calculation_archiver: CalculationArchiver):
+        self.logger = logging.getLogger(__name__)
+        self.calculation_archiver = calculation_archiver
+
+    @staticmethod
+    def ncm_chapter(ncm_code: str) -> str:
+        """Capítulo NCM (dois primeiros dígitos, com ou sem pontuação no código)"""
+        return (ncm_code or '')[:2]
+
+    @staticmethod
+    def effective_rate(cif_brl: float, taxes_brl: float) -> float:
+        return taxes_brl / cif_brl if cif_brl else 0.0
+
+    def _insert(self):
+        """INSERT com ON CONFLICT do dialeto em uso"""
+        dialect = db.engine.dialect.name
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            raise RuntimeError(f'Upsert de agregados não suportado para {dialect}')
+        return insert(CalculationRollup)
+
+    def _month_expression(self, column):
+        if db.engine.dialect.name == 'postgresql':
+            return func.to_char(column, 'YYYY-MM')
+        return func.strftime('%Y-%m', column)
+
+    def record(self, calculation: Calculation):
+        """Soma um cálculo novo aos agregados (sem commit: participa da transação do chamador)"""
+        created_at = calculation.created_at or datetime.utcnow()
+        statement = self._insert().values(
+            user_id=calculation.user_id,
+            month=created_at.strftime('%Y-%m'),
+            ncm_chapter=self.ncm_chapter(calculation.ncm_code),
+            origin_country=calculation.origin_country,
+            calculation_count=1,
+            cif_brl_sum=calculation.total_cost_brl,
+            taxes_brl_sum=calculation.total_taxes_brl,
+            effective_rate_sum=self.effective_rate(calculation.total_cost_brl, calculation.total_taxes_brl),
+            updated_at=datetime.utcnow()
+        )
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=['user_id'] + list(self.GROUP_BY),
+            set_={**{name: getattr(CalculationRollup, name) + getattr(statement.excluded, name)
+                     for name in self.SUMS},
+                  'updated_at': statement.excluded.updated_at}
+        ))
+
+    def refresh(self, user_id: Optional[str] = None) -> int:
+        """
+        Recalcula os agregados de um usuário (ou de todos, um usuário por
+        transação). Retorna o número de linhas de agregados gravadas.
+        """
+        if user_id is not None:
+            user_ids = [user_id]
+        else:
+            user_ids = db.session.execute(self._users_with_calculations()).scalars().all()
+
+        total = 0
+        for current_user_id in user_ids:
+            rollups = self._aggregate(current_user_id)
+            now = datetime.utcnow()
+            db.session.execute(delete(CalculationRollup).where(CalculationRollup.user_id == current_user_id))
+            if rollups:
+                db.session.execute(self._insert(), [
+                    {'user_id': current_user_id, **dict(zip(self.GROUP_BY, key)),
+                     **dict(zip(self.SUMS, sums)), 'updated_at': now}
+                    for key, sums in rollups.items()
+                ])
+            db.session.commit()
+            total += len(rollups)
+            self.logger.info(f"Agregados do usuário {current_user_id} recalculados: {len(rollups)} linha(s)")
+        return total
+
+    def refresh_missing(self, user_id: Optional[str] = None) -> int:
+        """
+        Carga inicial: recalcula apenas os usuários (ou o usuário) com cálculos
+        ativos ou arquivados e nenhuma linha em calculation_rollups, como os
+        cálculos anteriores aos agregados. Retorna o número de linhas gravadas.
+        """
+        users = self._users_with_calculations(user_id).subquery()
+        missing = db.session.execute(
+            select(users.c.user_id)
+            .where(~exists().where(CalculationRollup.user_id == users.c.user_id))
+        ).scalars().all()
+        return sum(self.refresh(missing_user_id) for missing_user_id in missing)
+
+    def _users_with_calculations(self, user_id: Optional[str] = None):
+        active = select(Calculation.user_id).distinct()
+        archived = select(CalculationArchive.user_id).distinct()
+        if user_id is not None:
+            active = active.where(Calculation.user_id == user_id)
+            archived = archived.where(CalculationArchive.user_id == user_id)
+        return union(active, archived)
+
+    def _aggregate(self, user_id: str) -> Dict[Tuple, list]:
+        """Agregados de cálculos ativos (GROUP BY no banco) somados aos arquivados"""
+        month = self._month_expression(Calculation.created_at)
+        chapter = func.substr(Calculation.ncm_code, 1, 2)
+        rollups = {}
+        for row in db.session.execute(
+                select(month, chapter, Calculation.origin_country,
+                       func.count(), func.sum(Calculation.total_cost_brl),
+                       func.sum(Calculation.total_taxes_brl),
+                       func.sum(case((Calculation.total_cost_brl != 0,
+                                      Calculation.total_taxes_brl / Calculation.total_cost_brl), else_=0.0)))
+                .where(Calculation.user_id == user_id)
+                .group_by(month, chapter, Calculation.origin_country)):
+            rollups[tuple(row[:3])] = [int(row[3]), row[4] or 0.0, row[5] or 0.0, row[6] or 0.0]
+
+        for rows in self.calculation_archiver.iter_chunks(user_id):
+            for row in rows:
+                key = (row['created_at'][:7], self.ncm_chapter(row['ncm_code']), row['origin_country'])
+                sums = rollups.setdefault(key, [0, 0.0, 0.0, 0.0])
+                sums[0] += 1
+                sums[1] += row['total_cost_brl']
+                sums[2] += row['total_taxes_brl']
+                sums[3] += self.effective_rate(row['total_cost_brl'], row['total_taxes_brl'])
+        return rollups
+
+    def _criteria(self, user_id: str, since_month: Optional[str]):
+        criteria = [CalculationRollup.user_id == user_id]
+        if since_month:
+            criteria.append(CalculationRollup.month >= since_month)
+        return criteria
+
+    def _sums(self):
+        return [func.sum(getattr(CalculationRollup, name)) for name in self.SUMS]
+
+    @staticmethod
+    def _to_dict(values) -> Dict:
+        count, cif_brl, taxes_brl, rate_sum = (value or 0 for value in values)
+        return {
+            'calculations': int(count),
+            'cif_brl': round(cif_brl, 2),
+            'taxes_brl': round(taxes_brl, 2),
+            'avg_effective_rate': round(rate_sum / count, 4) if count else 0.0
+        }
+
+    def totals(self, user_id: str, since_month: Optional[str] = None) -> Dict:
+        """Totais do usuário lidos de calculation_rollups"""
+        return self._to_dict(db.session.execute(
+            select(*self._sums()).where(*self._criteria(user_id, since_month))
+        ).one())
+
+    def summary(self, user_id: str, since_month: Optional[str] = None, limit: int = 10) -> Dict:
+        """
+        Totais do usuário e quebras por mês, capítulo NCM e origem, lidos
+        apenas de calculation_rollups (since_month: AAAA-MM inicial, inclusivo)
+        """
+        criteria = self._criteria(user_id, since_month)
+        sums = self._sums()
+
+        def breakdown(name: str, order_by_total: bool):
+            column = getattr(CalculationRollup, name)
+            query = select(column, *sums).where(*criteria).group_by(column)
+            if order_by_total:
+                query = query.order_by(sums[1].desc()).limit(limit)
+            else:
+                query = query.order_by(column)
+            return [{name: row[0], **self._to_dict(row[1:])} for row in db.session.execute(query)]
+
+        return {
+            'totals': self.totals(user_id, since_month),
+            'by_month': breakdown('month', order_by_total=False),
+            'by_ncm_chapter': breakdown('ncm_chapter', order_by_total=True),
+            'by_origin_country': breakdown('origin_country', order_by_total=True)
+        }
@@ -0,0 +1,199 @@
+import logging
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from services.tax_calculator import BenefitContext, BrazilianTaxCalculator
+
+# Colunas numéricas de entrada, na ordem em que ficam na memória compartilhada; as
+# colunas *_index apontam para as listas de NCMs, UFs de destino e contextos de benefícios
+INPUT_COLUMNS = ('unit_value_usd', 'quantity', 'freight_usd', 'insurance_usd', 'exchange_rate', 'ncm_index',
+                 'state_index', 'context_index')
+OUTPUT_COLUMNS = BrazilianTaxCalculator.BATCH_COLUMNS
+ITEM_SIZE = 8  # float64
+
+# Calculadora e alíquotas do processo de trabalho (criadas uma vez por processo no inicializador)
+_worker_calculator = None
+_worker_rates = None
+
+def _init_worker(resolved_rates: Dict[tuple, Dict[str, float]]):
+    """
+    Inicializador do processo: cria a calculadora e recebe as alíquotas de
+    cada (NCM, UF, contexto) do lote, resolvidas no processo principal (que
+    tem acesso ao RateStore e ao TaxBenefitEngine)
+    """
+    global _worker_calculator, _worker_rates
+    _worker_calculator = BrazilianTaxCalculator()
+    _worker_rates = resolved_rates
+
+def _calculate_chunk(calculator: BrazilianTaxCalculator, inputs: memoryview, outputs: memoryview,
+                     rows: int, start: int, stop: int, lookups: Tuple[list, list, list],
+                     resolved_rates: Dict[tuple, Dict[str, float]]):
+    """
+    Calcula as linhas [start, stop) lendo as colunas de entrada e gravando as de
+    saída diretamente nos buffers (layout por coluna: coluna * rows + linha)
+    """
+    columns = [inputs[index * rows + start:index * rows + stop] for index in range(len(INPUT_COLUMNS))]
+    unit_values, quantities, freights, insurances, exchange_rates, *indexes = columns
+    ncm_codes, states, contexts = [[values[int(index)] for index in column]
+                                   for values, column in zip(lookups, indexes)]
+    result = calculator.calculate_taxes_batch(
+        unit_values, quantities, ncm_codes, freights, insurances, exchange_rates,
+        resolved_rates=resolved_rates, states=states, contexts=contexts
+    )
+    for index, column in enumerate(OUTPUT_COLUMNS):
+        outputs[index * rows + start:index * rows + stop] = array('d', result[column])
+
+def _run_chunk(input_name: str, output_name: str, rows: int, start: int, stop: int,
+               lookups: Tuple[list, list, list]) -> int:
+    """Tarefa do processo de trabalho: anexa os blocos compartilhados e calcula o trecho"""
+    input_block = shared_memory.SharedMemory(name=input_name)
+    output_block = shared_memory.SharedMemory(name=output_name)
+    try:
+        inputs = input_block.buf.cast('d')
+        outputs = output_block.buf.cast('d')
+        try:
+            _calculate_chunk(_worker_calculator, inputs, outputs, rows, start, stop, lookups, _worker_rates)
+        finally:
+            inputs.release()
+            outputs.release()
+    finally:
+        input_block.close()
+        output_block.close()
+    return stop - start
+
+class BatchExecutor:
+    """
+    Executor paralelo de cálculos em lote (pedidos de compra, arquivos de importação).
+
+    As colunas de entrada e de saída ficam em blocos de memória compartilhada
+    (float64 por coluna), então os processos de trabalho recebem apenas
+    nomes e intervalos de linhas e gravam o resultado no lugar; o retorno
+    segue a ordem original dos itens independentemente da ordem de conclusão.
+    """
+
+    # Linhas por tarefa enviada aos processos
+    CHUNK_SIZE = 20_000
+    # Abaixo deste tamanho o lote é calculado no próprio processo
+    MIN_PARALLEL_ROWS = 50_000
+
+    def __init__(self, workers: Optional[int] = None, chunk_size: Optional[int] = None,
+                 tax_calculator: Optional[BrazilianTaxCalculator] = None):
+        self.logger = logging.getLogger(__name__)
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.chunk_size = chunk_size or self.CHUNK_SIZE
+        self.tax_calculator = tax_calculator or BrazilianTaxCalculator()
+
+    def calculate(self, items: List[Dict], as_of: Optional[date] = None) -> Dict[str, List[float]]:
+        """
+        Calcula os impostos de uma lista de itens (chaves: unit_value_usd, quantity,
+        ncm_code, exchange_rate e opcionalmente freight_usd, insurance_usd,
+        destination_state, origin_country, ex, regime), com as alíquotas
+        vigentes em as_of (padrão: hoje). Item sem câmbio positivo levanta
+        ValueError: a cotação é resolvida por quem monta o lote.
+        Retorna colunas (ver BrazilianTaxCalculator.BATCH_COLUMNS) na ordem dos itens.
+        """
+        # Posição 0 de UFs e contextos: item sem UF (ICMS médio) e sem dados de benefício
+        ncm_codes, states, contexts = [], [None], [None]
+        ncm_indexes, state_indexes, context_indexes = {}, {None: 0}, {None: 0}
+        columns = {column: [] for column in INPUT_COLUMNS}
+        for position, item in enumerate(items):
+            exchange_rate = float(item.get('exchange_rate') or 0)
+            if not exchange_rate > 0:
+                raise ValueError(f'Item {position}: exchange_rate ausente ou inválido')
+            ncm_code = str(item['ncm_code'])
+            ncm_index = ncm_indexes.get(ncm_code)
+            if ncm_index is None:
+                ncm_index = ncm_indexes[ncm_code] = len(ncm_codes)
+                ncm_codes.append(ncm_code)
+            state = item.get('destination_state') or None
+            state_index = state_indexes.get(state)
+            if state_index is None:
+                state_index = state_indexes[state] = len(states)
+                states.append(state)
+            context = None
+            if item.get('origin_country') or item.get('ex') is not None or item.get('regime'):
+                context = BenefitContext.build(item.get('origin_country'), item.get('ex'), item.get('regime'))
+            context_index = context_indexes.get(context)
+            if context_index is None:
+                context_index = context_indexes[context] = len(contexts)
+                contexts.append(context)
+            columns['unit_value_usd'].append(float(item['unit_value_usd']))
+            columns['quantity'].append(float(item['quantity']))
+            columns['freight_usd'].append(float(item.get('freight_usd') or 0))
+            columns['insurance_usd'].append(float(item.get('insurance_usd') or 0))
+            columns['exchange_rate'].append(exchange_rate)
+            columns['ncm_index'].append(float(ncm_index))
+            columns['state_index'].append(float(state_index))
+            columns['context_index'].append(float(context_index))
+        return self.calculate_columns(columns, ncm_codes, states, contexts, as_of)
+
+    def calculate_columns(self, columns: Dict[str, List[float]], ncm_codes: List[str],
+                          states: Optional[List[Optional[str]]] = None,
+                          contexts: Optional[List[Optional[BenefitContext]]] = None,
+                          as_of: Optional[date] = None) -> Dict[str, List[float]]:
+        """
+        Versão colunar de calculate: columns traz as listas de INPUT_COLUMNS,
+        com ncm_index apontando para ncm_codes, state_index para states e
+        context_index para contexts (BenefitContext); sem states/contexts,
+        todos os itens usam o ICMS médio e nenhum contexto de benefício
+        """
+        rows = len(columns['ncm_index'])
+        if rows == 0:
+            return {column: [] for column in OUTPUT_COLUMNS}
+        columns = dict(columns)
+        for name, values in (('state_index', states), ('context_index', contexts)):
+            if values is None:
+                columns[name] = [0.0] * rows
+        lookups = (ncm_codes, states or [None], contexts or [None])
+
+        # Alíquotas resolvidas uma vez por combinação presente no lote
+        resolved_rates = {}
+        for indexes in set(zip(columns['ncm_index'], columns['state_index'], columns['context_index'])):
+            ncm_code, state, context = (values[int(index)] for values, index in zip(lookups, indexes))
+            resolved_rates[(ncm_code, state, context)] = self.tax_calculator.get_tax_rates(
+                ncm_code, as_of, state, context)
+
+        workers = min(self.workers, -(-rows // self.chunk_size))
+        if workers <= 1 or rows < self.MIN_PARALLEL_ROWS:
+            return self.tax_calculator.calculate_taxes_batch(
+                columns['unit_value_usd'], columns['quantity'],
+                [ncm_codes[int(index)] for index in columns['ncm_index']],
+                columns['freight_usd'], columns['insurance_usd'], columns['exchange_rate'],
+                resolved_rates=resolved_rates,
+                states=[lookups[1][int(index)] for index in columns['state_index']],
+                contexts=[lookups[2][int(index)] for index in columns['context_index']]
+            )
+
+        input_block = shared_memory.SharedMemory(create=True, size=rows * len(INPUT_COLUMNS) * ITEM_SIZE)
+        output_block = shared_memory.SharedMemory(create=True, size=rows * len(OUTPUT_COLUMNS) * ITEM_SIZE)
+        try:
+            inputs = input_block.buf.cast('d')
+            for index, column in enumerate(INPUT_COLUMNS):
+                inputs[index * rows:(index + 1) * rows] = array('d', columns[column])
+            inputs.release()
+
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(resolved_rates,)) as executor:
+                futures = [
+                    executor.submit(_run_chunk, input_block.name, output_block.name, rows,
+                                    start, min(start + self.chunk_size, rows), lookups)
+                    for start in range(0, rows, self.chunk_size)
+                ]
+                calculated = sum(future.result() for future in futures)
+
+            outputs = output_block.buf.cast('d')
+            result = {column: outputs[index * rows:(index + 1) * rows].tolist()
+                      for index, column in enumerate(OUTPUT_COLUMNS)}
+            outputs.release()
+        finally:
+            input_block.close()
+            input_block.unlink()
+            output_block.close()
+            output_block.unlink()
+
+        self.logger.info(f"Lote de {calculated} itens calculado com {workers} processo(s)")
+        return result
@@ -0,0 +1,143 @@
+import json
+import logging
+import zlib
+from datetime import datetime, timedelta
+from itertools import groupby
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import delete, func, select
+
+from app import db
+from models import Calculation, CalculationArchive, CostDetail, TaxDetail
+from services.calculation_export import CalculationExporter, CALCULATION_COLUMNS
+
+class CalculationArchiver:
+    """
+    Arquivamento de cálculos antigos em armazenamento frio compactado.
+
+    Cálculos criados antes do limite são pivotados (mesmo formato das
+    exportações), gravados como NDJSON compactado com zlib em
+    calculation_archives, um registro por usuário e mês a cada lote, e
+    removidos de calculations, tax_details e cost_details na mesma
+    transação. As tabelas quentes e seus índices ficam limitadas aos
+    cálculos recentes; os arquivados continuam disponíveis no histórico
+    e nas exportações.
+    """
+
+    BATCH_SIZE = 2000
+    COMPRESSION_LEVEL = 6
+
+    def __init__(self, calculation_exporter: CalculationExporter):
+        self.logger = logging.getLogger(__name__)
+        self.calculation_exporter = calculation_exporter
+
+    def archive(self, older_than_days: int, batch_size: Optional[int] = None) -> int:
+        """Arquiva cálculos com mais de `older_than_days` dias; retorna quantos foram arquivados"""
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+        batch_size = batch_size or self.BATCH_SIZE
+        total = 0
+        while True:
+            ids = db.session.execute(
+                select(Calculation.id)
+                .where(Calculation.created_at < cutoff)
+                .order_by(Calculation.user_id, Calculation.created_at, Calculation.id)
+                .limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                break
+
+            rows = []
+            for chunk in self.calculation_exporter.iter_pivoted_chunks(
+                    ('user_id',) + CALCULATION_COLUMNS, [Calculation.id.in_(ids)],
+                    [Calculation.user_id, Calculation.created_at, Calculation.id]):
+                rows.extend(chunk)
+
+            for (user_id, month), group in groupby(rows, key=lambda row: (row['user_id'], row['created_at'].strftime('%Y-%m'))):
+                group = list(group)
+                db.session.add(CalculationArchive(
+                    user_id=user_id,
+                    month=month,
+                    row_count=len(group),
+                    first_created_at=group[0]['created_at'],
+                    last_created_at=group[-1]['created_at'],
+                    data=self._compress(group)
+                ))
+
+            db.session.execute(delete(TaxDetail).where(TaxDetail.calculation_id.in_(ids)))
+            db.session.execute(delete(CostDetail).where(CostDetail.calculation_id.in_(ids)))
+            db.session.execute(delete(Calculation).where(Calculation.id.in_(ids)))
+            db.session.commit()
+            db.session.expire_all()
+            total += len(ids)
+            self.logger.info(f"{total} cálculos arquivados (anteriores a {cutoff.date()})")
+        return total
+
+    def _compress(self, rows: List[Dict]) -> bytes:
+        columns = self.calculation_exporter.COLUMNS
+        lines = []
+        for row in rows:
+            record = {column: row[column] for column in columns}
+            record['created_at'] = record['created_at'].isoformat()
+            lines.append(json.dumps(record, ensure_ascii=False))
+        return zlib.compress(('\n'.join(lines) + '\n').encode('utf-8'), self.COMPRESSION_LEVEL)
+
+    def list_months(self, user_id: str) -> List[Dict]:
+        """Meses com cálculos arquivados do usuário (mais recentes primeiro)"""
+        results = db.session.execute(
+            select(CalculationArchive.month, func.sum(CalculationArchive.row_count))
+            .where(CalculationArchive.user_id == user_id)
+            .group_by(CalculationArchive.month)
+            .order_by(CalculationArchive.month.desc())
+        ).all()
+        return [{'month': month, 'count': int(count)} for month, count in results]
+
+    def iter_chunks(self, user_id: str, month: Optional[str] = None) -> Iterator[List[Dict]]:
+        """
+        Linhas arquivadas do usuário (opcionalmente de um mês), um bloco por
+        registro de arquivo, em ordem de criação
+        """
+        query = (select(CalculationArchive.id)
+                 .where(CalculationArchive.user_id == user_id)
+                 .order_by(CalculationArchive.first_created_at, CalculationArchive.id))
+        if month:
+            query = query.where(CalculationArchive.month == month)
+
+        # Um blob por vez: a memória fica limitada ao maior lote arquivado
+        for archive_id in db.session.execute(query).scalars().all():
+            yield self._load(archive_id)
+
+    def page(self, user_id: str, month: str, page: int, per_page: int) -> Dict:
+        """
+        Página de linhas arquivadas de um mês, mais recentes primeiro. A posição
+        de cada registro sai de row_count, então só os registros que cobrem a
+        página são descompactados.
+        """
+        records = db.session.execute(
+            select(CalculationArchive.id, CalculationArchive.row_count)
+            .where(CalculationArchive.user_id == user_id, CalculationArchive.month == month)
+            .order_by(CalculationArchive.first_created_at.desc(), CalculationArchive.id.desc())
+        ).all()
+        total = sum(row_count for _, row_count in records)
+        start, end = (page - 1) * per_page, page * per_page
+
+        rows, offset = [], 0
+        for archive_id, row_count in records:
+            if offset >= end:
+                break
+            if offset + row_count > start:
+                newest_first = self._load(archive_id)[::-1]
+                rows.extend(newest_first[max(start - offset, 0):end - offset])
+            offset += row_count
+        return {
+            'rows': rows,
+            'total': total,
+            'page': page,
+            'pages': max(1, -(-total // per_page))
+        }
+
+    def _load(self, archive_id: str) -> List[Dict]:
+        """Linhas de um registro de arquivo, em ordem de criação"""
+        data = db.session.execute(
+            select(CalculationArchive.data).where(CalculationArchive.id == archive_id)
+        ).scalar()
+        return [json.loads(line) for line in zlib.decompress(data).decode('utf-8').splitlines()]
@@ -0,0 +1,253 @@
+import csv
+import io
+import itertools
+import json
+import logging
+import operator
+import zipfile
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
+from xml.sax.saxutils import escape
+
+from sqlalchemy import select
+
+from app import db
+from models import Calculation, TaxDetail, CostDetail
+
+TAX_TYPES = ('II', 'IPI', 'PIS', 'COFINS', 'ICMS', 'OTHERS')
+COST_TYPES = ('FREIGHT', 'INSURANCE', 'CLEARANCE_FEES', 'BROKER_FEES', 'STORAGE',
+              'DOMESTIC_FREIGHT', 'MARKETING', 'PLATFORM_FEES', 'OTHER_COSTS')
+
+CALCULATION_COLUMNS = (
+    'id', 'product_name', 'ncm_code', 'description', 'unit_value_usd', 'quantity',
+    'origin_country', 'transport_mode', 'exchange_rate', 'total_cost_usd', 'total_cost_brl',
+    'total_taxes_brl', 'final_cost_brl', 'suggested_price', 'expected_revenue',
+    'profit_margin', 'created_at'
+)
+
+class _StreamBuffer:
+    """Destino de escrita não posicionável: acumula bytes até serem drenados"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+class CalculationExporter:
+    """
+    Exportação em streaming do histórico de cálculos (CSV, NDJSON ou XLSX).
+
+    Os cálculos são lidos com cursor no servidor (yield_per) em blocos. Os
+    impostos vêm de calculations.tax_breakdown (cálculos antigos: tax_details)
+    e os custos de uma consulta IN por bloco, pivotados em colunas; assim a
+    memória não cresce com o total de linhas e o primeiro bloco é enviado
+    imediatamente.
+    """
+
+    FORMATS = {
+        'csv': ('text/csv; charset=utf-8', 'csv'),
+        'ndjson': ('application/x-ndjson', 'ndjson'),
+        'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx')
+    }
+    CHUNK_SIZE = 1000
+
+    # Colunas pivotadas de impostos e custos (uma linha por cálculo)
+    PIVOT_COLUMNS = (
+        [f'{tax_type}_{field}' for tax_type in TAX_TYPES for field in ('rate', 'base_value', 'amount')]
+        + [f'{cost_type}_brl' for cost_type in COST_TYPES]
+    )
+    COLUMNS = list(CALCULATION_COLUMNS) + PIVOT_COLUMNS
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        # Valores de uma linha na ordem de COLUMNS
+        self._values = operator.itemgetter(*self.COLUMNS)
+
+    def iter_chunks(self, user_id: str) -> Iterator[List[Dict]]:
+        """Blocos de linhas (dicionários com todas as COLUMNS) de um usuário, em ordem de criação"""
+        return self.iter_pivoted_chunks(
+            CALCULATION_COLUMNS,
+            [Calculation.user_id == user_id],
+            [Calculation.created_at, Calculation.id],
+            iso_dates=True
+        )
+
+    def iter_pivoted_chunks(self, calculation_columns, criteria, order_by,
+                            iso_dates: bool = False) -> Iterator[List[Dict]]:
+        """
+        Blocos de cálculos filtrados por `criteria`, com as colunas pedidas de
+        calculations mais PIVOT_COLUMNS; iso_dates converte datas em texto ISO
+        """
+        columns = [getattr(Calculation, name) for name in calculation_columns] + [Calculation.tax_breakdown]
+        date_columns = [name for name in calculation_columns if name in ('created_at', 'updated_at')]
+        statement = (select(*columns)
+                     .where(*criteria)
+                     .order_by(*order_by)
+                     .execution_options(yield_per=self.CHUNK_SIZE))
+
+        empty_row = dict.fromkeys(list(calculation_columns) + self.PIVOT_COLUMNS)
+        for partition in db.session.execute(statement).partitions():
+            rows = {}
+            # Cálculos sem tax_breakdown (anteriores à coluna) leem tax_details
+            legacy_ids = []
+            for values in partition:
+                row = dict(empty_row)
+                row.update(values._mapping)
+                tax_breakdown = row.pop('tax_breakdown')
+                if tax_breakdown is None:
+                    legacy_ids.append(row['id'])
+                else:
+                    for tax_type, tax in tax_breakdown.items():
+                        row[f'{tax_type}_rate'] = tax['rate']
+                        row[f'{tax_type}_base_value'] = tax['base_value']
+                        row[f'{tax_type}_amount'] = tax['amount']
+                if iso_dates:
+                    for name in date_columns:
+                        if row[name] is not None:
+                            row[name] = row[name].isoformat()
+                rows[row['id']] = row
+            ids = list(rows)
+
+            if legacy_ids:
+                for calculation_id, tax_type, rate, base_value, amount in db.session.execute(
+                        select(TaxDetail.calculation_id, TaxDetail.tax_type, TaxDetail.rate,
+                               TaxDetail.base_value, TaxDetail.amount)
+                        .where(TaxDetail.calculation_id.in_(legacy_ids))):
+                    row = rows[calculation_id]
+                    row[f'{tax_type}_rate'] = rate
+                    row[f'{tax_type}_base_value'] = base_value
+                    row[f'{tax_type}_amount'] = amount
+
+            for calculation_id, cost_type, amount_brl in db.session.execute(
+                    select(CostDetail.calculation_id, CostDetail.cost_type, CostDetail.amount_brl)
+                    .where(CostDetail.calculation_id.in_(ids))):
+                row = rows[calculation_id]
+                key = f'{cost_type}_brl'
+                row[key] = (row[key] or 0) + amount_brl
+
+            yield list(rows.values())
+
+    def export(self, user_id: str, export_format: str,
+               archived_chunks: Optional[Iterable[List[Dict]]] = None) -> Iterator[bytes]:
+        """
+        Gerador de bytes do arquivo no formato pedido; archived_chunks (linhas
+        arquivadas, já no formato de COLUMNS) são emitidos antes dos cálculos ativos
+        """
+        if export_format not in self.FORMATS:
+            raise ValueError(f'Formato de exportação inválido: {export_format}')
+        chunks = self.iter_chunks(user_id)
+        if archived_chunks is not None:
+            chunks = itertools.chain(archived_chunks, chunks)
+        if export_format == 'csv':
+            return self._export_csv(chunks)
+        if export_format == 'ndjson':
+            return self._export_ndjson(chunks)
+        return self._export_xlsx(chunks)
+
+    def filename(self, export_format: str) -> str:
+        return f"calculos-{datetime.utcnow().strftime('%Y%m%d')}.{self.FORMATS[export_format][1]}"
+
+    def _export_csv(self, chunks) -> Iterator[bytes]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        # BOM para o Excel reconhecer UTF-8
+        buffer.write('\ufeff')
+        writer.writerow(self.COLUMNS)
+        yield buffer.getvalue().encode('utf-8')
+
+        for rows in chunks:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(map(self._values, rows))
+            yield buffer.getvalue().encode('utf-8')
+
+    def _export_ndjson(self, chunks) -> Iterator[bytes]:
+        for rows in chunks:
+            yield ''.join(
+                json.dumps(row, ensure_ascii=False) + '\n' for row in rows
+            ).encode('utf-8')
+
+    def _export_xlsx(self, chunks) -> Iterator[bytes]:
+        """
+        Planilha XLSX mínima (uma aba, strings inline) gerada com zipfile sobre
+        um destino não posicionável, o que permite enviar a planilha em blocos
+        """
+        stream = _StreamBuffer()
+        with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as package:
+            for name, content in self._xlsx_parts().items():
+                package.writestr(name, content)
+            yield stream.drain()
+
+            with package.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+                sheet.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                            b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                            b'<sheetData>')
+                sheet.write(self._xlsx_row(self.COLUMNS))
+                for rows in chunks:
+                    sheet.write(b''.join(
+                        self._xlsx_row(self._values(row)) for row in rows
+                    ))
+                    yield stream.drain()
+                sheet.write(b'</sheetData></worksheet>')
+        yield stream.drain()
+
+    @staticmethod
+    def _xlsx_row(values) -> bytes:
+        cells = []
+        for value in values:
+            if value is None:
+                cells.append('<c/>')
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                cells.append(f'<c><v>{value!r}</v></c>')
+            else:
+                cells.append(f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>')
+        return f"<row>{''.join(cells)}</row>".encode('utf-8')
+
+    @staticmethod
+    def _xlsx_parts() -> Dict[str, str]:
+        return {
+            '[Content_Types].xml': (
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                '<Default Extension="xml" ContentType="application/xml"/>'
+                '<Override PartName="/xl/workbook.xml" '
+                'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+                '<Override PartName="/xl/worksheets/sheet1.xml" '
+                'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                '</Types>'
+            ),
+            '_rels/.rels': (
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                '<Relationship Id="rId1" '
+                'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+                'Target="xl/workbook.xml"/>'
+                '</Relationships>'
+            ),
+            'xl/workbook.xml': (
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+                'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+                '<sheets><sheet name="Cálculos" sheetId="1" r:id="rId1"/></sheets>'
+                '</workbook>'
+            ),
+            'xl/_rels/workbook.xml.rels': (
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                '<Relationship Id="rId1" '
+                'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+                'Target="worksheets/sheet1.xml"/>'
+                '</Relationships>'
+            )
+        }
@@ -0,0 +1,79 @@
+"""
+Normalização de países de origem para códigos ISO 3166-1 alfa-2
+
+O país de origem é digitado livremente (\"China\", \"EUA\", \"Coreia do Sul\");
+benefícios fiscais e preferências tarifárias comparam o código normalizado.
+"""
+import unicodedata
+from typing import Dict, Optional
+
+# Código -> nomes e siglas aceitos (português, inglês, ISO alfa-3)
+COUNTRY_NAMES = {
+    'AE': ('Emirados Árabes Unidos', 'Emirados Árabes', 'United Arab Emirates', 'UAE', 'ARE'),
+    'AR': ('Argentina', 'ARG'),
+    'AU': ('Austrália', 'Australia', 'AUS'),
+    'BD': ('Bangladesh', 'BGD'),
+    'BE': ('Bélgica', 'Belgium', 'BEL'),
+    'BO': ('Bolívia', 'Bolivia', 'BOL'),
+    'BR': ('Brasil', 'Brazil', 'BRA'),
+    'CA': ('Canadá', 'Canada', 'CAN'),
+    'CH': ('Suíça', 'Switzerland', 'CHE'),
+    'CL': ('Chile', 'CHL'),
+    'CN': ('China', 'República Popular da China', "People's Republic of China", 'CHN'),
+    'CO': ('Colômbia', 'Colombia', 'COL'),
+    'CU': ('Cuba', 'CUB'),
+    'DE': ('Alemanha', 'Germany', 'DEU'),
+    'EC': ('Equador', 'Ecuador', 'ECU'),
+    'EG': ('Egito', 'Egypt', 'EGY'),
+    'ES': ('Espanha', 'Spain', 'ESP'),
+    'FR': ('França', 'France', 'FRA'),
+    'GB': ('Reino Unido', 'Inglaterra', 'United Kingdom', 'UK', 'GBR'),
+    'HK': ('Hong Kong', 'HKG'),
+    'ID': ('Indonésia', 'Indonesia', 'IDN'),
+    'IL': ('Israel', 'ISR'),
+    'IN': ('Índia', 'India', 'IND'),
+    'IT': ('Itália', 'Italy', 'ITA'),
+    'JP': ('Japão', 'Japan', 'JPN'),
+    'KR': ('Coreia do Sul', 'Coréia do Sul', 'Coreia', 'South Korea', 'Korea', 'KOR'),
+    'MX': ('México', 'Mexico', 'MEX'),
+    'MY': ('Malásia', 'Malaysia', 'MYS'),
+    'NL': ('Países Baixos', 'Holanda', 'Netherlands', 'NLD'),
+    'PE': ('Peru', 'PER'),
+    'PS': ('Palestina', 'Palestine', 'PSE'),
+    'PT': ('Portugal', 'PRT'),
+    'PY': ('Paraguai', 'Paraguay', 'PRY'),
+    'RU': ('Rússia', 'Russia', 'RUS'),
+    'SA': ('Arábia Saudita', 'Saudi Arabia', 'SAU'),
+    'SG': ('Singapura', 'Singapore', 'SGP'),
+    'TH': ('Tailândia', 'Thailand', 'THA'),
+    'TR': ('Turquia', 'Turkey', 'Türkiye', 'TUR'),
+    'TW': ('Taiwan', 'TWN'),
+    'US': ('Estados Unidos', 'EUA', 'Estados Unidos da América', 'United States', 'USA'),
+    'UY': ('Uruguai', 'Uruguay', 'URY'),
+    'VE': ('Venezuela', 'VEN'),
+    'VN': ('Vietnã', 'Vietna', 'Vietnam', 'Viet Nam', 'VNM'),
+    'ZA': ('África do Sul', 'South Africa', 'ZAF')
+}
+
+def _key(text: str) -> str:
+    """Texto sem acentos, sem caixa e com espaços simples"""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(text.casefold().replace('.', '').split())
+
+_ALIASES: Dict[str, str] = {
+    _key(alias): code
+    for code, names in COUNTRY_NAMES.items()
+    for alias in (code,) + names
+}
+
+def normalize_country(value: Optional[str]) -> Optional[str]:
+    """
+    Código ISO alfa-2 do país (None para vazio); países fora de
+    COUNTRY_NAMES ficam com o nome sem acentos em maiúsculas, o que ainda
+    permite comparar grafias equivalentes
+    """
+    key = _key(value or '')
+    if not key:
+        return None
+    return _ALIASES.get(key) or key.upper()
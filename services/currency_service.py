@@ -53,7 +53,27 @@ class CurrencyService:
         # Fallback para cotação padrão
         self.logger.warning("Usando cotação padrão de R$ 5,00")
         return 5.0
-    
+
+    def get_rate_timestamp(self) -> Optional[datetime]:
+        """
+        Retorna o momento em que a cotação USD/BRL em cache foi obtida
+        (None quando a cotação padrão está em uso)
+        """
+        cached = self.cache.get('USD_BRL')
+        if cached is None:
+            return None
+        return cached['timestamp']
+
+    def get_cache_remaining_seconds(self) -> int:
+        """
+        Segundos restantes até a cotação em cache expirar
+        """
+        timestamp = self.get_rate_timestamp()
+        if timestamp is None:
+            return 0
+        remaining = self.cache_duration - (datetime.now() - timestamp)
+        return max(int(remaining.total_seconds()), 0)
+
     def _get_rate_from_awesome_api(self) -> Optional[float]:
         """
         Obtém cotação da AwesomeAPI
@@ -0,0 +1,163 @@
+import json
+import logging
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from services.countries import normalize_country
+
+class FreightEstimator:
+    """
+    Estimativa de frete internacional e seguro por modal × origem.
+
+    Cada tarifa combina peso taxável (maior entre o peso bruto e o volume
+    convertido pela densidade de cubagem do modal), ad valorem sobre o FOB e
+    frete mínimo; o seguro é uma taxa sobre FOB + frete, também com mínimo.
+    A origem é procurada pelo país (código ISO), depois pela região do país
+    e por fim pela tarifa genérica '*' do modal.
+
+    As tarifas ficam em arrays compactos (float64, uma posição por tarifa) e
+    estimate_columns resolve a tarifa uma vez por par (modal, país) presente
+    no lote, então milhares de linhas custam uma passada aritmética por
+    coluna, sem consulta de tarifa por linha.
+
+    Os valores padrão são de referência (cotações médias de 2025 para o
+    Brasil) e podem ser substituídos por uma tabela local em JSON
+    (FREIGHT_TARIFFS_FILE) com as chaves 'tariffs' e, opcionalmente, 'regions'.
+    """
+
+    MODES = ('MARITIME', 'AIR', 'ROAD')
+    FIELDS = ('per_kg', 'kg_per_m3', 'ad_valorem', 'minimum', 'insurance_rate', 'insurance_minimum')
+
+    DEFAULT_REGIONS = {
+        'ASIA': ('BD', 'CN', 'HK', 'ID', 'IN', 'JP', 'KR', 'MY', 'SG', 'TH', 'TW', 'VN'),
+        'EUROPE': ('BE', 'CH', 'DE', 'ES', 'FR', 'GB', 'IT', 'NL', 'PT', 'RU', 'TR'),
+        'NORTH_AMERICA': ('CA', 'MX', 'US'),
+        'SOUTH_AMERICA': ('AR', 'BO', 'CL', 'CO', 'EC', 'PE', 'PY', 'UY', 'VE')
+    }
+
+    # USD por kg taxável; kg_per_m3: densidade de cubagem (marítimo W/M 1 t = 1 m³,
+    # aéreo IATA 1:6000, rodoviário 300 kg/m³); modal sem tarifa '*' não atende
+    # origens fora das listadas (ROAD: só América do Sul)
+    DEFAULT_TARIFFS = {
+        'MARITIME': {
+            '*': {'per_kg': 0.16, 'kg_per_m3': 1000, 'ad_valorem': 0.0, 'minimum': 180,
+                  'insurance_rate': 0.003, 'insurance_minimum': 25},
+            'ASIA': {'per_kg': 0.12, 'kg_per_m3': 1000, 'ad_valorem': 0.0, 'minimum': 150,
+                     'insurance_rate': 0.003, 'insurance_minimum': 25},
+            'EUROPE': {'per_kg': 0.10, 'kg_per_m3': 1000, 'ad_valorem': 0.0, 'minimum': 150,
+                       'insurance_rate': 0.0025, 'insurance_minimum': 25},
+            'NORTH_AMERICA': {'per_kg': 0.09, 'kg_per_m3': 1000, 'ad_valorem': 0.0, 'minimum': 130,
+                              'insurance_rate': 0.0025, 'insurance_minimum': 25},
+            'SOUTH_AMERICA': {'per_kg': 0.06, 'kg_per_m3': 1000, 'ad_valorem': 0.0, 'minimum': 100,
+                              'insurance_rate': 0.002, 'insurance_minimum': 20}
+        },
+        'AIR': {
+            '*': {'per_kg': 5.00, 'kg_per_m3': 167, 'ad_valorem': 0.0, 'minimum': 90,
+                  'insurance_rate': 0.002, 'insurance_minimum': 20},
+            'ASIA': {'per_kg': 5.50, 'kg_per_m3': 167, 'ad_valorem': 0.0, 'minimum': 90,
+                     'insurance_rate': 0.002, 'insurance_minimum': 20},
+            'EUROPE': {'per_kg': 4.20, 'kg_per_m3': 167, 'ad_valorem': 0.0, 'minimum': 80,
+                       'insurance_rate': 0.0018, 'insurance_minimum': 20},
+            'NORTH_AMERICA': {'per_kg': 3.80, 'kg_per_m3': 167, 'ad_valorem': 0.0, 'minimum': 75,
+                              'insurance_rate': 0.0018, 'insurance_minimum': 20},
+            'SOUTH_AMERICA': {'per_kg': 2.50, 'kg_per_m3': 167, 'ad_valorem': 0.0, 'minimum': 60,
+                              'insurance_rate': 0.0015, 'insurance_minimum': 15}
+        },
+        'ROAD': {
+            'SOUTH_AMERICA': {'per_kg': 0.35, 'kg_per_m3': 300, 'ad_valorem': 0.002, 'minimum': 200,
+                              'insurance_rate': 0.0025, 'insurance_minimum': 20}
+        }
+    }
+
+    def __init__(self, tariffs: Optional[Dict[str, Dict[str, Dict]]] = None,
+                 regions: Optional[Dict[str, Sequence[str]]] = None):
+        self.logger = logging.getLogger(__name__)
+        tariffs = tariffs if tariffs is not None else self.DEFAULT_TARIFFS
+        regions = regions if regions is not None else self.DEFAULT_REGIONS
+        self._regions = {normalize_country(country): region
+                         for region, countries in regions.items() for country in countries}
+
+        # (modal, origem) -> posição nos arrays de tarifa
+        self._tariff_index: Dict[Tuple[str, str], int] = {}
+        self.tariffs = {field: array('d') for field in self.FIELDS}
+        for mode, origins in tariffs.items():
+            mode = str(mode).upper()
+            if mode not in self.MODES:
+                raise ValueError(f'Modal de transporte inválido: {mode}')
+            for origin, tariff in origins.items():
+                origin = origin if origin == '*' or origin in regions else normalize_country(origin)
+                self._tariff_index[(mode, origin)] = len(self._tariff_index)
+                for field in self.FIELDS:
+                    try:
+                        value = float(tariff[field])
+                    except (KeyError, TypeError, ValueError):
+                        raise ValueError(f'Tarifa {mode}/{origin}: valor inválido para {field}')
+                    if value < 0 or (field == 'kg_per_m3' and value == 0):
+                        raise ValueError(f'Tarifa {mode}/{origin}: {field} fora do intervalo')
+                    self.tariffs[field].append(value)
+        self._rows = list(zip(*(self.tariffs[field] for field in self.FIELDS)))
+        # Resolução (modal, país) -> posição, memorizada por par
+        self._resolved: Dict[Tuple[str, Optional[str]], int] = {}
+
+    @classmethod
+    def from_file(cls, path: str) -> 'FreightEstimator':
+        """Estimador com a tabela local em JSON ({'tariffs': {...}, 'regions': {...}})"""
+        with open(path, encoding='utf-8') as file:
+            data = json.load(file)
+        if not isinstance(data, dict) or not isinstance(data.get('tariffs'), dict):
+            raise ValueError(f'Tabela de fretes sem a chave tariffs: {path}')
+        return cls(data['tariffs'], data.get('regions'))
+
+    def tariff_offset(self, mode: str, origin_country: Optional[str]) -> int:
+        """Posição da tarifa do modal para o país; ValueError se o modal não atende a origem"""
+        key = (mode, origin_country)
+        offset = self._resolved.get(key)
+        if offset is not None:
+            return offset
+        if mode not in self.MODES:
+            raise ValueError(f'Modal de transporte inválido: {mode}')
+        country = normalize_country(origin_country)
+        for origin in (country, self._regions.get(country), '*'):
+            offset = self._tariff_index.get((mode, origin))
+            if offset is not None:
+                break
+        else:
+            raise ValueError(f'Sem tarifa de frete {mode} para a origem {origin_country or "não informada"}')
+        self._resolved[key] = offset
+        return offset
+
+    def estimate_columns(self, modes: Sequence[str], origin_countries: Sequence[Optional[str]],
+                         fob_values: Sequence[float], gross_weights: Sequence[float],
+                         volumes: Sequence[float]) -> Dict[str, List[float]]:
+        """
+        Frete e seguro (USD) por linha: FOB, peso bruto (kg) e volume (m³)
+        são totais da linha. Retorna as colunas freight_usd, insurance_usd e
+        chargeable_weight_kg na ordem das linhas.
+        """
+        # Tarifa (tupla na ordem de FIELDS) resolvida uma vez por par (modal, país) do lote
+        keys = list(zip(modes, origin_countries))
+        resolved = {key: self._rows[self.tariff_offset(*key)] for key in set(keys)}
+        tariffs = [resolved[key] for key in keys]
+
+        # Uma passada por coluna
+        chargeable_weights = [max(weight, volume * tariff[1])
+                              for tariff, weight, volume in zip(tariffs, gross_weights, volumes)]
+        freights = [round(max(chargeable * tariff[0] + fob * tariff[2], tariff[3]), 2)
+                    for tariff, chargeable, fob in zip(tariffs, chargeable_weights, fob_values)]
+        insurances = [round(max((fob + freight) * tariff[4], tariff[5]), 2)
+                      for tariff, fob, freight in zip(tariffs, fob_values, freights)]
+        return {'freight_usd': freights, 'insurance_usd': insurances, 'chargeable_weight_kg': chargeable_weights}
+
+    def estimate(self, mode: str, origin_country: Optional[str], fob_usd: float,
+                 gross_weight_kg: float = 0, volume_m3: float = 0) -> Dict:
+        """Estimativa de uma remessa, com a tarifa aplicada"""
+        result = self.estimate_columns([mode], [origin_country], [fob_usd], [gross_weight_kg], [volume_m3])
+        offset = self.tariff_offset(mode, origin_country)
+        return {
+            'transport_mode': mode,
+            'origin_country': normalize_country(origin_country),
+            'chargeable_weight_kg': round(result['chargeable_weight_kg'][0], 3),
+            'freight_usd': result['freight_usd'][0],
+            'insurance_usd': result['insurance_usd'][0],
+            'tariff': {field: self.tariffs[field][offset] for field in self.FIELDS}
+        }
@@ -0,0 +1,132 @@
+from array import array
+from typing import Dict, Optional
+
+class IcmsMatrix:
+    """
+    Alíquotas de ICMS por UF de destino × classe de NCM.
+
+    A matriz fica em arrays compactos (float64, posição = UF * classes +
+    classe) com a alíquota interna, o adicional de FCP (Fundo de Combate à
+    Pobreza) e o fator de gross-up já calculado, (alíquota + FCP) /
+    (1 - alíquota - FCP): ICMS = base sem ICMS * fator. A consulta custa
+    duas buscas em dicionário e um acesso ao array, O(1).
+
+    Os valores são de referência (alíquotas modais vigentes em 2025) e
+    devem ser conferidos na legislação de cada UF antes de uso fiscal.
+    """
+
+    STATES = ('AC', 'AL', 'AM', 'AP', 'BA', 'CE', 'DF', 'ES', 'GO', 'MA', 'MG', 'MS', 'MT', 'PA',
+              'PB', 'PE', 'PI', 'PR', 'RJ', 'RN', 'RO', 'RR', 'RS', 'SC', 'SE', 'SP', 'TO')
+    CLASSES = ('GERAL', 'ESSENCIAL', 'VEICULO', 'SUPERFLUO')
+
+    # Classe por capítulo do NCM (demais capítulos: GERAL)
+    CHAPTER_CLASSES = {
+        **{chapter: 'ESSENCIAL' for chapter in ('02', '03', '04', '07', '08', '10', '11', '15', '19')},
+        '87': 'VEICULO',
+        **{chapter: 'SUPERFLUO' for chapter in ('22', '24', '33', '71', '93')}
+    }
+    # Exceções por código completo
+    NCM_CLASSES: Dict[str, str] = {}
+
+    # Alíquota interna modal (classe GERAL)
+    MODAL_RATES = {
+        'AC': 0.19, 'AL': 0.19, 'AM': 0.20, 'AP': 0.18, 'BA': 0.205, 'CE': 0.20, 'DF': 0.20,
+        'ES': 0.17, 'GO': 0.19, 'MA': 0.23, 'MG': 0.18, 'MS': 0.17, 'MT': 0.17, 'PA': 0.19,
+        'PB': 0.20, 'PE': 0.205, 'PI': 0.225, 'PR': 0.195, 'RJ': 0.20, 'RN': 0.20, 'RO': 0.195,
+        'RR': 0.20, 'RS': 0.17, 'SC': 0.17, 'SE': 0.19, 'SP': 0.18, 'TO': 0.20
+    }
+    # Alíquota (ou carga com redução de base) das demais classes, igual em todas as UFs
+    CLASS_RATES = {'ESSENCIAL': 0.12, 'VEICULO': 0.12, 'SUPERFLUO': 0.25}
+    # Adicional de FCP por UF e classe
+    FCP_RATES = {
+        'AL': {'GERAL': 0.01, 'SUPERFLUO': 0.02},
+        'BA': {'SUPERFLUO': 0.02},
+        'MG': {'SUPERFLUO': 0.02},
+        'PE': {'SUPERFLUO': 0.02},
+        'PI': {'SUPERFLUO': 0.02},
+        'PR': {'SUPERFLUO': 0.02},
+        'RJ': {'GERAL': 0.02, 'SUPERFLUO': 0.04},
+        'SE': {'GERAL': 0.01, 'SUPERFLUO': 0.02}
+    }
+
+    # Interestaduais: bens importados (Resolução do Senado 13/2012) e demais
+    IMPORTED_INTERSTATE_RATE = 0.04
+    # Saídas do Sul e do Sudeste (exceto ES) para Norte, Nordeste, Centro-Oeste e ES
+    SOUTH_SOUTHEAST = ('MG', 'PR', 'RJ', 'RS', 'SC', 'SP')
+
+    def __init__(self):
+        self._state_index = {state: index for index, state in enumerate(self.STATES)}
+        self._class_index = {name: index for index, name in enumerate(self.CLASSES)}
+        self.rates = array('d')
+        self.fcp_rates = array('d')
+        self.factors = array('d')
+        for state in self.STATES:
+            for name in self.CLASSES:
+                rate = self.CLASS_RATES.get(name, self.MODAL_RATES[state])
+                fcp = self.FCP_RATES.get(state, {}).get(name, 0.0)
+                total = rate + fcp
+                self.rates.append(rate)
+                self.fcp_rates.append(fcp)
+                self.factors.append(total / (1 - total))
+
+    def normalize_state(self, state: Optional[str]) -> Optional[str]:
+        """UF em maiúsculas (None para vazio); ValueError para UF inexistente"""
+        state = str(state or '').strip().upper()
+        if not state:
+            return None
+        if state not in self._state_index:
+            raise ValueError(f'UF inválida: {state}')
+        return state
+
+    def ncm_class(self, ncm_code: str) -> str:
+        return self.NCM_CLASSES.get(ncm_code) or self.CHAPTER_CLASSES.get(ncm_code[:2], 'GERAL')
+
+    def offset(self, ncm_code: str, state: str) -> int:
+        """Posição de (UF, classe do NCM) nos arrays da matriz"""
+        return self._state_index[state] * len(self.CLASSES) + self._class_index[self.ncm_class(ncm_code)]
+
+    def internal_rate(self, ncm_code: str, state: str) -> float:
+        """Alíquota interna total (ICMS + FCP) do NCM na UF"""
+        position = self.offset(ncm_code, state)
+        return self.rates[position] + self.fcp_rates[position]
+
+    def rates_for(self, ncm_code: str, state: str) -> Dict[str, float]:
+        """Alíquotas no formato de BrazilianTaxCalculator.get_tax_rates (ICMS já inclui o FCP)"""
+        position = self.offset(ncm_code, state)
+        return {
+            'ICMS': self.rates[position] + self.fcp_rates[position],
+            'FCP': self.fcp_rates[position],
+            'ICMS_FACTOR': self.factors[position]
+        }
+
+    def interstate_rate(self, origin: str, destination: str, imported: bool = True) -> float:
+        if imported:
+            return self.IMPORTED_INTERSTATE_RATE
+        if origin in self.SOUTH_SOUTHEAST and destination not in self.SOUTH_SOUTHEAST:
+            return 0.07
+        return 0.12
+
+    def sale_rate(self, ncm_code: str, sale_state: str, customer_state: Optional[str] = None,
+                  final_consumer: bool = True) -> float:
+        """
+        Carga de ICMS na revenda de mercadoria importada: alíquota interna na
+        venda dentro da UF; interestadual de 4% para contribuintes; para
+        consumidor final, 4% mais o diferencial de alíquota (EC 87/2015),
+        ou seja, a alíquota interna da UF do cliente
+        """
+        if customer_state is None or customer_state == sale_state:
+            return self.internal_rate(ncm_code, sale_state)
+        if final_consumer:
+            return self.internal_rate(ncm_code, customer_state)
+        return self.interstate_rate(sale_state, customer_state)
+
+    def to_dict(self) -> Dict:
+        """Matriz serializável (prévia de cálculo em static/js/calculator.js)"""
+        return {
+            'states': list(self.STATES),
+            'classes': list(self.CLASSES),
+            'chapter_classes': self.CHAPTER_CLASSES,
+            'ncm_classes': self.NCM_CLASSES,
+            'rates': [rate + fcp for rate, fcp in zip(self.rates, self.fcp_rates)],
+            'factors': list(self.factors)
+        }
@@ -0,0 +1,210 @@
+import json
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+from sqlalchemy import delete, insert, select
+
+from app import db
+from models import Job, JobResultChunk
+
+class JobQueue:
+    """
+    Fila de tarefas em segundo plano persistida na tabela jobs.
+
+    A reserva de uma tarefa usa SELECT ... FOR UPDATE SKIP LOCKED (PostgreSQL)
+    seguido de um UPDATE condicional ao status PENDING, o que também garante
+    exclusividade no SQLite, onde FOR UPDATE é ignorado.
+
+    Handlers que retornam um iterador de bytes (exportações) têm o resultado
+    gravado em blocos de RESULT_CHUNK_SIZE em job_result_chunks à medida que é
+    gerado, sem montar o arquivo inteiro na memória do processo de trabalho.
+    """
+
+    # Segundos sem progresso até uma tarefa RUNNING ser considerada abandonada
+    LOCK_TIMEOUT = 15 * 60
+    # Espera base entre tentativas (segundos, dobra a cada falha)
+    RETRY_DELAY = 30
+    # Tamanho mínimo de cada bloco gravado de um resultado em streaming (bytes)
+    RESULT_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.handlers: Dict[str, Callable] = {}
+
+    def handler(self, kind: str):
+        """
+        Registra a função que executa tarefas do tipo `kind`.
+        Assinatura: handler(job, payload) -> bytes, iterador de bytes, (bytes ou
+        iterador, content_type) ou objeto JSON.
+        """
+        def decorator(func):
+            self.handlers[kind] = func
+            return func
+        return decorator
+
+    def enqueue(self, kind: str, payload: Dict, user_id: Optional[str] = None,
+                max_attempts: int = 3) -> Job:
+        """Cria uma tarefa pendente"""
+        if kind not in self.handlers:
+            raise ValueError(f'Tipo de tarefa desconhecido: {kind}')
+        job = Job(kind=kind, payload=json.dumps(payload), user_id=user_id, max_attempts=max_attempts)
+        db.session.add(job)
+        db.session.commit()
+        self.logger.info(f"Tarefa {job.id} ({kind}) enfileirada")
+        return job
+
+    def claim(self, worker_id: str) -> Optional[Job]:
+        """Reserva a próxima tarefa pendente para este processo de trabalho"""
+        for _ in range(5):
+            now = datetime.utcnow()
+            candidate = (db.session.query(Job.id)
+                         .filter(Job.status == 'PENDING', Job.run_after <= now)
+                         .order_by(Job.run_after, Job.created_at)
+                         .limit(1)
+                         .with_for_update(skip_locked=True)
+                         .scalar())
+            if candidate is None:
+                db.session.rollback()
+                return None
+
+            claimed = (Job.query
+                       .filter(Job.id == candidate, Job.status == 'PENDING')
+                       .update({
+                           'status': 'RUNNING',
+                           'locked_by': worker_id,
+                           'locked_at': now,
+                           'started_at': now,
+                           'attempts': Job.attempts + 1,
+                           'error': None
+                       }, synchronize_session=False))
+            db.session.commit()
+            if claimed:
+                return db.session.get(Job, candidate)
+        return None
+
+    def report_progress(self, job: Job, progress: float, message: Optional[str] = None):
+        """Atualiza o progresso (0 a 1) e renova a reserva da tarefa"""
+        job.progress = max(0.0, min(progress, 1.0))
+        job.progress_message = message
+        job.locked_at = datetime.utcnow()
+        db.session.commit()
+
+    def run(self, job: Job):
+        """Executa uma tarefa já reservada e grava resultado, erro ou reagendamento"""
+        try:
+            result = self.handlers[job.kind](job, json.loads(job.payload or '{}'))
+            content_type = 'application/octet-stream'
+            if isinstance(result, tuple):
+                result, content_type = result
+            if isinstance(result, Iterator):
+                job.result = None
+                job.result_size = self._store_chunks(job, result)
+            else:
+                if not isinstance(result, (bytes, bytearray)):
+                    result, content_type = json.dumps(result).encode('utf-8'), 'application/json'
+                job.result = bytes(result)
+                job.result_size = len(result)
+            job.result_content_type = content_type
+            job.status = 'SUCCEEDED'
+            job.progress = 1.0
+            job.finished_at = datetime.utcnow()
+            job.locked_by = None
+            db.session.commit()
+            self.logger.info(f"Tarefa {job.id} ({job.kind}) concluída")
+
+        except Exception as e:
+            db.session.rollback()
+            job.error = str(e)[:2000]
+            job.locked_by = None
+            if job.attempts < job.max_attempts:
+                job.status = 'PENDING'
+                job.run_after = datetime.utcnow() + timedelta(seconds=self.RETRY_DELAY * 2 ** (job.attempts - 1))
+                self.logger.warning(f"Tarefa {job.id} ({job.kind}) falhou, nova tentativa agendada: {str(e)}")
+            else:
+                job.status = 'FAILED'
+                job.finished_at = datetime.utcnow()
+                self.logger.error(f"Tarefa {job.id} ({job.kind}) falhou definitivamente: {str(e)}")
+            db.session.commit()
+
+    def _store_chunks(self, job: Job, chunks: Iterable[bytes]) -> int:
+        """
+        Grava o resultado em job_result_chunks (blocos de ao menos
+        RESULT_CHUNK_SIZE bytes, o último menor) e retorna o total de bytes.
+        Os blocos de uma tentativa anterior são descartados; a gravação só é
+        confirmada com a conclusão da tarefa.
+        """
+        db.session.execute(delete(JobResultChunk).where(JobResultChunk.job_id == job.id))
+        size = 0
+        for position, block in enumerate(self._blocks(chunks)):
+            db.session.execute(insert(JobResultChunk), [{'job_id': job.id, 'position': position, 'data': block}])
+            size += len(block)
+        return size
+
+    def _blocks(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """Reagrupa os pedaços gerados pelo handler em blocos de ao menos RESULT_CHUNK_SIZE bytes"""
+        buffer = bytearray()
+        for chunk in chunks:
+            buffer += chunk
+            if len(buffer) >= self.RESULT_CHUNK_SIZE:
+                yield bytes(buffer)
+                buffer = bytearray()
+        if buffer:
+            yield bytes(buffer)
+
+    def iter_result(self, job: Job) -> Iterator[bytes]:
+        """Resultado de uma tarefa concluída, bloco a bloco"""
+        if job.result is not None:
+            yield job.result
+            return
+        query = (select(JobResultChunk.data)
+                 .where(JobResultChunk.job_id == job.id)
+                 .order_by(JobResultChunk.position)
+                 .execution_options(yield_per=1))
+        yield from db.session.execute(query).scalars()
+
+    def requeue_stale(self) -> int:
+        """Devolve à fila tarefas RUNNING cujo processo parou de reportar progresso"""
+        limit = datetime.utcnow() - timedelta(seconds=self.LOCK_TIMEOUT)
+        stale = Job.query.filter(Job.status == 'RUNNING', Job.locked_at < limit)
+        retried = (stale.filter(Job.attempts < Job.max_attempts)
+                   .update({'status': 'PENDING', 'locked_by': None,
+                            'error': 'Tarefa abandonada pelo processo de trabalho'},
+                           synchronize_session=False))
+        failed = (stale.filter(Job.attempts >= Job.max_attempts)
+                  .update({'status': 'FAILED', 'locked_by': None, 'finished_at': datetime.utcnow(),
+                           'error': 'Tarefa abandonada pelo processo de trabalho'},
+                          synchronize_session=False))
+        db.session.commit()
+        if retried or failed:
+            self.logger.warning(f"Tarefas abandonadas: {retried} reenfileiradas, {failed} com falha")
+        return retried + failed
+
+    def work(self, worker_id: Optional[str] = None, once: bool = False,
+             poll_interval: float = 1.0, max_jobs: Optional[int] = None) -> int:
+        """
+        Laço do processo de trabalho: reserva e executa tarefas até não haver mais
+        (once=True) ou indefinidamente. Retorna o número de tarefas executadas.
+        """
+        worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.logger.info(f"Processo de trabalho {worker_id} iniciado")
+        processed = 0
+        last_requeue = 0.0
+        while max_jobs is None or processed < max_jobs:
+            if time.monotonic() - last_requeue > 60:
+                self.requeue_stale()
+                last_requeue = time.monotonic()
+
+            job = self.claim(worker_id)
+            if job is None:
+                if once:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            self.run(job)
+            processed += 1
+        return processed
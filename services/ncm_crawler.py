@@ -0,0 +1,220 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+@dataclass
+class CrawlResult:
+    url: str
+    status: int                  # status HTTP da resposta (200 também para 304 servido do cache)
+    body: Optional[bytes]
+    from_cache: bool = False     # corpo veio do cache em disco (304 ou checkpoint)
+    error: Optional[str] = None
+    data: Optional[object] = None  # retorno de `parse`, se informado
+
+class _HostRateLimiter:
+    """Intervalo mínimo entre requisições ao mesmo host, compartilhado pelas threads"""
+
+    def __init__(self, requests_per_second: float):
+        self.interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_slot: Dict[str, float] = {}
+
+    def wait(self, host: str):
+        # Sem limite (interval 0) ainda vale o adiamento de delay()
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def delay(self, host: str, seconds: float):
+        """Adia as próximas requisições ao host (429 / Retry-After)"""
+        with self.lock:
+            self.next_slot[host] = max(self.next_slot.get(host, 0.0), time.monotonic() + seconds)
+
+class NcmCrawler:
+    """
+    Coleta concorrente de páginas (detalhes de NCM) com pool de conexões.
+
+    Threads compartilham uma sessão requests cujo pool tem uma conexão por
+    thread; cada host recebe no máximo `requests_per_second` requisições.
+    Respostas ficam em cache em disco (corpo + ETag/Last-Modified) e são
+    revalidadas com GET condicional. URLs concluídas são anotadas num
+    arquivo de checkpoint, de modo que uma coleta interrompida retoma do
+    ponto em que parou, lendo do cache as páginas já obtidas.
+    """
+
+    MAX_ATTEMPTS = 3
+    RETRY_DELAY = 1.0
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, cache_dir: str, max_workers: int = 8, requests_per_second: float = 2.0,
+                 timeout: float = 30.0, user_agent: Optional[str] = None):
+        self.logger = logging.getLogger(__name__)
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.rate_limiter = _HostRateLimiter(requests_per_second)
+        os.makedirs(os.path.join(cache_dir, 'pages'), exist_ok=True)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if user_agent:
+            self.session.headers['User-Agent'] = user_agent
+
+    def _cache_paths(self, url: str):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.cache_dir, 'pages', key[:2], key)
+        return base + '.body', base + '.json'
+
+    def _read_cache(self, url: str):
+        body_path, meta_path = self._cache_paths(url)
+        try:
+            with open(meta_path, encoding='utf-8') as file:
+                meta = json.load(file)
+            with open(body_path, 'rb') as file:
+                return meta, file.read()
+        except (OSError, ValueError):
+            return None, None
+
+    def _write_cache(self, url: str, response: requests.Response):
+        body_path, meta_path = self._cache_paths(url)
+        os.makedirs(os.path.dirname(body_path), exist_ok=True)
+        meta = {
+            'url': url,
+            'status': response.status_code,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched_at': time.time()
+        }
+        # Corpo antes dos metadados; ambos por renomeação (sem arquivos parciais)
+        for path, content, mode in ((body_path, response.content, 'wb'),
+                                    (meta_path, json.dumps(meta), 'w')):
+            with open(path + '.tmp', mode) as file:
+                file.write(content)
+            os.replace(path + '.tmp', path)
+
+    def fetch(self, url: str) -> CrawlResult:
+        """GET (condicional, se houver cache) com limite por host e novas tentativas"""
+        meta, cached_body = self._read_cache(url)
+        headers = {}
+        if meta:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        host = urlsplit(url).netloc
+        error = None
+        for attempt in range(1, self.MAX_ATTEMPTS + 1):
+            self.rate_limiter.wait(host)
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except requests.RequestException as e:
+                error = str(e)
+            else:
+                if response.status_code == 304 and meta:
+                    return CrawlResult(url, meta['status'], cached_body, from_cache=True)
+                if response.status_code not in self.RETRY_STATUSES:
+                    if response.ok:
+                        self._write_cache(url, response)
+                    return CrawlResult(url, response.status_code, response.content,
+                                       error=None if response.ok else f'HTTP {response.status_code}')
+                error = f'HTTP {response.status_code}'
+                retry_after = self._retry_after(response)
+                if retry_after:
+                    self.rate_limiter.delay(host, retry_after)
+            if attempt < self.MAX_ATTEMPTS:
+                time.sleep(self.RETRY_DELAY * 2 ** (attempt - 1))
+
+        # Falha de rede: o cache, mesmo antigo, é melhor que nada
+        if cached_body is not None:
+            return CrawlResult(url, meta['status'], cached_body, from_cache=True, error=error)
+        return CrawlResult(url, 0, None, error=error)
+
+    @staticmethod
+    def _retry_after(response: requests.Response) -> Optional[float]:
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                return None
+
+    def _checkpoint_path(self, name: str) -> str:
+        return os.path.join(self.cache_dir, f'checkpoint-{name}.txt')
+
+    def load_checkpoint(self, name: str) -> set:
+        try:
+            with open(self._checkpoint_path(name), encoding='utf-8') as file:
+                return {line.rstrip('\n') for line in file if line.strip()}
+        except OSError:
+            return set()
+
+    def reset_checkpoint(self, name: str):
+        try:
+            os.remove(self._checkpoint_path(name))
+        except OSError:
+            pass
+
+    def crawl(self, urls: Iterable[str], checkpoint: str = 'default',
+              parse: Optional[Callable[[str, bytes], object]] = None,
+              progress: Optional[Callable[[int, int], None]] = None) -> List[CrawlResult]:
+        """
+        Coleta as URLs concorrentemente e retorna os resultados na ordem de
+        entrada. URLs já anotadas no checkpoint são lidas do cache sem
+        requisição; `parse(url, body)` é aplicado a cada página obtida.
+        """
+        urls = list(dict.fromkeys(urls))
+        done = self.load_checkpoint(checkpoint)
+        results: Dict[str, CrawlResult] = {}
+        pending = []
+        for url in urls:
+            meta, body = self._read_cache(url) if url in done else (None, None)
+            if meta:
+                results[url] = CrawlResult(url, meta['status'], body, from_cache=True)
+            else:
+                pending.append(url)
+        if len(pending) < len(urls):
+            self.logger.info(f"Retomando coleta '{checkpoint}': {len(urls) - len(pending)} URL(s) já concluídas")
+
+        with open(self._checkpoint_path(checkpoint), 'a', encoding='utf-8') as checkpoint_file, \
+                ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.fetch, url): url for url in pending}
+            for completed, future in enumerate(as_completed(futures), start=1):
+                result = future.result()
+                results[result.url] = result
+                # Só respostas definitivas entram no checkpoint (erros são refeitos na retomada)
+                if result.error is None:
+                    checkpoint_file.write(result.url + '\n')
+                    checkpoint_file.flush()
+                if progress:
+                    progress(completed, len(pending))
+
+        ordered = [results[url] for url in urls]
+        if parse:
+            for result in ordered:
+                if result.body is not None and result.error is None:
+                    result.data = parse(result.url, result.body)
+        failures = sum(1 for result in ordered if result.error)
+        self.logger.info(f"Coleta '{checkpoint}': {len(ordered)} URL(s), {len(pending)} requisitada(s), "
+                         f"{failures} com erro")
+        return ordered
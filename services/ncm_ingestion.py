@@ -0,0 +1,233 @@
+import csv
+import hashlib
+import io
+import json
+import logging
+import re
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import requests
+from sqlalchemy import delete, insert, select, update
+
+from app import db
+from models import NcmCache, NcmEntry, SystemConfig
+
+class NcmIngestion:
+    """
+    Carga da tabela oficial de NCM com sincronização incremental.
+
+    Fontes: nomenclatura NCM em JSON publicada pelo Siscomex (códigos e
+    descrições), TEC em CSV (alíquota do II) e TIPI em CSV (alíquota do
+    IPI), por caminho local ou URL. O catálogo resultante é comparado com
+    ncm_entries e apenas códigos novos, alterados ou removidos são gravados,
+    numa única transação; a versão gravada em system_config muda junto, e
+    cada processo recarrega o catálogo do NCMService ao perceber a mudança.
+    Com um RateStore, as alíquotas da TEC e da TIPI lidas viram também
+    versões de II e IPI com vigência (as usadas por BrazilianTaxCalculator).
+    """
+
+    NOMENCLATURE_URL = 'https://portalunico.siscomex.gov.br/classif/api/publico/nomenclatura/download/json'
+    VERSION_KEY = 'ncm_catalogue_version'
+    FIELDS = ('description', 'ii_rate', 'ipi_rate')
+    # Linhas por comando em cargas e exclusões
+    BATCH_SIZE = 1000
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+
+    def read_source(self, source: str) -> bytes:
+        """Conteúdo de um arquivo local ou de uma URL http(s)"""
+        if source.startswith(('http://', 'https://')):
+            response = requests.get(source, timeout=120)
+            response.raise_for_status()
+            return response.content
+        with open(source, 'rb') as file:
+            return file.read()
+
+    @staticmethod
+    def _decode(content: bytes) -> str:
+        try:
+            return content.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            return content.decode('latin-1')
+
+    @staticmethod
+    def normalize_code(code: str) -> str:
+        return re.sub(r'\D', '', code or '')
+
+    @staticmethod
+    def _clean_description(text: str) -> str:
+        text = re.sub(r'<[^>]+>', '', text or '')
+        return re.sub(r'\s+', ' ', text.lstrip('- \t')).strip()
+
+    def parse_nomenclature(self, content: bytes) -> Dict[str, str]:
+        """
+        Descrições dos códigos de 8 dígitos do JSON do Siscomex
+        ({"Nomenclaturas": [{"Codigo": "0101.21.00", "Descricao": "-- ..."}]}).
+        Itens genéricos ("Outros", "Outras") recebem a descrição do nível
+        superior como prefixo, para serem distinguíveis na busca.
+        """
+        data = json.loads(self._decode(content))
+        items = data.get('Nomenclaturas', data) if isinstance(data, dict) else data
+
+        descriptions = {}
+        for item in items:
+            code = self.normalize_code(item.get('Codigo'))
+            if code:
+                descriptions[code] = self._clean_description(item.get('Descricao'))
+
+        # Descrições completas, dos níveis mais altos para os mais baixos
+        full = {}
+        for code in sorted(descriptions, key=len):
+            description = descriptions[code]
+            if description.lower().startswith('outr'):
+                parent = next((code[:length] for length in range(len(code) - 1, 1, -1)
+                               if code[:length] in full), None)
+                if parent:
+                    description = f'{full[parent]} - {description}'
+            full[code] = description
+        return {code: description for code, description in full.items() if len(code) == 8}
+
+    def parse_rates_csv(self, content: bytes, rate_headers: Tuple[str, ...]) -> Dict[str, float]:
+        """
+        Alíquotas (em fração) de um CSV com colunas de código NCM e de alíquota
+        em percentual; "NT" (não tributado) vale zero e sufixos como "BK" são ignorados
+        """
+        text = self._decode(content)
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=';,\t')
+        reader = csv.reader(io.StringIO(text), dialect)
+        header = [column.strip().upper() for column in next(reader)]
+        code_index = next((index for index, column in enumerate(header)
+                           if column in ('NCM', 'CODIGO', 'CÓDIGO', 'CODIGO NCM', 'CÓDIGO NCM')), None)
+        rate_index = next((index for index, column in enumerate(header)
+                           if any(name in column for name in rate_headers)), None)
+        if code_index is None or rate_index is None:
+            raise ValueError(f'CSV sem colunas de NCM e alíquota ({", ".join(rate_headers)}): {header}')
+
+        rates = {}
+        for row in reader:
+            if len(row) <= max(code_index, rate_index):
+                continue
+            code = self.normalize_code(row[code_index])
+            value = row[rate_index].strip().upper()
+            if len(code) != 8 or not value:
+                continue
+            if value == 'NT':
+                rates[code] = 0.0
+                continue
+            match = re.match(r'\d+(?:[.,]\d+)?', value)
+            if match:
+                rates[code] = round(float(match.group().replace(',', '.')) / 100, 6)
+        return rates
+
+    def build_catalogue(self, descriptions: Dict[str, str], ii_rates: Optional[Dict[str, float]],
+                        ipi_rates: Optional[Dict[str, float]], current: Dict[str, Dict]) -> Dict[str, Dict]:
+        """
+        Catálogo novo; alíquotas de fontes não informadas (None) mantêm os
+        valores atuais de cada código
+        """
+        catalogue = {}
+        for code, description in descriptions.items():
+            existing = current.get(code, {})
+            catalogue[code] = {
+                'description': description,
+                'ii_rate': ii_rates.get(code) if ii_rates is not None else existing.get('ii_rate'),
+                'ipi_rate': ipi_rates.get(code) if ipi_rates is not None else existing.get('ipi_rate')
+            }
+        return catalogue
+
+    def load_current(self) -> Dict[str, Dict]:
+        return {
+            code: dict(zip(self.FIELDS, values))
+            for code, *values in db.session.execute(
+                select(NcmEntry.code, NcmEntry.description, NcmEntry.ii_rate, NcmEntry.ipi_rate))
+        }
+
+    def diff(self, catalogue: Dict[str, Dict], current: Dict[str, Dict]) -> Dict[str, List[str]]:
+        """Códigos adicionados, alterados e removidos em relação ao catálogo atual"""
+        return {
+            'added': sorted(catalogue.keys() - current.keys()),
+            'changed': sorted(code for code in catalogue.keys() & current.keys()
+                              if catalogue[code] != current[code]),
+            'removed': sorted(current.keys() - catalogue.keys())
+        }
+
+    @staticmethod
+    def compute_version(catalogue: Dict[str, Dict]) -> str:
+        payload = json.dumps(catalogue, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+    def get_version(self) -> Optional[str]:
+        config = SystemConfig.query.filter_by(key=self.VERSION_KEY).first()
+        return config.value if config else None
+
+    def sync(self, nomenclature: str, tec: Optional[str] = None, tipi: Optional[str] = None,
+             dry_run: bool = False, rate_store=None, valid_from: Optional[date] = None) -> Dict:
+        """
+        Lê as fontes, calcula a diferença e aplica apenas as mudanças
+        (dry_run=True só calcula). Com rate_store, grava as alíquotas da TEC e
+        da TIPI como versões de II e IPI vigentes a partir de valid_from
+        (padrão: hoje); códigos com a mesma alíquota vigente são ignorados.
+        Retorna contagens (rate_versions: versões gravadas por imposto) e a
+        versão do catálogo.
+        """
+        descriptions = self.parse_nomenclature(self.read_source(nomenclature))
+        if not descriptions:
+            raise ValueError('Nomenclatura sem códigos de 8 dígitos')
+        ii_rates = self.parse_rates_csv(self.read_source(tec), ('TEC', 'II')) if tec else None
+        ipi_rates = self.parse_rates_csv(self.read_source(tipi), ('IPI', 'ALÍQUOTA', 'ALIQUOTA')) if tipi else None
+
+        current = self.load_current()
+        catalogue = self.build_catalogue(descriptions, ii_rates, ipi_rates, current)
+        changes = self.diff(catalogue, current)
+        version = self.compute_version(catalogue)
+        summary = {
+            'codes': len(catalogue),
+            **{key: len(codes) for key, codes in changes.items()},
+            'version': version,
+            'rate_versions': {}
+        }
+        if dry_run:
+            return summary
+
+        if rate_store is not None:
+            # Só os códigos da nomenclatura; independe de o catálogo ter mudado
+            for tax_type, rates, source in (('II', ii_rates, tec), ('IPI', ipi_rates, tipi)):
+                if rates is not None:
+                    summary['rate_versions'][tax_type] = rate_store.add_versions(
+                        tax_type, {code: rate for code, rate in rates.items() if code in catalogue},
+                        valid_from or date.today(), source=source)
+        if not any(changes.values()):
+            return summary
+
+        self._apply(catalogue, changes, version)
+        self.logger.info(f"Catálogo NCM sincronizado: {summary}")
+        return summary
+
+    def _apply(self, catalogue: Dict[str, Dict], changes: Dict[str, List[str]], version: str):
+        try:
+            for codes in self._batches(changes['removed']):
+                db.session.execute(delete(NcmEntry).where(NcmEntry.code.in_(codes)))
+            for codes in self._batches(changes['added']):
+                db.session.execute(insert(NcmEntry), [{'code': code, **catalogue[code]} for code in codes])
+            for codes in self._batches(changes['changed']):
+                db.session.execute(update(NcmEntry), [{'code': code, **catalogue[code]} for code in codes])
+            # Entradas do cache de consulta de códigos alterados ou removidos
+            for codes in self._batches(changes['changed'] + changes['removed']):
+                db.session.execute(delete(NcmCache).where(NcmCache.code.in_(codes)))
+
+            config = SystemConfig.query.filter_by(key=self.VERSION_KEY).first()
+            if config is None:
+                config = SystemConfig(key=self.VERSION_KEY,
+                                      description='Versão da tabela oficial de NCM carregada em ncm_entries')
+                db.session.add(config)
+            config.value = version
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def _batches(self, codes: List[str]) -> Iterable[List[str]]:
+        for start in range(0, len(codes), self.BATCH_SIZE):
+            yield codes[start:start + self.BATCH_SIZE]
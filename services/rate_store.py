@@ -0,0 +1,166 @@
+import logging
+import time
+from bisect import bisect_right
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import insert, select, update
+
+from app import db
+from models import SystemConfig, TaxRateVersion
+
+class RateStore:
+    """
+    Alíquotas com vigência (tax_rate_versions) e consulta por data.
+
+    As versões ficam em memória indexadas por (NCM, imposto) em listas
+    ordenadas por início de vigência; a alíquota de uma data é localizada
+    por busca binária (bisect), O(log n) no número de versões do par. Os
+    intervalos de um par não se sobrepõem: gravar uma versão nova encerra a
+    vigente na data de início da nova. Cada processo recarrega o índice ao
+    perceber, no máximo a cada VERSION_CHECK_INTERVAL segundos, que a
+    versão gravada em system_config mudou.
+    """
+
+    VERSION_KEY = 'tax_rates_version'
+    VERSION_CHECK_INTERVAL = 60
+    TAX_TYPES = ('II', 'IPI', 'PIS', 'COFINS', 'ICMS')
+    # NCM das versões que valem para todos os códigos sem versão própria
+    ALL_NCMS = '*'
+    BATCH_SIZE = 1000
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._index: Optional[Dict[Tuple[str, str], Tuple[List[date], List[Optional[date]], List[float]]]] = None
+        self._loaded_version = None
+        self._checked_at = 0.0
+
+    def _ensure_current(self):
+        now = time.monotonic()
+        if self._index is not None and now - self._checked_at < self.VERSION_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        try:
+            # Conexão própria: não interfere na transação da requisição
+            with db.engine.connect() as connection:
+                version = connection.execute(
+                    select(SystemConfig.value).where(SystemConfig.key == self.VERSION_KEY)
+                ).scalar()
+                if self._index is not None and version == self._loaded_version:
+                    return
+                rows = connection.execute(
+                    select(TaxRateVersion.ncm_code, TaxRateVersion.tax_type, TaxRateVersion.valid_from,
+                           TaxRateVersion.valid_to, TaxRateVersion.rate)
+                    .order_by(TaxRateVersion.ncm_code, TaxRateVersion.tax_type, TaxRateVersion.valid_from)
+                ).all()
+        except Exception as e:
+            self.logger.warning(f"Alíquotas com vigência indisponíveis: {str(e)}")
+            self._index = self._index or {}
+            return
+
+        index = {}
+        for ncm_code, tax_type, valid_from, valid_to, rate in rows:
+            starts, ends, rates = index.setdefault((ncm_code, tax_type), ([], [], []))
+            starts.append(valid_from)
+            ends.append(valid_to)
+            rates.append(rate)
+        self._index = index
+        self._loaded_version = version
+        self.logger.info(f"Alíquotas com vigência carregadas: {len(rows)} versão(ões)")
+
+    @property
+    def version(self) -> Optional[str]:
+        """Versão carregada das alíquotas com vigência (muda a cada gravação)"""
+        self._ensure_current()
+        return self._loaded_version
+
+    def lookup(self, ncm_code: str, tax_type: str, as_of: date) -> Optional[float]:
+        """Alíquota vigente do imposto para o NCM na data (None se não houver versão)"""
+        self._ensure_current()
+        for key in ((ncm_code, tax_type), (self.ALL_NCMS, tax_type)):
+            versions = self._index.get(key)
+            if versions is None:
+                continue
+            starts, ends, rates = versions
+            position = bisect_right(starts, as_of) - 1
+            if position >= 0 and (ends[position] is None or as_of < ends[position]):
+                return rates[position]
+        return None
+
+    def get_rates(self, ncm_code: str, as_of: date) -> Dict[str, float]:
+        """Alíquotas com versão vigente na data, por imposto (impostos sem versão ficam de fora)"""
+        rates = {}
+        for tax_type in self.TAX_TYPES:
+            rate = self.lookup(ncm_code, tax_type, as_of)
+            if rate is not None:
+                rates[tax_type] = rate
+        return rates
+
+    def versions_for(self, ncm_code: str) -> List[TaxRateVersion]:
+        return (TaxRateVersion.query
+                .filter(TaxRateVersion.ncm_code.in_([ncm_code, self.ALL_NCMS]))
+                .order_by(TaxRateVersion.tax_type, TaxRateVersion.ncm_code, TaxRateVersion.valid_from)
+                .all())
+
+    def add_versions(self, tax_type: str, rates: Dict[str, float], valid_from: date,
+                     source: Optional[str] = None) -> int:
+        """
+        Grava novas alíquotas de um imposto (NCM -> alíquota) vigentes a partir
+        de valid_from, encerrando as versões abertas; códigos cuja alíquota
+        vigente já é a mesma são ignorados. Retorna o número de versões gravadas.
+        """
+        if tax_type not in self.TAX_TYPES:
+            raise ValueError(f'Imposto inválido: {tax_type}')
+        open_versions = {
+            ncm_code: (version_id, version_from, rate)
+            for version_id, ncm_code, version_from, rate in db.session.execute(
+                select(TaxRateVersion.id, TaxRateVersion.ncm_code, TaxRateVersion.valid_from, TaxRateVersion.rate)
+                .where(TaxRateVersion.tax_type == tax_type, TaxRateVersion.valid_to.is_(None)))
+        }
+
+        closed, replaced, inserted = [], [], []
+        for ncm_code, rate in rates.items():
+            current = open_versions.get(ncm_code)
+            if current is None:
+                inserted.append(ncm_code)
+                continue
+            version_id, version_from, current_rate = current
+            if current_rate == rate:
+                continue
+            if version_from > valid_from:
+                raise ValueError(f'{ncm_code}/{tax_type}: versão vigente desde {version_from}, '
+                                 f'posterior a {valid_from}')
+            if version_from == valid_from:
+                replaced.append({'id': version_id, 'rate': rate, 'source': source})
+            else:
+                closed.append({'id': version_id, 'valid_to': valid_from})
+                inserted.append(ncm_code)
+
+        try:
+            for start in range(0, len(closed), self.BATCH_SIZE):
+                db.session.execute(update(TaxRateVersion), closed[start:start + self.BATCH_SIZE])
+            for start in range(0, len(replaced), self.BATCH_SIZE):
+                db.session.execute(update(TaxRateVersion), replaced[start:start + self.BATCH_SIZE])
+            for start in range(0, len(inserted), self.BATCH_SIZE):
+                db.session.execute(insert(TaxRateVersion), [
+                    {'ncm_code': ncm_code, 'tax_type': tax_type, 'rate': rates[ncm_code],
+                     'valid_from': valid_from, 'source': source}
+                    for ncm_code in inserted[start:start + self.BATCH_SIZE]
+                ])
+
+            written = len(replaced) + len(inserted)
+            if written:
+                config = SystemConfig.query.filter_by(key=self.VERSION_KEY).first()
+                if config is None:
+                    config = SystemConfig(key=self.VERSION_KEY,
+                                          description='Marca de alteração de tax_rate_versions')
+                    db.session.add(config)
+                config.value = datetime.utcnow().isoformat()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        self._index = None
+        self.logger.info(f"{written} alíquota(s) de {tax_type} gravada(s) com vigência a partir de {valid_from}")
+        return written
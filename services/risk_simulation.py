@@ -0,0 +1,257 @@
+import logging
+import math
+import operator
+import os
+import random
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from services.tax_calculator import BenefitContext, BrazilianTaxCalculator
+
+def _simulate_chunk(task: Dict) -> Dict[str, array]:
+    """
+    Simula um bloco de sorteios (função de módulo para poder rodar em outro processo).
+    Cada bloco tem semente própria derivada da semente da simulação, então o
+    resultado não depende do número de processos.
+    """
+    rng = random.Random(f"{task['seed']}:{task['index']}")
+    draws = task['draws']
+    spot_rate = task['spot_rate']
+    fob_usd = task['fob_usd']
+    freight_usd = task['freight_usd']
+    insurance_usd = task['insurance_usd']
+    cost_factor = task['cost_factor']
+
+    # Ruído lognormal com média 1 (não desloca o valor esperado de frete/seguro)
+    freight_sigma = task['freight_sigma']
+    insurance_sigma = task['insurance_sigma']
+    freight_mu = -freight_sigma ** 2 / 2
+    insurance_mu = -insurance_sigma ** 2 / 2
+
+    if task['method'] == 'bootstrap':
+        horizon_returns = task['horizon_returns']
+        count = len(horizon_returns)
+        rates = [spot_rate * math.exp(horizon_returns[int(rng.random() * count)]) for _ in range(draws)]
+    else:
+        drift = task['drift']
+        volatility = task['volatility']
+        gauss = rng.gauss
+        rates = [spot_rate * math.exp(drift + volatility * gauss(0.0, 1.0)) for _ in range(draws)]
+
+    gauss = rng.gauss
+    exp = math.exp
+    costs = array('d', [
+        (fob_usd
+         + freight_usd * exp(freight_mu + freight_sigma * gauss(0.0, 1.0))
+         + insurance_usd * exp(insurance_mu + insurance_sigma * gauss(0.0, 1.0))) * rate * cost_factor
+        for rate in rates
+    ])
+
+    result = {'rates': array('d', rates), 'costs': costs}
+
+    revenue = task['revenue']
+    if revenue:
+        net_revenue = revenue * task['net_revenue_rate'] - task['extra_costs']
+        result['net_margins'] = array('d', [(net_revenue - cost) / revenue * 100 for cost in costs])
+
+    return result
+
+class RiskSimulation:
+    """
+    Simulação de Monte Carlo do custo final de importação.
+
+    Sorteia cotações do dólar no horizonte informado (bootstrap de retornos
+    históricos ou movimento browniano geométrico ajustado ao histórico), com
+    ruído em frete e seguro, e resume o custo final e a margem líquida em
+    faixas de percentis. A cascata de impostos é linear no CIF, então cada
+    sorteio custa CIF_BRL * fator (mesmo fator de calculate_all_taxes).
+    """
+
+    # Limite de sorteios por simulação
+    MAX_DRAWS = 2_000_000
+    # Sorteios por bloco (unidade de paralelismo e de derivação de sementes)
+    CHUNK_SIZE = 50_000
+    PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+    METHODS = ('bootstrap', 'gbm')
+
+    def __init__(self, tax_calculator: BrazilianTaxCalculator):
+        self.logger = logging.getLogger(__name__)
+        self.tax_calculator = tax_calculator
+
+    def load_history(self, currency_service=None, days: int = 365) -> List[float]:
+        """
+        Cotações históricas USD/BRL em ordem cronológica: tabela
+        exchange_rate_history e, se insuficiente, a API de histórico
+        """
+        rates = []
+        try:
+            from models import ExchangeRateHistory
+            records = (ExchangeRateHistory.query
+                       .filter_by(currency='USD')
+                       .order_by(ExchangeRateHistory.recorded_at.desc())
+                       .limit(days)
+                       .all())
+            rates = [record.rate for record in reversed(records)]
+        except Exception as e:
+            self.logger.warning(f"Histórico local de câmbio indisponível: {str(e)}")
+
+        if len(rates) < 2 and currency_service is not None:
+            historical = currency_service.get_historical_rates(days)
+            rates = [historical[date] for date in sorted(historical)]
+
+        return rates
+
+    @staticmethod
+    def log_returns(history: List[float]) -> List[float]:
+        """Retornos logarítmicos diários de uma série de cotações"""
+        return [math.log(current / previous)
+                for previous, current in zip(history, history[1:])
+                if previous > 0 and current > 0]
+
+    @staticmethod
+    def percentiles(sorted_values, percentiles) -> Dict[str, float]:
+        """Percentis com interpolação linear sobre valores já ordenados"""
+        result = {}
+        last = len(sorted_values) - 1
+        for percentile in percentiles:
+            position = last * percentile / 100
+            lower = int(position)
+            upper = min(lower + 1, last)
+            weight = position - lower
+            value = sorted_values[lower] * (1 - weight) + sorted_values[upper] * weight
+            result[f'p{percentile}'] = round(value, 4)
+        return result
+
+    def _summarize(self, values) -> Dict[str, float]:
+        """Média, desvio padrão e faixas de percentis"""
+        count = len(values)
+        mean = math.fsum(values) / count
+        sum_squares = math.fsum(map(operator.mul, values, values))
+        variance = max(sum_squares - count * mean ** 2, 0) / max(count - 1, 1)
+        summary = {
+            'mean': round(mean, 4),
+            'std': round(math.sqrt(variance), 4),
+            'min': round(min(values), 4),
+            'max': round(max(values), 4)
+        }
+        summary.update(self.percentiles(sorted(values), self.PERCENTILES))
+        return summary
+
+    def run(self, unit_value_usd: float, quantity: int, ncm_code: str,
+            freight_usd: float, insurance_usd: float, spot_rate: float,
+            history: List[float], draws: int = 10_000, horizon_days: int = 30,
+            method: str = 'bootstrap', freight_sigma: float = 0.15,
+            insurance_sigma: float = 0.05, selling_price: Optional[float] = None,
+            additional_costs: Optional[Dict[str, float]] = None,
+            seed: Optional[int] = None, workers: int = 1, destination_state: Optional[str] = None,
+            context: Optional[BenefitContext] = None) -> Dict:
+        """
+        Executa a simulação.
+
+        history: cotações históricas em ordem cronológica (ver load_history).
+        selling_price: preço de venda unitário (BRL); habilita a distribuição da margem líquida.
+        seed: mesma semente e parâmetros reproduzem exatamente o resultado.
+        workers: processos para avaliar os blocos (1 = no próprio processo).
+        destination_state, context: UF de destino e BenefitContext da operação,
+        como em calculate_all_taxes.
+        """
+        if method not in self.METHODS:
+            raise ValueError(f'Método inválido: {method}')
+        if not 1 <= draws <= self.MAX_DRAWS:
+            raise ValueError(f'draws deve estar entre 1 e {self.MAX_DRAWS}')
+        if horizon_days < 1:
+            raise ValueError('horizon_days deve ser maior ou igual a 1')
+
+        returns = self.log_returns(history)
+        if len(returns) < 2:
+            raise ValueError('Histórico de câmbio insuficiente para a simulação')
+
+        if seed is None:
+            seed = random.SystemRandom().randrange(2 ** 32)
+
+        rates = self.tax_calculator.get_tax_rates(ncm_code, None, destination_state, context)
+        cost_factor = self.tax_calculator.calculate_tax_factors(rates)['total_cost']
+        base_quote = self.tax_calculator.calculate_all_taxes(
+            unit_value_usd, quantity, ncm_code, freight_usd, insurance_usd, spot_rate,
+            destination_state=destination_state, context=context
+        )
+
+        task = {
+            'seed': seed,
+            'method': method,
+            'spot_rate': spot_rate,
+            'fob_usd': unit_value_usd * quantity,
+            'freight_usd': freight_usd,
+            'insurance_usd': insurance_usd,
+            'cost_factor': cost_factor,
+            'freight_sigma': freight_sigma,
+            'insurance_sigma': insurance_sigma,
+            'revenue': 0
+        }
+
+        if method == 'bootstrap':
+            # Bootstrap em blocos: retornos acumulados de janelas consecutivas do
+            # horizonte preservam a autocorrelação; sem histórico suficiente,
+            # soma de retornos diários sorteados de forma independente
+            if len(returns) >= horizon_days * 2:
+                task['horizon_returns'] = [math.fsum(returns[start:start + horizon_days])
+                                           for start in range(len(returns) - horizon_days + 1)]
+            else:
+                iid_rng = random.Random(f'{seed}:history')
+                task['horizon_returns'] = [math.fsum(iid_rng.choices(returns, k=horizon_days))
+                                           for _ in range(len(returns) * 10)]
+        else:
+            mean = math.fsum(returns) / len(returns)
+            variance = math.fsum((value - mean) ** 2 for value in returns) / (len(returns) - 1)
+            task['drift'] = mean * horizon_days
+            task['volatility'] = math.sqrt(variance * horizon_days)
+
+        if selling_price:
+            additional_costs = additional_costs or {}
+            task['revenue'] = selling_price * quantity
+            task['net_revenue_rate'] = self.tax_calculator.get_net_revenue_rate(
+                additional_costs.get('platform_fees_rate', 0),
+                sale_icms_rate=self.tax_calculator.get_sale_icms_rate(ncm_code, destination_state)
+            )
+            task['extra_costs'] = additional_costs.get('storage', 0) + additional_costs.get('marketing', 0)
+
+        tasks = [dict(task, index=index, draws=min(self.CHUNK_SIZE, draws - start))
+                 for index, start in enumerate(range(0, draws, self.CHUNK_SIZE))]
+
+        workers = max(1, min(workers, len(tasks), os.cpu_count() or 1))
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                chunks = list(executor.map(_simulate_chunk, tasks))
+        else:
+            chunks = [_simulate_chunk(chunk_task) for chunk_task in tasks]
+
+        simulated_rates = array('d')
+        costs = array('d')
+        net_margins = array('d')
+        for chunk in chunks:
+            simulated_rates.extend(chunk['rates'])
+            costs.extend(chunk['costs'])
+            if 'net_margins' in chunk:
+                net_margins.extend(chunk['net_margins'])
+
+        result = {
+            'seed': seed,
+            'draws': draws,
+            'method': method,
+            'horizon_days': horizon_days,
+            'history_points': len(history),
+            'spot_rate': spot_rate,
+            'base_total_cost': base_quote['summary']['total_cost'],
+            'exchange_rate': self._summarize(simulated_rates),
+            'total_cost': self._summarize(costs)
+        }
+
+        if net_margins:
+            result['net_margin'] = self._summarize(net_margins)
+            result['loss_probability'] = round(
+                sum(1 for margin in net_margins if margin < 0) / len(net_margins), 6
+            )
+
+        self.logger.info(f"Simulação de risco: {draws} sorteios ({method}) com {workers} processo(s)")
+        return result
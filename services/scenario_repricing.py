@@ -0,0 +1,79 @@
+import logging
+from datetime import date, timedelta
+from typing import Dict, Optional
+
+from models import ProductScenario
+from services.tax_calculator import BenefitContext, BrazilianTaxCalculator
+
+class ScenarioRepricer:
+    """
+    Reprecificação em lote dos cenários salvos: custo de cada cenário com
+    as alíquotas vigentes em `as_of` comparado ao custo com as vigentes em
+    `compare_to` (padrão: véspera de as_of), por exemplo para medir o
+    impacto de uma nova TEC antes de ela entrar em vigor. Cada cenário usa a
+    sua UF de destino e o contexto da operação (origem, ex-tarifário e
+    regime), como no cálculo.
+    """
+
+    def __init__(self, tax_calculator: BrazilianTaxCalculator, currency_service):
+        self.logger = logging.getLogger(__name__)
+        self.tax_calculator = tax_calculator
+        self.currency_service = currency_service
+
+    def reprice(self, as_of: date, compare_to: Optional[date] = None,
+                user_id: Optional[str] = None) -> Dict:
+        compare_to = compare_to or as_of - timedelta(days=1)
+        query = ProductScenario.query
+        if user_id is not None:
+            query = query.filter_by(user_id=user_id)
+        scenarios = query.order_by(ProductScenario.created_at).all()
+
+        # Cenários sem câmbio fixado usam a cotação atual (a mesma nas duas datas)
+        current_rate = None
+        if any(not scenario.exchange_rate for scenario in scenarios):
+            current_rate = self.currency_service.get_usd_brl_rate()
+
+        columns = (
+            [scenario.unit_value_usd for scenario in scenarios],
+            [scenario.default_quantity or 1 for scenario in scenarios],
+            [scenario.ncm_code for scenario in scenarios],
+            [scenario.freight_cost or 0 for scenario in scenarios],
+            [scenario.insurance_cost or 0 for scenario in scenarios],
+            [scenario.exchange_rate or current_rate for scenario in scenarios]
+        )
+        operation = {
+            'states': [scenario.destination_state for scenario in scenarios],
+            'contexts': [BenefitContext.build(scenario.origin_country, scenario.ex, scenario.customs_regime)
+                         for scenario in scenarios]
+        }
+        before = self.tax_calculator.calculate_taxes_batch(*columns, as_of=compare_to, **operation)
+        after = self.tax_calculator.calculate_taxes_batch(*columns, as_of=as_of, **operation)
+
+        items = []
+        for index, scenario in enumerate(scenarios):
+            cost_before = before['total_cost'][index]
+            cost_after = after['total_cost'][index]
+            delta = cost_after - cost_before
+            items.append({
+                'scenario_id': scenario.id,
+                'name': scenario.name,
+                'ncm_code': scenario.ncm_code,
+                'total_taxes_before': round(before['total_taxes'][index], 2),
+                'total_taxes_after': round(after['total_taxes'][index], 2),
+                'total_cost_before': round(cost_before, 2),
+                'total_cost_after': round(cost_after, 2),
+                'delta': round(delta, 2),
+                'delta_pct': round(delta / cost_before * 100, 4) if cost_before else 0.0
+            })
+        items.sort(key=lambda item: abs(item['delta']), reverse=True)
+
+        changed = sum(1 for item in items if item['delta'])
+        self.logger.info(f"Reprecificação {compare_to} -> {as_of}: {changed} de {len(items)} cenário(s) alterado(s)")
+        return {
+            'as_of': as_of.isoformat(),
+            'compare_to': compare_to.isoformat(),
+            'scenarios': len(items),
+            'changed': changed,
+            'total_cost_delta': round(sum(item['delta'] for item in items), 2),
+            'items': items
+        }
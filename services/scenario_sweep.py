@@ -0,0 +1,161 @@
+import logging
+from typing import Dict, List, Optional, Union
+
+from services.freight_estimator import FreightEstimator
+from services.tax_calculator import BenefitContext, BrazilianTaxCalculator
+
+class ScenarioSweep:
+    """
+    Motor de simulação "e se": avalia a grade cartesiana
+    câmbio × quantidade × frete (× preço de venda) em uma única passada.
+
+    Como impostos e custo final são lineares no valor CIF, o custo de cada
+    célula é CIF_BRL * fator, com o fator calculado uma vez por NCM.
+    """
+
+    # Limite de células da grade (proteção contra requisições abusivas)
+    MAX_CELLS = 2_000_000
+
+    def __init__(self, tax_calculator: BrazilianTaxCalculator,
+                 freight_estimator: Optional[FreightEstimator] = None):
+        self.logger = logging.getLogger(__name__)
+        self.tax_calculator = tax_calculator
+        self.freight_estimator = freight_estimator or FreightEstimator()
+
+    @staticmethod
+    def build_axis(base: float, spread_pct: float, steps: int) -> List[float]:
+        """
+        Eixo com `steps` valores igualmente espaçados em base ± spread_pct%
+        """
+        if steps < 1:
+            raise ValueError('steps deve ser maior ou igual a 1')
+        if steps == 1:
+            return [base]
+        low = base * (1 - spread_pct / 100)
+        step = (base * (1 + spread_pct / 100) - low) / (steps - 1)
+        return [low + step * i for i in range(steps)]
+
+    def run(self, unit_value_usd: float, ncm_code: str, insurance_usd: float,
+            exchange_rates: List[float], quantities: List[int],
+            freights: Union[Dict[str, float], List[float]],
+            selling_prices: Optional[List[float]] = None,
+            additional_costs: Optional[Dict[str, float]] = None,
+            cargo: Optional[Dict] = None, destination_state: Optional[str] = None,
+            context: Optional[BenefitContext] = None) -> Dict:
+        """
+        Avalia a grade completa, com as alíquotas da operação (ICMS da UF de
+        destino, benefícios e preferência tarifária do contexto).
+
+        freights: lista de valores (USD) ou dicionário modal -> frete (USD).
+        cargo: {'origin_country', 'unit_weight_kg', 'unit_volume_m3'}; com ele,
+        freights é a lista de modais e frete e seguro de cada (quantidade,
+        modal) vêm do FreightEstimator (insurance_usd é ignorado).
+        selling_prices: preços de venda unitários (BRL); receita = preço * quantidade.
+
+        Retorna matrizes achatadas em ordem row-major:
+        total_cost[câmbio][quantidade][frete] e, com preços,
+        net_margin[câmbio][quantidade][frete][preço] (%).
+        """
+        if cargo is not None:
+            freight_labels = list(freights)
+            freight_values = freight_labels
+        elif isinstance(freights, dict):
+            freight_labels = list(freights.keys())
+            freight_values = [float(value) for value in freights.values()]
+        else:
+            freight_values = [float(value) for value in freights]
+            freight_labels = freight_values
+
+        shape = [len(exchange_rates), len(quantities), len(freight_values)]
+        if selling_prices:
+            shape.append(len(selling_prices))
+        cells = 1
+        for size in shape:
+            cells *= size
+        if cells == 0:
+            raise ValueError('Todos os eixos devem ter ao menos um valor')
+        if cells > self.MAX_CELLS:
+            raise ValueError(f'Grade com {cells} células excede o limite de {self.MAX_CELLS}')
+
+        rates = self.tax_calculator.get_tax_rates(ncm_code, None, destination_state, context)
+        cost_factor = self.tax_calculator.calculate_tax_factors(rates)['total_cost']
+
+        # CIF em USD para cada par (quantidade, frete), reaproveitado em todas as cotações
+        estimate = None
+        if cargo is not None:
+            # Uma estimativa por par (quantidade, modal), em uma única chamada colunar
+            pairs = [(quantity, mode) for quantity in quantities for mode in freight_labels]
+            estimate = self.freight_estimator.estimate_columns(
+                [mode for _, mode in pairs],
+                [cargo.get('origin_country')] * len(pairs),
+                [unit_value_usd * quantity for quantity, _ in pairs],
+                [cargo.get('unit_weight_kg', 0) * quantity for quantity, _ in pairs],
+                [cargo.get('unit_volume_m3', 0) * quantity for quantity, _ in pairs]
+            )
+            cif_usd = [unit_value_usd * quantity + freight + insurance
+                       for (quantity, _), freight, insurance
+                       in zip(pairs, estimate['freight_usd'], estimate['insurance_usd'])]
+        else:
+            cif_usd = [unit_value_usd * quantity + freight + insurance_usd
+                       for quantity in quantities for freight in freight_values]
+
+        total_cost = []
+        for exchange_rate in exchange_rates:
+            multiplier = exchange_rate * cost_factor
+            total_cost.extend([cif * multiplier for cif in cif_usd])
+
+        result = {
+            'ncm_code': ncm_code,
+            'destination_state': destination_state,
+            'rates': rates,
+            'trade_preference': self.tax_calculator.get_trade_preference(ncm_code, None, context),
+            'shape': shape,
+            'axes': {
+                'exchange_rate': list(exchange_rates),
+                'quantity': list(quantities),
+                'freight': freight_labels
+            },
+            'total_cost': [round(value, 2) for value in total_cost]
+        }
+        if estimate is not None:
+            # Frete e seguro estimados por [quantidade][modal]
+            result['freight_usd'] = estimate['freight_usd']
+            result['insurance_usd'] = estimate['insurance_usd']
+
+        if selling_prices:
+            # ICMS da venda pela UF de destino, como no /calcular
+            sale_icms_rate = self.tax_calculator.get_sale_icms_rate(ncm_code, destination_state)
+            result['axes']['selling_price'] = list(selling_prices)
+            result['sale_icms_rate'] = sale_icms_rate
+            result['net_margin'] = self._net_margins(
+                total_cost, quantities, len(freight_values), selling_prices, additional_costs or {}, sale_icms_rate
+            )
+
+        return result
+
+    def _net_margins(self, total_cost: List[float], quantities: List[int], freight_count: int,
+                     selling_prices: List[float], additional_costs: Dict[str, float],
+                     sale_icms_rate: Optional[float] = None) -> List[float]:
+        """
+        Margem líquida (%) por célula, com as mesmas regras de calculate_profitability
+        """
+        net_revenue_rate = self.tax_calculator.get_net_revenue_rate(
+            additional_costs.get('platform_fees_rate', 0), sale_icms_rate
+        )
+        fixed_costs = additional_costs.get('storage', 0) + additional_costs.get('marketing', 0)
+
+        # Receita por (quantidade, preço): independente do câmbio e do frete
+        revenues = [[price * quantity for price in selling_prices] for quantity in quantities]
+
+        margins = []
+        block = len(quantities) * freight_count
+        for offset in range(0, len(total_cost), block):
+            for q_index, quantity_revenues in enumerate(revenues):
+                row_start = offset + q_index * freight_count
+                for cost in total_cost[row_start:row_start + freight_count]:
+                    fixed = cost + fixed_costs
+                    margins.extend([
+                        round((revenue * net_revenue_rate - fixed) / revenue * 100, 2) if revenue > 0 else 0
+                        for revenue in quantity_revenues
+                    ])
+        return margins
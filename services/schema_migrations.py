@@ -0,0 +1,145 @@
+import logging
+from typing import Dict, List, Optional
+
+from sqlalchemy import inspect, select, text, update
+
+from app import db
+from models import Calculation, TaxDetail
+from services.analytics_rollup import AnalyticsRollup
+
+class SchemaMigrator:
+    """
+    Manutenção de esquema sem ferramenta de migração: db.create_all() cria
+    apenas tabelas ausentes, então colunas e índices novos de tabelas
+    existentes são adicionados aqui, junto com backfills de dados.
+    """
+
+    # Visão com as linhas de tax_details e, para cálculos sem essas linhas,
+    # os impostos expandidos de calculations.tax_breakdown
+    TAX_DETAILS_VIEW = 'tax_details_compat'
+
+    def __init__(self, analytics_rollup: Optional[AnalyticsRollup] = None):
+        self.logger = logging.getLogger(__name__)
+        # Opcional: carga inicial dos agregados do dashboard
+        self.analytics_rollup = analytics_rollup
+
+    def migrate(self) -> Dict:
+        """
+        Cria tabelas ausentes, colunas e índices novos, preenche tax_breakdown
+        dos cálculos antigos, os agregados do dashboard de quem ainda não os
+        tem e cria a visão de compatibilidade; idempotente, executado uma vez
+        por implantação
+        """
+        db.create_all()
+        summary = {
+            'columns': self.add_missing_columns(),
+            'indexes': self.create_missing_indexes()
+        }
+        summary['tax_breakdowns'] = self.backfill_tax_breakdown()
+        if self.analytics_rollup is not None:
+            summary['rollups'] = self.analytics_rollup.refresh_missing()
+        self.create_tax_details_view()
+        self.logger.info("Esquema do banco atualizado")
+        return summary
+
+    def add_missing_columns(self) -> List[str]:
+        """ALTER TABLE ... ADD COLUMN para colunas de modelos ausentes no banco"""
+        inspector = inspect(db.engine)
+        existing_tables = set(inspector.get_table_names())
+        added = []
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                if not column.nullable and column.server_default is None:
+                    raise RuntimeError(f'Coluna obrigatória {table.name}.{column.name} exige migração manual')
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                with db.engine.begin() as connection:
+                    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                added.append(f'{table.name}.{column.name}')
+                self.logger.info(f"Coluna adicionada: {table.name}.{column.name}")
+        return added
+
+    def create_missing_indexes(self) -> List[str]:
+        """Cria índices declarados nos modelos que ainda não existem no banco"""
+        inspector = inspect(db.engine)
+        existing_tables = set(inspector.get_table_names())
+        created = []
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(db.engine)
+                    created.append(index.name)
+                    self.logger.info(f"Índice criado: {index.name}")
+        return created
+
+    def backfill_tax_breakdown(self, batch_size: int = 1000) -> int:
+        """
+        Preenche calculations.tax_breakdown a partir de tax_details, em lotes,
+        preservando updated_at (a exportação incremental não reexporta tudo)
+        """
+        total = 0
+        while True:
+            pending = db.session.execute(
+                select(Calculation.id, Calculation.updated_at)
+                .where(Calculation.tax_breakdown.is_(None))
+                .limit(batch_size)
+            ).all()
+            if not pending:
+                break
+
+            breakdowns: Dict[str, Dict] = {calculation_id: {} for calculation_id, _ in pending}
+            for tax in TaxDetail.query.filter(TaxDetail.calculation_id.in_(list(breakdowns))):
+                breakdowns[tax.calculation_id][tax.tax_type] = {
+                    'rate': tax.rate, 'base_value': tax.base_value, 'amount': tax.amount
+                }
+
+            db.session.execute(update(Calculation), [
+                {'id': calculation_id, 'tax_breakdown': breakdowns[calculation_id], 'updated_at': updated_at}
+                for calculation_id, updated_at in pending
+            ])
+            db.session.commit()
+            db.session.expire_all()
+            total += len(pending)
+            self.logger.info(f"tax_breakdown preenchido em {total} cálculos")
+        return total
+
+    def create_tax_details_view(self):
+        """Cria (ou recria) a visão de compatibilidade de tax_details"""
+        dialect = db.engine.dialect.name
+        if dialect == 'postgresql':
+            expanded = '''
+                SELECT c.id || '-' || b.key AS id, c.id AS calculation_id, b.key AS tax_type,
+                       (b.value->>'rate')::float AS rate, (b.value->>'base_value')::float AS base_value,
+                       (b.value->>'amount')::float AS amount, c.created_at
+                FROM calculations c CROSS JOIN LATERAL jsonb_each(c.tax_breakdown) b'''
+            create = f'CREATE OR REPLACE VIEW {self.TAX_DETAILS_VIEW} AS'
+            drop = None
+        elif dialect == 'sqlite':
+            expanded = '''
+                SELECT c.id || '-' || b.key AS id, c.id AS calculation_id, b.key AS tax_type,
+                       json_extract(b.value, '$.rate') AS rate, json_extract(b.value, '$.base_value') AS base_value,
+                       json_extract(b.value, '$.amount') AS amount, c.created_at
+                FROM calculations c, json_each(c.tax_breakdown) b'''
+            create = f'CREATE VIEW {self.TAX_DETAILS_VIEW} AS'
+            drop = f'DROP VIEW IF EXISTS {self.TAX_DETAILS_VIEW}'
+        else:
+            raise RuntimeError(f'Visão de compatibilidade não suportada para {dialect}')
+
+        with db.engine.begin() as connection:
+            if drop:
+                connection.execute(text(drop))
+            connection.execute(text(f'''{create}
+                SELECT t.id, t.calculation_id, CAST(t.tax_type AS VARCHAR) AS tax_type,
+                       t.rate, t.base_value, t.amount, t.created_at
+                FROM tax_details t
+                UNION ALL {expanded}
+                WHERE c.tax_breakdown IS NOT NULL
+                  AND NOT EXISTS (SELECT 1 FROM tax_details t2 WHERE t2.calculation_id = c.id)'''))
+        self.logger.info(f"Visão {self.TAX_DETAILS_VIEW} criada")
@@ -0,0 +1,152 @@
+import logging
+from datetime import date
+from typing import Dict, List, Optional, Sequence
+
+from services.batch_executor import BatchExecutor
+from services.freight_estimator import FreightEstimator
+from services.tax_calculator import BenefitContext, BrazilianTaxCalculator
+
+def allocate(total: float, weights: Sequence[float], decimals: int = 2) -> List[float]:
+    """
+    Rateio de `total` proporcional a `weights` pelo método do maior resto:
+    cada parcela é truncada na casa decimal pedida e as unidades que sobram
+    vão, uma a uma, às linhas de maior resto (empate: a primeira linha), de
+    modo que a soma das parcelas é exatamente o total arredondado. Pesos
+    todos nulos dividem o total igualmente.
+    """
+    count = len(weights)
+    if count == 0:
+        return []
+    scale = 10 ** decimals
+    units = round(total * scale)
+    weight_sum = float(sum(weights))
+    if weight_sum <= 0:
+        weights, weight_sum = [1.0] * count, float(count)
+
+    exact = [units * weight / weight_sum for weight in weights]
+    shares = [int(value) for value in exact]
+    leftover = units - sum(shares)
+    if leftover:
+        remainders = [value - share for value, share in zip(exact, shares)]
+        for index in sorted(range(count), key=remainders.__getitem__, reverse=True)[:leftover]:
+            shares[index] += 1
+    return [share / scale for share in shares]
+
+class ShipmentCosting:
+    """
+    Custeio de uma remessa (pedido de compra) com muitas linhas de NCM.
+
+    Frete, seguro e despesas de desembaraço/despachante da remessa são
+    rateados entre as linhas (allocate) e a cascata de impostos roda por
+    linha em lote (BatchExecutor, alíquotas resolvidas uma vez por NCM, UF e
+    contexto). Frete e seguro rateados entram no valor aduaneiro de cada
+    linha; as despesas em BRL entram só no custo final. Os totais saem das
+    colunas calculadas numa única passada.
+    """
+
+    ALLOCATION_BASES = ('VALUE', 'WEIGHT', 'QUANTITY')
+
+    def __init__(self, tax_calculator: BrazilianTaxCalculator,
+                 freight_estimator: Optional[FreightEstimator] = None):
+        self.logger = logging.getLogger(__name__)
+        self.tax_calculator = tax_calculator
+        self.freight_estimator = freight_estimator or FreightEstimator()
+        self.batch_executor = BatchExecutor(tax_calculator=tax_calculator)
+
+    def allocation_weights(self, lines: List[Dict], basis: str, fob_values: List[float]) -> List[float]:
+        """Pesos do rateio: valor FOB, peso bruto (kg) ou quantidade de cada linha"""
+        if basis == 'VALUE':
+            return fob_values
+        if basis == 'QUANTITY':
+            return [float(line['quantity']) for line in lines]
+        if basis == 'WEIGHT':
+            weights = [line.get('gross_weight_kg') for line in lines]
+            if any(weight is None for weight in weights):
+                raise ValueError('Rateio por peso exige gross_weight_kg em todas as linhas')
+            return [float(weight) for weight in weights]
+        raise ValueError(f'Base de rateio inválida: {basis}')
+
+    def price(self, lines: List[Dict], exchange_rate: float, freight_usd: Optional[float] = None,
+              insurance_usd: Optional[float] = None, fees_brl: float = 0, basis: str = 'VALUE',
+              transport_mode: str = 'MARITIME', origin_country: Optional[str] = None,
+              destination_state: Optional[str] = None, volume_m3: float = 0,
+              as_of: Optional[date] = None) -> Dict:
+        """
+        Custeia as linhas (chaves: ncm_code, unit_value_usd, quantity e
+        opcionalmente gross_weight_kg, ex, regime). Frete e seguro ausentes
+        são estimados pelo FreightEstimator a partir do peso das linhas e do
+        volume da remessa (sem peso nem volume: frete zero). O frete e as
+        despesas são rateados pela base escolhida; o seguro, pelo valor.
+
+        Retorna as colunas por linha (ver BATCH_COLUMNS, mais freight_usd,
+        insurance_usd, fees_brl, landed_cost e unit_landed_cost) e os totais.
+        """
+        if not lines:
+            raise ValueError('A remessa deve ter ao menos uma linha')
+        basis = basis.upper()
+        fob_values = [line['unit_value_usd'] * line['quantity'] for line in lines]
+        total_fob = sum(fob_values)
+
+        freight_estimate = None
+        if freight_usd is None or insurance_usd is None:
+            gross_weight = sum(line.get('gross_weight_kg') or 0 for line in lines)
+            if gross_weight or volume_m3:
+                freight_estimate = self.freight_estimator.estimate(
+                    transport_mode, origin_country, total_fob, gross_weight, volume_m3)
+            freight_usd = freight_usd if freight_usd is not None else (
+                freight_estimate['freight_usd'] if freight_estimate else 0.0)
+            insurance_usd = insurance_usd if insurance_usd is not None else (
+                freight_estimate['insurance_usd'] if freight_estimate else 0.0)
+
+        weights = self.allocation_weights(lines, basis, fob_values)
+        freights = allocate(freight_usd, weights)
+        insurances = allocate(insurance_usd, fob_values)
+        fees = allocate(fees_brl, weights)
+
+        # Colunas do lote: NCMs e contextos (origem da remessa + ex/regime da linha) indexados
+        ncm_codes, ncm_indexes, contexts, context_indexes = [], {}, [], {}
+        ncm_column, context_column = [], []
+        for line in lines:
+            ncm_index = ncm_indexes.get(line['ncm_code'])
+            if ncm_index is None:
+                ncm_index = ncm_indexes[line['ncm_code']] = len(ncm_codes)
+                ncm_codes.append(line['ncm_code'])
+            key = (line.get('ex'), line.get('regime'))
+            context_index = context_indexes.get(key)
+            if context_index is None:
+                context_index = context_indexes[key] = len(contexts)
+                contexts.append(BenefitContext.build(origin_country, *key))
+            ncm_column.append(float(ncm_index))
+            context_column.append(float(context_index))
+        count = len(lines)
+        columns = self.batch_executor.calculate_columns({
+            'unit_value_usd': [float(line['unit_value_usd']) for line in lines],
+            'quantity': [float(line['quantity']) for line in lines],
+            'freight_usd': freights,
+            'insurance_usd': insurances,
+            'exchange_rate': [float(exchange_rate)] * count,
+            'ncm_index': ncm_column,
+            'state_index': [0.0] * count,
+            'context_index': context_column
+        }, ncm_codes, [destination_state], contexts, as_of)
+        columns['freight_usd'] = freights
+        columns['insurance_usd'] = insurances
+        columns['fees_brl'] = fees
+        columns['landed_cost'] = [cost + fee for cost, fee in zip(columns['total_cost'], fees)]
+        columns['unit_landed_cost'] = [cost / line['quantity'] for cost, line in zip(columns['landed_cost'], lines)]
+
+        totals = {column: round(sum(columns[column]), 2)
+                  for column in BrazilianTaxCalculator.BATCH_COLUMNS + ('fees_brl', 'landed_cost')}
+        totals.update({
+            'lines': len(lines),
+            'fob_usd': round(total_fob, 2),
+            'freight_usd': round(freight_usd, 2),
+            'insurance_usd': round(insurance_usd, 2)
+        })
+        return {
+            'allocation_basis': basis,
+            'exchange_rate': exchange_rate,
+            'freight_estimate': freight_estimate,
+            'lines': columns,
+            'totals': totals
+        }
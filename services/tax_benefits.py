@@ -0,0 +1,215 @@
+import logging
+import time
+from datetime import date, datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import delete, insert, select
+
+from app import db
+from models import SystemConfig, TaxBenefit
+from services.countries import normalize_country
+from services.tax_calculator import BenefitContext
+
+EMPTY_CONTEXT = BenefitContext()
+
+class _Rule(NamedTuple):
+    id: int
+    name: str
+    kind: str
+    ncm_prefix: str
+    tax_type: str
+    rate: float
+    origin_country: Optional[str]
+    ex: Optional[int]
+    regime: Optional[str]
+    valid_from: Optional[date]
+    valid_to: Optional[date]
+    priority: int
+    source: Optional[str]
+
+    def applies(self, context: BenefitContext, as_of: date) -> bool:
+        return ((self.origin_country is None or self.origin_country == context.origin_country)
+                and (self.ex is None or self.ex == context.ex)
+                and (self.regime is None or self.regime == context.regime)
+                and (self.valid_from is None or self.valid_from <= as_of)
+                and (self.valid_to is None or as_of < self.valid_to))
+
+    def to_dict(self) -> Dict:
+        data = self._asdict()
+        for field in ('valid_from', 'valid_to'):
+            data[field] = data[field].isoformat() if data[field] else None
+        return data
+
+class TaxBenefitEngine:
+    """
+    Motor de benefícios fiscais (ex-tarifário, Drawback, regimes especiais).
+
+    As regras (tabela tax_benefits) são compiladas num índice por prefixo de
+    NCM: para um código, só as regras dos prefixos do próprio código (no
+    máximo 8 consultas a dicionário, uma por tamanho de prefixo cadastrado)
+    são avaliadas, sem percorrer todas as regras. Por imposto vence a regra
+    de prefixo mais longo, depois a de maior prioridade e, por fim, a de
+    menor alíquota. Regras com origem, número de ex ou regime só se aplicam
+    a operações que declaram esses dados (BenefitContext). Cada processo
+    recompila o índice ao perceber, no máximo a cada VERSION_CHECK_INTERVAL
+    segundos, que a versão gravada em system_config mudou.
+    """
+
+    VERSION_KEY = 'tax_benefits_version'
+    VERSION_CHECK_INTERVAL = 60
+    KINDS = ('EX_TARIFARIO', 'DRAWBACK', 'REGIME', 'REDUCAO')
+    REGIMES = ('DRAWBACK', 'RECOF', 'REPETRO', 'ZFM')
+    TAX_TYPES = ('II', 'IPI', 'PIS', 'COFINS', 'ICMS')
+    FIELDS = ('id', 'name', 'kind', 'ncm_prefix', 'tax_type', 'rate', 'origin_country', 'ex', 'regime',
+              'valid_from', 'valid_to', 'priority', 'source')
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._index: Optional[Dict[str, List[_Rule]]] = None
+        self._prefix_lengths: Tuple[int, ...] = ()
+        self._loaded_version = None
+        self._checked_at = 0.0
+
+    def _ensure_current(self):
+        now = time.monotonic()
+        if self._index is not None and now - self._checked_at < self.VERSION_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        try:
+            # Conexão própria: não interfere na transação da requisição
+            with db.engine.connect() as connection:
+                version = connection.execute(
+                    select(SystemConfig.value).where(SystemConfig.key == self.VERSION_KEY)
+                ).scalar()
+                if self._index is not None and version == self._loaded_version:
+                    return
+                rows = connection.execute(
+                    select(*(getattr(TaxBenefit, field) for field in self.FIELDS))
+                ).all()
+        except Exception as e:
+            self.logger.warning(f"Benefícios fiscais indisponíveis: {str(e)}")
+            if self._index is None:
+                self._index, self._prefix_lengths = {}, ()
+            return
+
+        self._index, self._prefix_lengths = self.compile(rows)
+        self._loaded_version = version
+        self.logger.info(f"Benefícios fiscais compilados: {len(rows)} regra(s)")
+
+    @property
+    def version(self) -> Optional[str]:
+        """Versão carregada das regras de benefícios (muda a cada gravação)"""
+        self._ensure_current()
+        return self._loaded_version
+
+    @staticmethod
+    def compile(rows) -> Tuple[Dict[str, List[_Rule]], Tuple[int, ...]]:
+        """Índice prefixo -> regras e tamanhos de prefixo existentes"""
+        index = {}
+        for row in rows:
+            rule = _Rule(*row)
+            rule = rule._replace(
+                origin_country=normalize_country(rule.origin_country),
+                regime=(rule.regime or '').strip().upper() or None,
+                priority=rule.priority or 0
+            )
+            index.setdefault(rule.ncm_prefix, []).append(rule)
+        return index, tuple(sorted({len(prefix) for prefix in index}))
+
+    def match(self, ncm_code: str, context: Optional[BenefitContext] = None,
+              as_of: Optional[date] = None) -> Dict[str, _Rule]:
+        """Regra vencedora por imposto para o NCM na data (padrão: hoje)"""
+        self._ensure_current()
+        if not self._index:
+            return {}
+        context = context or EMPTY_CONTEXT
+        as_of = as_of or date.today()
+        best = {}
+        for length in self._prefix_lengths:
+            if length > len(ncm_code):
+                break
+            for rule in self._index.get(ncm_code[:length], ()):
+                if not rule.applies(context, as_of):
+                    continue
+                current = best.get(rule.tax_type)
+                # Prefixos percorridos do mais curto ao mais longo: o mais longo substitui
+                if (current is None or len(rule.ncm_prefix) > len(current.ncm_prefix)
+                        or (rule.priority, -rule.rate) > (current.priority, -current.rate)):
+                    best[rule.tax_type] = rule
+        return best
+
+    def overrides(self, ncm_code: str, context: Optional[BenefitContext] = None,
+                  as_of: Optional[date] = None) -> Dict[str, float]:
+        """Alíquotas substitutas por imposto (vazio se nenhum benefício se aplica)"""
+        return {tax_type: rule.rate for tax_type, rule in self.match(ncm_code, context, as_of).items()}
+
+    def applicable(self, ncm_code: str, context: Optional[BenefitContext] = None,
+                   as_of: Optional[date] = None) -> List[Dict]:
+        return [rule.to_dict() for rule in self.match(ncm_code, context, as_of).values()]
+
+    def rules_for(self, ncm_code: str) -> List[Dict]:
+        """Todas as regras cadastradas para prefixos do NCM, independentemente de contexto e data"""
+        self._ensure_current()
+        return [rule.to_dict() for length in self._prefix_lengths
+                for rule in self._index.get(ncm_code[:length], ())]
+
+    def validate_rule(self, data: Dict) -> Dict:
+        """Regra de um arquivo de carga, validada e no formato das colunas de tax_benefits"""
+        prefix = ''.join(ch for ch in str(data.get('ncm_prefix') or '') if ch.isdigit())
+        if not 1 <= len(prefix) <= 8:
+            raise ValueError(f"ncm_prefix inválido: {data.get('ncm_prefix')}")
+        kind = str(data.get('kind') or '').upper()
+        if kind not in self.KINDS:
+            raise ValueError(f"kind inválido: {data.get('kind')}")
+        tax_type = str(data.get('tax_type') or '').upper()
+        if tax_type not in self.TAX_TYPES:
+            raise ValueError(f"tax_type inválido: {data.get('tax_type')}")
+        try:
+            rate = float(data.get('rate'))
+        except (TypeError, ValueError):
+            raise ValueError(f"rate inválido: {data.get('rate')}")
+        if not 0 <= rate < 1:
+            raise ValueError(f'Alíquota fora de [0, 1): {rate}')
+        regime = (data.get('regime') or '').strip().upper() or None
+        if regime is not None and regime not in self.REGIMES:
+            raise ValueError(f'Regime inválido: {regime}')
+        valid_from = date.fromisoformat(data['valid_from']) if data.get('valid_from') else None
+        valid_to = date.fromisoformat(data['valid_to']) if data.get('valid_to') else None
+        if valid_from and valid_to and valid_to <= valid_from:
+            raise ValueError(f'valid_to deve ser posterior a valid_from: {valid_from} / {valid_to}')
+        return {
+            'name': str(data.get('name') or f'{kind} {prefix}')[:200],
+            'kind': kind,
+            'ncm_prefix': prefix,
+            'tax_type': tax_type,
+            'rate': rate,
+            'origin_country': (data.get('origin_country') or '').strip() or None,
+            'ex': int(data['ex']) if data.get('ex') is not None else None,
+            'regime': regime,
+            'valid_from': valid_from,
+            'valid_to': valid_to,
+            'priority': int(data.get('priority') or 0),
+            'source': data.get('source')
+        }
+
+    def load_rules(self, rules: List[Dict], replace: bool = False) -> int:
+        """Grava regras (replace=True substitui todas as existentes); retorna o número gravado"""
+        validated = [self.validate_rule(rule) for rule in rules]
+        try:
+            if replace:
+                db.session.execute(delete(TaxBenefit))
+            if validated:
+                db.session.execute(insert(TaxBenefit), validated)
+            config = SystemConfig.query.filter_by(key=self.VERSION_KEY).first()
+            if config is None:
+                config = SystemConfig(key=self.VERSION_KEY, description='Marca de alteração de tax_benefits')
+                db.session.add(config)
+            config.value = datetime.utcnow().isoformat()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        self._index = None
+        self.logger.info(f"{len(validated)} regra(s) de benefício gravada(s)")
+        return len(validated)
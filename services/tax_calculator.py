@@ -1,5 +1,28 @@
+import hashlib
 import logging
-from typing import Dict, List, Tuple
+from datetime import date
+from itertools import repeat
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from services.countries import normalize_country
+from services.icms_matrix import IcmsMatrix
+from services.tax_spec import TAX_SPEC
+
+class BenefitContext(NamedTuple):
+    """Dados declarados na operação que habilitam benefícios restritos"""
+    origin_country: Optional[str] = None
+    ex: Optional[int] = None
+    regime: Optional[str] = None
+
+    @classmethod
+    def build(cls, origin_country: Optional[str] = None, ex: Optional[int] = None,
+              regime: Optional[str] = None) -> Optional['BenefitContext']:
+        """Contexto normalizado (origem em código ISO, regime em maiúsculas); None se vazio"""
+        origin_country = normalize_country(origin_country)
+        regime = (regime or '').strip().upper() or None
+        if origin_country is None and ex is None and regime is None:
+            return None
+        return cls(origin_country, int(ex) if ex is not None else None, regime)
 
 class BrazilianTaxCalculator:
     """
@@ -8,16 +31,21 @@ class BrazilianTaxCalculator:
     """
     
     # Alíquotas padrão (podem ser sobrescritas por NCM específico)
-    DEFAULT_RATES = {
-        'II': 0.10,      # Imposto de Importação - 10%
-        'IPI': 0.15,     # IPI - 15%
-        'PIS': 0.0165,   # PIS-Importação - 1,65%
-        'COFINS': 0.076, # COFINS-Importação - 7,6%
-        'ICMS': 0.18     # ICMS médio - 18%
-    }
+    DEFAULT_RATES = TAX_SPEC['default_rates']
+    NCM_SPECIFIC_RATES = TAX_SPEC['ncm_rates']
+    SALE_RATES = TAX_SPEC['sale_rates']
     
-    def __init__(self):
+    def __init__(self, rate_store=None, icms_matrix: Optional[IcmsMatrix] = None, benefit_engine=None,
+                 trade_agreements=None):
         self.logger = logging.getLogger(__name__)
+        # RateStore opcional: alíquotas com vigência sobrepõem as da especificação
+        self.rate_store = rate_store
+        # ICMS por UF de destino (cálculos sem UF usam a alíquota média da especificação)
+        self.icms_matrix = icms_matrix or IcmsMatrix()
+        # TaxBenefitEngine opcional: ex-tarifários e regimes substituem as alíquotas acima
+        self.benefit_engine = benefit_engine
+        # TradeAgreements opcional: preferência do país de origem reduz o II resultante
+        self.trade_agreements = trade_agreements
     
     def calculate_customs_value(self, unit_value_usd: float, quantity: int, 
                                freight_usd: float = 0, insurance_usd: float = 0, 
@@ -36,24 +64,66 @@ class BrazilianTaxCalculator:
             'exchange_rate': exchange_rate
         }
     
-    def get_tax_rates(self, ncm_code: str) -> Dict[str, float]:
-        """
-        Obtém as alíquotas específicas para o NCM
-        Por enquanto usa alíquotas padrão, mas pode ser integrado com API Siscomex
-        """
-        # Algumas alíquotas específicas por NCM (exemplos)
-        ncm_specific_rates = {
-            # Eletrônicos
-            '85171200': {'II': 0.16, 'IPI': 0.15, 'PIS': 0.0165, 'COFINS': 0.076, 'ICMS': 0.25},
-            '85176200': {'II': 0.20, 'IPI': 0.15, 'PIS': 0.0165, 'COFINS': 0.076, 'ICMS': 0.25},
-            # Têxtil
-            '62034200': {'II': 0.35, 'IPI': 0.05, 'PIS': 0.0165, 'COFINS': 0.076, 'ICMS': 0.18},
-            # Automóveis
-            '87032300': {'II': 0.35, 'IPI': 0.25, 'PIS': 0.0165, 'COFINS': 0.076, 'ICMS': 0.12},
-        }
-        
-        return ncm_specific_rates.get(ncm_code, self.DEFAULT_RATES)
+    def get_tax_rates(self, ncm_code: str, as_of: Optional[date] = None,
+                      state: Optional[str] = None,
+                      context: Optional[BenefitContext] = None) -> Dict[str, float]:
+        """
+        Obtém as alíquotas do NCM vigentes em as_of (padrão: hoje): versões do
+        RateStore, quando houver, sobre as alíquotas da especificação. Com a
+        UF de destino, o ICMS (com FCP e fator de gross-up) vem da IcmsMatrix.
+        Por fim, benefícios fiscais aplicáveis à operação (context: BenefitContext
+        com origem, ex-tarifário e regime) substituem as alíquotas dos impostos que
+        cobrem, e a preferência tarifária do país de origem reduz o II da TEC
+        (antes dos benefícios). Com benefício e preferência sobre o II, os dois
+        não se acumulam: vale a menor das duas alíquotas.
+        """
+        rates = self.NCM_SPECIFIC_RATES.get(ncm_code, self.DEFAULT_RATES)
+        if self.rate_store is not None:
+            versioned = self.rate_store.get_rates(ncm_code, as_of or date.today())
+            if versioned:
+                rates = {**rates, **versioned}
+        if state:
+            rates = {**rates, **self.icms_matrix.rates_for(ncm_code, state)}
+        preference = self.get_trade_preference(ncm_code, as_of, context)
+        preferential_ii = rates['II'] * (1 - preference['margin']) if preference is not None else None
+        if self.benefit_engine is not None:
+            overrides = self.benefit_engine.overrides(ncm_code, context, as_of)
+            if overrides:
+                rates = {**rates, **overrides}
+                if 'ICMS' in overrides and 'ICMS_FACTOR' in rates:
+                    # ICMS do benefício substitui a carga da UF (inclusive o FCP)
+                    del rates['ICMS_FACTOR']
+                    rates['FCP'] = 0.0
+        if preferential_ii is not None:
+            rates = {**rates, 'II': min(rates['II'], preferential_ii)}
+        return rates
+
+    def get_trade_preference(self, ncm_code: str, as_of: Optional[date] = None,
+                             context: Optional[BenefitContext] = None) -> Optional[Dict]:
+        """Preferência tarifária do país de origem da operação para o NCM (None se não houver)"""
+        if self.trade_agreements is None or context is None:
+            return None
+        preference = self.trade_agreements.lookup(context.origin_country, ncm_code, as_of)
+        return preference.to_dict() if preference is not None else None
+
+    def get_benefits(self, ncm_code: str, as_of: Optional[date] = None,
+                     context: Optional[BenefitContext] = None) -> List[Dict]:
+        """Benefícios fiscais aplicados ao NCM na operação (regra vencedora por imposto)"""
+        if self.benefit_engine is None:
+            return []
+        return self.benefit_engine.applicable(ncm_code, context, as_of)
     
+    def rates_version(self) -> str:
+        """
+        Marca das fontes de alíquotas (especificação, RateStore, benefícios e
+        preferências carregados): muda sempre que get_tax_rates pode mudar
+        para uma mesma data
+        """
+        sources = (self.rate_store, self.benefit_engine, self.trade_agreements)
+        versions = [str(TAX_SPEC['version'])] + [str(source.version) if source is not None else '-'
+                                                  for source in sources]
+        return hashlib.sha1('|'.join(versions).encode('utf-8')).hexdigest()[:16]
+
     def calculate_ii(self, cif_brl: float, rate: float) -> Dict[str, float]:
         """Calcula Imposto de Importação"""
         amount = cif_brl * rate
@@ -96,13 +166,18 @@ class BrazilianTaxCalculator:
         return pis, cofins
     
     def calculate_icms(self, cif_brl: float, ii_amount: float, ipi_amount: float, 
-                      pis_amount: float, cofins_amount: float, rate: float) -> Dict[str, float]:
+                      pis_amount: float, cofins_amount: float, rate: float,
+                      factor: Optional[float] = None) -> Dict[str, float]:
         """
         Calcula ICMS - base: CIF + II + IPI + PIS + COFINS + próprio ICMS
-        Fórmula: ICMS = (Base sem ICMS * alíquota) / (1 - alíquota)
+        Fórmula: ICMS = (Base sem ICMS * alíquota) / (1 - alíquota), ou
+        Base sem ICMS * fator com o fator de gross-up pré-calculado da IcmsMatrix
         """
         base_without_icms = cif_brl + ii_amount + ipi_amount + pis_amount + cofins_amount
-        icms_amount = (base_without_icms * rate) / (1 - rate)
+        if factor is None:
+            icms_amount = (base_without_icms * rate) / (1 - rate)
+        else:
+            icms_amount = base_without_icms * factor
         base_value = base_without_icms + icms_amount
         
         return {
@@ -111,11 +186,44 @@ class BrazilianTaxCalculator:
             'amount': icms_amount
         }
     
+    def calculate_tax_factors(self, rates: Dict[str, float]) -> Dict[str, float]:
+        """
+        Fatores de imposto por R$ 1,00 de valor CIF.
+        Toda a cascata é linear no CIF, então impostos = CIF * fator; usado
+        para avaliar grades de cenários sem repetir a cascata por célula.
+        """
+        ii_data = self.calculate_ii(1.0, rates['II'])
+        ipi_data = self.calculate_ipi(1.0, ii_data['amount'], rates['IPI'])
+        pis_data, cofins_data = self.calculate_pis_cofins(
+            1.0, ii_data['amount'], rates['PIS'], rates['COFINS']
+        )
+        icms_data = self.calculate_icms(
+            1.0, ii_data['amount'], ipi_data['amount'],
+            pis_data['amount'], cofins_data['amount'], rates['ICMS'], rates.get('ICMS_FACTOR')
+        )
+        taxes = {
+            'II': ii_data['amount'],
+            'IPI': ipi_data['amount'],
+            'PIS': pis_data['amount'],
+            'COFINS': cofins_data['amount'],
+            'ICMS': icms_data['amount']
+        }
+        total_taxes = sum(taxes.values())
+        return {
+            'taxes': taxes,
+            'total_taxes': total_taxes,
+            'total_cost': 1.0 + total_taxes
+        }
+
     def calculate_all_taxes(self, unit_value_usd: float, quantity: int, ncm_code: str,
                            freight_usd: float = 0, insurance_usd: float = 0, 
-                           exchange_rate: float = 5.0) -> Dict[str, any]:
+                           exchange_rate: float = 5.0, as_of: Optional[date] = None,
+                           destination_state: Optional[str] = None,
+                           context: Optional[BenefitContext] = None) -> Dict[str, any]:
         """
-        Calcula todos os impostos de importação
+        Calcula todos os impostos de importação (alíquotas vigentes em as_of; padrão: hoje),
+        com o ICMS da UF de destino quando informada e os benefícios fiscais
+        aplicáveis à operação (context: BenefitContext)
         """
         try:
             # 1. Calcular valor aduaneiro
@@ -124,7 +232,7 @@ class BrazilianTaxCalculator:
             )
             
             # 2. Obter alíquotas
-            rates = self.get_tax_rates(ncm_code)
+            rates = self.get_tax_rates(ncm_code, as_of, destination_state, context)
             
             # 3. Calcular impostos em cascata
             cif_brl = customs_values['cif_brl']
@@ -143,8 +251,10 @@ class BrazilianTaxCalculator:
             # ICMS
             icms_data = self.calculate_icms(
                 cif_brl, ii_data['amount'], ipi_data['amount'],
-                pis_data['amount'], cofins_data['amount'], rates['ICMS']
+                pis_data['amount'], cofins_data['amount'], rates['ICMS'], rates.get('ICMS_FACTOR')
             )
+            if 'FCP' in rates:
+                icms_data['fcp_rate'] = rates['FCP']
             
             # Total dos impostos
             total_taxes = (ii_data['amount'] + ipi_data['amount'] + 
@@ -154,6 +264,10 @@ class BrazilianTaxCalculator:
             total_cost = cif_brl + total_taxes
             
             return {
+                'spec_version': TAX_SPEC['version'],
+                'destination_state': destination_state,
+                'benefits': self.get_benefits(ncm_code, as_of, context),
+                'trade_preference': self.get_trade_preference(ncm_code, as_of, context),
                 'customs_values': customs_values,
                 'taxes': {
                     'II': ii_data,
@@ -173,10 +287,82 @@ class BrazilianTaxCalculator:
             self.logger.error(f"Erro no cálculo de impostos: {str(e)}")
             raise
 
+    # Colunas de saída de calculate_taxes_batch
+    BATCH_COLUMNS = ('cif_brl', 'II', 'IPI', 'PIS', 'COFINS', 'ICMS', 'total_taxes', 'total_cost')
+
+    def calculate_taxes_batch(self, unit_values_usd: List[float], quantities: List[int],
+                              ncm_codes: List[str], freights_usd: List[float],
+                              insurances_usd: List[float], exchange_rates: List[float],
+                              as_of: Optional[date] = None,
+                              resolved_rates: Optional[Dict[tuple, Dict[str, float]]] = None,
+                              states: Optional[List[Optional[str]]] = None,
+                              contexts: Optional[List[Optional[BenefitContext]]] = None) -> Dict[str, List[float]]:
+        """
+        Cascata de calculate_all_taxes aplicada a colunas (uma posição por item),
+        com as alíquotas resolvidas uma vez por (NCM, UF, contexto de benefícios)
+        ou já resolvidas em resolved_rates, com essas chaves. states traz a UF
+        de destino de cada item (None: alíquota média) e contexts o
+        BenefitContext de cada item, para pedidos com itens de várias UFs e
+        origens. Mesma ordem de operações do cálculo individual, portanto
+        resultados idênticos.
+        Retorna um dicionário coluna -> lista (ver BATCH_COLUMNS).
+        """
+        resolved_rates = dict(resolved_rates or {})
+        output = {column: [] for column in self.BATCH_COLUMNS}
+        cif_column, ii_column, ipi_column = output['cif_brl'], output['II'], output['IPI']
+        pis_column, cofins_column, icms_column = output['PIS'], output['COFINS'], output['ICMS']
+        taxes_column, cost_column = output['total_taxes'], output['total_cost']
+        
+        for unit_value, quantity, ncm_code, freight, insurance, exchange_rate, state, context in zip(
+                unit_values_usd, quantities, ncm_codes, freights_usd, insurances_usd, exchange_rates,
+                states if states is not None else repeat(None),
+                contexts if contexts is not None else repeat(None)):
+            key = (ncm_code, state, context)
+            rates = resolved_rates.get(key)
+            if rates is None:
+                rates = resolved_rates[key] = self.get_tax_rates(ncm_code, as_of, state, context)
+            
+            cif_brl = (unit_value * quantity + freight + insurance) * exchange_rate
+            ii = cif_brl * rates['II']
+            base_ii = cif_brl + ii
+            ipi = base_ii * rates['IPI']
+            pis = base_ii * rates['PIS']
+            cofins = base_ii * rates['COFINS']
+            icms_factor = rates.get('ICMS_FACTOR')
+            if icms_factor is not None:
+                icms = (cif_brl + ii + ipi + pis + cofins) * icms_factor
+            else:
+                icms_rate = rates['ICMS']
+                icms = ((cif_brl + ii + ipi + pis + cofins) * icms_rate) / (1 - icms_rate)
+            total_taxes = ii + ipi + pis + cofins + icms
+            
+            cif_column.append(cif_brl)
+            ii_column.append(ii)
+            ipi_column.append(ipi)
+            pis_column.append(pis)
+            cofins_column.append(cofins)
+            icms_column.append(icms)
+            taxes_column.append(total_taxes)
+            cost_column.append(cif_brl + total_taxes)
+        
+        return output
+
+    def get_sale_icms_rate(self, ncm_code: Optional[str] = None, sale_state: Optional[str] = None,
+                           customer_state: Optional[str] = None) -> float:
+        """
+        ICMS sobre a revenda: carga da IcmsMatrix para a UF do vendedor (e do
+        cliente, em vendas interestaduais); sem UF, a alíquota da especificação
+        """
+        if not sale_state:
+            return self.SALE_RATES['ICMS']
+        return self.icms_matrix.sale_rate(ncm_code or '', sale_state, customer_state)
+
     def calculate_profitability(self, total_cost_brl: float, selling_price_brl: float,
-                               additional_costs: Dict[str, float] = None) -> Dict[str, float]:
+                               additional_costs: Dict[str, float] = None,
+                               sale_icms_rate: Optional[float] = None) -> Dict[str, float]:
         """
-        Calcula a rentabilidade da operação
+        Calcula a rentabilidade da operação (ICMS sobre venda: sale_icms_rate,
+        ver get_sale_icms_rate; padrão: alíquota da especificação)
         """
         if additional_costs is None:
             additional_costs = {}
@@ -187,9 +373,9 @@ class BrazilianTaxCalculator:
         platform_fees_rate = additional_costs.get('platform_fees_rate', 0) / 100
         
         # Taxas sobre venda (ICMS, PIS, COFINS sobre venda)
-        icms_sale_rate = 0.18  # ICMS sobre venda
-        pis_sale_rate = 0.0165
-        cofins_sale_rate = 0.076
+        icms_sale_rate = self.SALE_RATES['ICMS'] if sale_icms_rate is None else sale_icms_rate
+        pis_sale_rate = self.SALE_RATES['PIS']
+        cofins_sale_rate = self.SALE_RATES['COFINS']
         
         # Impostos sobre venda
         icms_sale = selling_price_brl * icms_sale_rate
@@ -216,6 +402,7 @@ class BrazilianTaxCalculator:
         return {
             'selling_price': selling_price_brl,
             'import_cost': total_cost_brl,
+            'sale_icms_rate': icms_sale_rate,
             'additional_costs': {
                 'storage': storage_cost,
                 'marketing': marketing_cost,
@@ -229,3 +416,67 @@ class BrazilianTaxCalculator:
             'net_margin': net_margin,
             'roi': roi
         }
+
+    def get_net_revenue_rate(self, platform_fees_rate: float = 0, sale_icms_rate: Optional[float] = None) -> float:
+        """
+        Fração do preço de venda que sobra após tributos sobre venda e taxa de
+        plataforma (platform_fees_rate em %): lucro líquido = preço * fração - custos
+        """
+        icms_sale_rate = self.SALE_RATES['ICMS'] if sale_icms_rate is None else sale_icms_rate
+        return 1 - (icms_sale_rate + self.SALE_RATES['PIS'] +
+                    self.SALE_RATES['COFINS'] + platform_fees_rate / 100)
+
+    def solve_selling_price(self, total_cost_brl: float, additional_costs: Dict[str, float] = None,
+                            target_net_margin: float = None, target_roi: float = None,
+                            sale_icms_rate: Optional[float] = None) -> Dict[str, float]:
+        """
+        Resolve em forma fechada o preço de venda (mesmas regras de calculate_profitability):
+        ponto de equilíbrio, preço para margem líquida alvo (%) e para ROI alvo (%).
+        Lucro líquido = preço * k - (custo + armazenagem + marketing), k = get_net_revenue_rate.
+        Preços inatingíveis (ex.: margem alvo >= k) retornam None.
+        """
+        return self.solve_selling_prices([total_cost_brl], additional_costs,
+                                         target_net_margin, target_roi, sale_icms_rate)[0]
+
+    def solve_selling_prices(self, total_costs_brl: List[float], additional_costs: Dict[str, float] = None,
+                             target_net_margin: float = None, target_roi: float = None,
+                             sale_icms_rate: Optional[float] = None) -> List[Dict[str, float]]:
+        """
+        Versão em lote de solve_selling_price (mesmos parâmetros para todos os custos)
+        """
+        if additional_costs is None:
+            additional_costs = {}
+        
+        k = self.get_net_revenue_rate(additional_costs.get('platform_fees_rate', 0), sale_icms_rate)
+        extra_costs = additional_costs.get('storage', 0) + additional_costs.get('marketing', 0)
+        margin_k = k - target_net_margin / 100 if target_net_margin is not None else None
+        
+        results = []
+        for total_cost in total_costs_brl:
+            fixed_costs = total_cost + extra_costs
+            break_even = fixed_costs / k if k > 0 else None
+            
+            result = {
+                'import_cost': total_cost,
+                'fixed_costs': fixed_costs,
+                'net_revenue_rate': k,
+                'break_even_price': break_even,
+                # Variação do lucro líquido por R$ 1,00 de preço
+                'net_profit_per_price_unit': k
+            }
+            
+            if target_net_margin is not None:
+                price = fixed_costs / margin_k if margin_k > 0 else None
+                result['target_net_margin'] = target_net_margin
+                result['price_for_target_margin'] = price
+                # Variação da margem líquida (p.p.) por R$ 1,00 de preço, no preço alvo
+                result['margin_sensitivity'] = fixed_costs / price ** 2 * 100 if price else None
+            
+            if target_roi is not None:
+                price = (fixed_costs + total_cost * target_roi / 100) / k if k > 0 else None
+                result['target_roi'] = target_roi
+                result['price_for_target_roi'] = price
+            
+            results.append(result)
+        
+        return results
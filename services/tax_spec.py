@@ -0,0 +1,47 @@
+"""
+Especificação versionada de alíquotas e da cascata de impostos de importação
+
+Alíquotas base de BrazilianTaxCalculator (Python) e da prévia de cálculo em
+static/js/tax_cascade.js (TaxCascade), que recebe este dicionário serializado
+na página e reproduz a mesma cascata de fórmulas. Versões do RateStore,
+benefícios e preferências sobrepõem estas alíquotas no servidor; a prévia as
+obtém já resolvidas de /api/aliquotas e, até recebê-las, se apresenta como
+aproximada. Qualquer alteração de alíquota ou de fórmula (em qualquer dos
+dois lados) deve incrementar TAX_SPEC_VERSION e regenerar
+tests/golden/tax_cascade.json.
+"""
+
+# 2: a prévia usa as alíquotas resolvidas pelo servidor
+# 3: preferência tarifária sobre o II da TEC; com benefício do II, vale a menor alíquota
+TAX_SPEC_VERSION = 3
+
+TAX_SPEC = {
+    'version': TAX_SPEC_VERSION,
+
+    # Alíquotas padrão (podem ser sobrescritas por NCM específico)
+    'default_rates': {
+        'II': 0.10,      # Imposto de Importação - 10%
+        'IPI': 0.15,     # IPI - 15%
+        'PIS': 0.0165,   # PIS-Importação - 1,65%
+        'COFINS': 0.076, # COFINS-Importação - 7,6%
+        'ICMS': 0.18     # ICMS médio - 18%
+    },
+
+    # Alíquotas específicas por NCM
+    'ncm_rates': {
+        # Eletrônicos
+        '85171200': {'II': 0.16, 'IPI': 0.15, 'PIS': 0.0165, 'COFINS': 0.076, 'ICMS': 0.25},
+        '85176200': {'II': 0.20, 'IPI': 0.15, 'PIS': 0.0165, 'COFINS': 0.076, 'ICMS': 0.25},
+        # Têxtil
+        '62034200': {'II': 0.35, 'IPI': 0.05, 'PIS': 0.0165, 'COFINS': 0.076, 'ICMS': 0.18},
+        # Automóveis
+        '87032300': {'II': 0.35, 'IPI': 0.25, 'PIS': 0.0165, 'COFINS': 0.076, 'ICMS': 0.12},
+    },
+
+    # Tributos sobre a venda no mercado interno (análise de rentabilidade)
+    'sale_rates': {
+        'ICMS': 0.18,
+        'PIS': 0.0165,
+        'COFINS': 0.076
+    }
+}
@@ -0,0 +1,184 @@
+import logging
+import time
+from datetime import date, datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import delete, insert, select
+
+from app import db
+from models import SystemConfig, TradePreference
+from services.countries import COUNTRY_NAMES, normalize_country
+
+class _Preference(NamedTuple):
+    agreement: str
+    country_code: str
+    ncm_prefix: str
+    margin: float
+    valid_from: Optional[date]
+    valid_to: Optional[date]
+    source: Optional[str]
+
+    def to_dict(self) -> Dict:
+        data = self._asdict()
+        for field in ('valid_from', 'valid_to'):
+            data[field] = data[field].isoformat() if data[field] else None
+        return data
+
+class TradeAgreements:
+    """
+    Preferências tarifárias por país de origem × prefixo de NCM.
+
+    As preferências (tabela trade_preferences) ficam num índice
+    país -> prefixo -> versões: a consulta de um item é uma busca pelo país
+    e no máximo uma por tamanho de prefixo cadastrado, do mais longo ao mais
+    curto, sem acesso ao banco. O prefixo mais longo prevalece, de modo que
+    exceções de um acordo são cadastradas com prefixos mais longos (margem
+    0 exclui o NCM). A margem reduz o II: II = alíquota * (1 - margem).
+    Cada processo recarrega o índice ao perceber, no máximo a cada
+    VERSION_CHECK_INTERVAL segundos, que a versão em system_config mudou.
+    """
+
+    VERSION_KEY = 'trade_preferences_version'
+    VERSION_CHECK_INTERVAL = 60
+    FIELDS = ('agreement', 'country_code', 'ncm_prefix', 'margin', 'valid_from', 'valid_to', 'source')
+
+    # Principais acordos com preferência integral para todo o universo tarifário;
+    # listas de exceções e cotas devem ser cadastradas com prefixos próprios
+    DEFAULT_PREFERENCES = [
+        {'agreement': 'Mercosul (Tratado de Assunção)', 'countries': ('AR', 'PY', 'UY'), 'margin': 1.0},
+        {'agreement': 'ACE-35 Mercosul-Chile', 'countries': ('CL',), 'margin': 1.0},
+        {'agreement': 'ACE-36 Mercosul-Bolívia', 'countries': ('BO',), 'margin': 1.0},
+        {'agreement': 'ACE-58 Mercosul-Peru', 'countries': ('PE',), 'margin': 1.0},
+        {'agreement': 'ACE-59 Mercosul-Colômbia/Equador/Venezuela', 'countries': ('CO', 'EC', 'VE'),
+         'margin': 1.0},
+        {'agreement': 'ACE-55 Mercosul-México (automotivo)', 'countries': ('MX',), 'ncm_prefix': '8703',
+         'margin': 1.0}
+    ]
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._index: Optional[Dict[str, Dict[str, List[_Preference]]]] = None
+        self._prefix_lengths: Tuple[int, ...] = ()
+        self._loaded_version = None
+        self._checked_at = 0.0
+
+    def _ensure_current(self):
+        now = time.monotonic()
+        if self._index is not None and now - self._checked_at < self.VERSION_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        try:
+            # Conexão própria: não interfere na transação da requisição
+            with db.engine.connect() as connection:
+                version = connection.execute(
+                    select(SystemConfig.value).where(SystemConfig.key == self.VERSION_KEY)
+                ).scalar()
+                if self._index is not None and version == self._loaded_version:
+                    return
+                rows = connection.execute(
+                    select(*(getattr(TradePreference, field) for field in self.FIELDS))
+                ).all()
+        except Exception as e:
+            self.logger.warning(f"Preferências tarifárias indisponíveis: {str(e)}")
+            if self._index is None:
+                self._index, self._prefix_lengths = {}, ()
+            return
+
+        index = {}
+        for row in rows:
+            preference = _Preference(*row)
+            index.setdefault(preference.country_code, {}).setdefault(preference.ncm_prefix or '', []).append(preference)
+        self._index = index
+        # Do mais longo ao mais curto: o primeiro prefixo com versão vigente prevalece
+        self._prefix_lengths = tuple(sorted({len(prefix) for prefixes in index.values() for prefix in prefixes},
+                                            reverse=True))
+        self._loaded_version = version
+        self.logger.info(f"Preferências tarifárias carregadas: {len(rows)} linha(s)")
+
+    @property
+    def version(self) -> Optional[str]:
+        """Versão carregada das preferências tarifárias (muda a cada gravação)"""
+        self._ensure_current()
+        return self._loaded_version
+
+    def lookup(self, country_code: Optional[str], ncm_code: str,
+               as_of: Optional[date] = None) -> Optional[_Preference]:
+        """Preferência vigente para o país (código ISO) e o NCM na data (padrão: hoje)"""
+        if not country_code:
+            return None
+        self._ensure_current()
+        prefixes = self._index.get(country_code)
+        if not prefixes:
+            return None
+        as_of = as_of or date.today()
+        for length in self._prefix_lengths:
+            if length > len(ncm_code):
+                continue
+            for preference in prefixes.get(ncm_code[:length], ()):
+                if ((preference.valid_from is None or preference.valid_from <= as_of)
+                        and (preference.valid_to is None or as_of < preference.valid_to)):
+                    return preference
+        return None
+
+    def preferences_for(self, country_code: str) -> List[Dict]:
+        self._ensure_current()
+        return [preference.to_dict()
+                for preferences in self._index.get(country_code, {}).values()
+                for preference in preferences]
+
+    def validate(self, data: Dict) -> Dict:
+        """Preferência de um arquivo de carga, validada e no formato das colunas de trade_preferences"""
+        country_code = normalize_country(data.get('country') or data.get('country_code'))
+        if country_code not in COUNTRY_NAMES:
+            raise ValueError(f"País não reconhecido: {data.get('country') or data.get('country_code')}")
+        prefix = ''.join(ch for ch in str(data.get('ncm_prefix') or '') if ch.isdigit())
+        if len(prefix) > 8:
+            raise ValueError(f"ncm_prefix inválido: {data.get('ncm_prefix')}")
+        try:
+            margin = float(data.get('margin'))
+        except (TypeError, ValueError):
+            raise ValueError(f"margin inválida: {data.get('margin')}")
+        if not 0 <= margin <= 1:
+            raise ValueError(f'Margem de preferência fora de [0, 1]: {margin}')
+        if not data.get('agreement'):
+            raise ValueError('Campo obrigatório: agreement')
+        return {
+            'agreement': str(data['agreement'])[:100],
+            'country_code': country_code,
+            'ncm_prefix': prefix,
+            'margin': margin,
+            'valid_from': date.fromisoformat(data['valid_from']) if data.get('valid_from') else None,
+            'valid_to': date.fromisoformat(data['valid_to']) if data.get('valid_to') else None,
+            'source': data.get('source')
+        }
+
+    def default_preferences(self) -> List[Dict]:
+        """DEFAULT_PREFERENCES expandidas em uma linha por país"""
+        return [
+            {'agreement': item['agreement'], 'country_code': country_code,
+             'ncm_prefix': item.get('ncm_prefix', ''), 'margin': item['margin']}
+            for item in self.DEFAULT_PREFERENCES
+            for country_code in item['countries']
+        ]
+
+    def load(self, preferences: List[Dict], replace: bool = False) -> int:
+        """Grava preferências (replace=True substitui todas as existentes); retorna o número gravado"""
+        validated = [self.validate(preference) for preference in preferences]
+        try:
+            if replace:
+                db.session.execute(delete(TradePreference))
+            if validated:
+                db.session.execute(insert(TradePreference), validated)
+            config = SystemConfig.query.filter_by(key=self.VERSION_KEY).first()
+            if config is None:
+                config = SystemConfig(key=self.VERSION_KEY, description='Marca de alteração de trade_preferences')
+                db.session.add(config)
+            config.value = datetime.utcnow().isoformat()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        self._index = None
+        self.logger.info(f"{len(validated)} preferência(s) tarifária(s) gravada(s)")
+        return len(validated)
@@ -7,12 +7,23 @@
 let currentCalculation = null;
 let exchangeRateCache = null;
 let ncmSearchTimeout = null;
+let ncmSearchController = null;
+
+// NCM autocomplete cache (query -> results), bounded LRU
+const NCM_SEARCH_LIMIT = 15; // must match the result limit of NCMService.search_ncm
+const NCM_SEARCH_CACHE_SIZE = 100;
+const ncmSearchCache = new Map();
+
+// Server-resolved tax rates for the preview ("ncm|state|origin|ex|regime" -> rates, or a pending promise)
+const TAX_RATES_CACHE_SIZE = 100;
+const taxRatesCache = new Map();
 
 // Initialize when document is ready
 document.addEventListener('DOMContentLoaded', function() {
     initializeCalculator();
     setupEventListeners();
     loadExchangeRate();
+    loadNCMCatalogue();
 });
 
 /**
@@ -72,6 +83,7 @@ function handleNCMSearch(event) {
 
     // Clear suggestions if query is too short
     if (query.length < 3) {
+        abortNCMSearch();
         clearNCMSuggestions();
         return;
     }
@@ -83,28 +95,359 @@ function handleNCMSearch(event) {
 }
 
 /**
- * Search NCM codes via API
+ * Search NCM codes for the suggestions datalist
  */
 function searchNCMCodes(query) {
     const datalist = document.getElementById('ncm-suggestions');
     if (!datalist) return;
 
+    lookupNCMCodes(query, results => {
+        showNCMLoading(false);
+        populateNCMSuggestions(results);
+    }, showNCMLoading);
+}
+
+/**
+ * Look up NCM codes, reusing cached results whenever possible.
+ *
+ * onResults may be called twice: first with a locally narrowed list,
+ * then with the API response. Any request still in flight is aborted,
+ * so stale responses never overwrite newer ones.
+ */
+function lookupNCMCodes(query, onResults, onLoading) {
+    const key = query.toLowerCase();
+    const setLoading = onLoading || function() {};
+
+    // Offline catalogue loaded: search locally, the API is only a fallback
+    if (NCMCatalogue.ready) {
+        abortNCMSearch();
+        onResults(NCMCatalogue.search(query));
+        return;
+    }
+
+    // Exact cache hit: no request needed
+    const cached = getCachedNCMSearch(key);
+    if (cached) {
+        abortNCMSearch();
+        onResults(cached);
+        return;
+    }
+
+    // Narrow a complete cached superset (e.g. "celul" -> "celular")
+    const narrowed = narrowCachedNCMSearch(key);
+    if (narrowed) {
+        onResults(narrowed.results);
+        if (narrowed.exact) {
+            abortNCMSearch();
+            setCachedNCMSearch(key, narrowed.results);
+            return;
+        }
+    }
+
+    abortNCMSearch();
+    const controller = new AbortController();
+    ncmSearchController = controller;
+
     // Show loading state
-    showNCMLoading(true);
+    if (!narrowed) {
+        setLoading(true);
+    }
 
-    fetch(`/api/ncm/buscar?q=${encodeURIComponent(query)}`)
+    fetch(`/api/ncm/buscar?q=${encodeURIComponent(query)}`, { signal: controller.signal })
         .then(response => response.json())
         .then(data => {
-            showNCMLoading(false);
-            populateNCMSuggestions(data);
+            setCachedNCMSearch(key, data);
+            // Ignore responses superseded by a newer query
+            if (ncmSearchController !== controller) return;
+            ncmSearchController = null;
+            setLoading(false);
+            onResults(data);
         })
         .catch(error => {
+            if (error.name === 'AbortError') return;
             console.error('Erro na busca NCM:', error);
-            showNCMLoading(false);
+            setLoading(false);
             // Don't show notification for NCM search errors to avoid spam
         });
 }
 
+/**
+ * Abort the in-flight NCM search request, if any
+ */
+function abortNCMSearch() {
+    if (ncmSearchController) {
+        ncmSearchController.abort();
+        ncmSearchController = null;
+    }
+}
+
+/**
+ * Get cached results for a query (refreshing its LRU position)
+ */
+function getCachedNCMSearch(key) {
+    if (!ncmSearchCache.has(key)) return null;
+    const results = ncmSearchCache.get(key);
+    ncmSearchCache.delete(key);
+    ncmSearchCache.set(key, results);
+    return results;
+}
+
+/**
+ * Store results for a query, evicting the least recently used entry
+ */
+function setCachedNCMSearch(key, results) {
+    ncmSearchCache.delete(key);
+    ncmSearchCache.set(key, results);
+    if (ncmSearchCache.size > NCM_SEARCH_CACHE_SIZE) {
+        ncmSearchCache.delete(ncmSearchCache.keys().next().value);
+    }
+}
+
+/**
+ * Filter the longest cached prefix of the query locally.
+ *
+ * Only supersets that were not truncated by the server limit are used.
+ * Numeric (code) searches narrow exactly; text searches also go through
+ * synonym expansion on the server, so the narrowed list is shown right
+ * away but is still refreshed from the API.
+ */
+function narrowCachedNCMSearch(key) {
+    const isCodeQuery = /^\d+$/.test(key);
+
+    for (let length = key.length - 1; length >= 3; length--) {
+        const superset = ncmSearchCache.get(key.slice(0, length));
+        if (!superset || superset.length >= NCM_SEARCH_LIMIT) continue;
+
+        const results = superset.filter(ncm =>
+            ncm.code.includes(key) || (!isCodeQuery && ncm.description.toLowerCase().includes(key))
+        );
+        return { results: results, exact: isCodeQuery };
+    }
+    return null;
+}
+
+/**
+ * Offline NCM catalogue.
+ *
+ * Downloaded once per catalogue version from /api/ncm/catalogo and kept
+ * in IndexedDB. search() mirrors NCMService.search_ncm (same synonym
+ * expansion, scoring and ordering), so results match the API.
+ */
+const NCMCatalogue = {
+    DB_NAME: 'ncmcalc',
+    STORE: 'catalogue',
+    ready: false,
+    version: null,
+    entries: [],
+    synonyms: [],
+
+    /**
+     * Load the catalogue from IndexedDB, downloading it if the version changed
+     */
+    load: function(version, url) {
+        return this.readStored()
+            .then(stored => {
+                if (stored && stored.version === version) return stored;
+                return fetch(url)
+                    .then(response => response.json())
+                    .then(payload => {
+                        this.writeStored(payload);
+                        return payload;
+                    });
+            })
+            .then(payload => this.buildIndex(payload))
+            .catch(error => {
+                console.error('Error loading NCM catalogue:', error);
+            });
+    },
+
+    /**
+     * Build the in-memory search index.
+     *
+     * All lowercase descriptions are joined into one newline-separated
+     * haystack, so each search term costs a single native indexOf scan
+     * instead of one substring test per catalogue entry.
+     */
+    buildIndex: function(payload) {
+        this.version = payload.version;
+        this.synonyms = Object.entries(payload.synonyms);
+        this.entries = payload.ncm.map(([code, description]) => ({
+            code: code,
+            description: description
+        }));
+
+        const descriptions = payload.ncm.map(([code, description]) => description.toLowerCase());
+        this.offsets = new Int32Array(descriptions.length);
+        let offset = 0;
+        descriptions.forEach((description, index) => {
+            this.offsets[index] = offset;
+            offset += description.length + 1;
+        });
+        this.haystack = descriptions.join('\n');
+        this.ready = true;
+    },
+
+    /**
+     * Entries whose description contains the given text
+     */
+    findEntries: function(text) {
+        const found = new Uint8Array(this.entries.length);
+        let position = this.haystack.indexOf(text);
+        while (position !== -1) {
+            const index = this.entryAt(position);
+            found[index] = 1;
+            if (index + 1 >= this.entries.length) break;
+            position = this.haystack.indexOf(text, this.offsets[index + 1]);
+        }
+        return found;
+    },
+
+    /**
+     * Entries whose description contains any of the given words
+     */
+    findAnyEntries: function(words) {
+        const found = new Uint8Array(this.entries.length);
+        words.forEach(word => {
+            const matches = this.findEntries(word);
+            for (let i = 0; i < matches.length; i++) {
+                found[i] |= matches[i];
+            }
+        });
+        return found;
+    },
+
+    /**
+     * Index of the entry that contains a haystack position (binary search)
+     */
+    entryAt: function(position) {
+        let low = 0;
+        let high = this.offsets.length - 1;
+        while (low < high) {
+            const middle = (low + high + 1) >> 1;
+            if (this.offsets[middle] <= position) {
+                low = middle;
+            } else {
+                high = middle - 1;
+            }
+        }
+        return low;
+    },
+
+    /**
+     * Search codes and descriptions (same rules as NCMService.search_ncm)
+     */
+    search: function(rawQuery) {
+        const query = rawQuery.toLowerCase().trim();
+        const count = this.entries.length;
+        const scores = new Int32Array(count);
+
+        this.expandQuery(query).forEach(term => {
+            const termMatches = this.findEntries(term);
+            const wordMatches = this.findAnyEntries(splitWords(term));
+            for (let i = 0; i < count; i++) {
+                if (termMatches[i]) {
+                    scores[i] += 20;
+                } else if (wordMatches[i]) {
+                    scores[i] += 10;
+                }
+            }
+        });
+
+        const queryMatches = this.findEntries(query);
+        const queryWordMatches = this.findAnyEntries(splitWords(query));
+        const exactMatches = [];
+        const partialMatches = [];
+
+        for (let i = 0; i < count; i++) {
+            // Exact code match
+            if (this.entries[i].code.includes(query)) {
+                exactMatches.push(this.entries[i]);
+                continue;
+            }
+
+            let score = scores[i];
+            if (queryMatches[i]) {
+                score += 30;
+            } else if (queryWordMatches[i]) {
+                score += 15;
+            }
+
+            if (score > 0) {
+                partialMatches.push({ entry: this.entries[i], score: score });
+            }
+        }
+
+        // Stable sort, like Python's list.sort
+        partialMatches.sort((a, b) => b.score - a.score);
+
+        return exactMatches
+            .concat(partialMatches.map(match => match.entry))
+            .slice(0, NCM_SEARCH_LIMIT)
+            .map(entry => ({ code: entry.code, description: entry.description }));
+    },
+
+    /**
+     * Expand the query with synonyms (deduplicated)
+     */
+    expandQuery: function(query) {
+        const expansions = new Set([query]);
+        for (const [term, synonyms] of this.synonyms) {
+            if (query.includes(term)) {
+                synonyms.forEach(synonym => expansions.add(synonym));
+            }
+        }
+        return Array.from(expansions);
+    },
+
+    openDB: function() {
+        return new Promise((resolve, reject) => {
+            const request = indexedDB.open(this.DB_NAME, 1);
+            request.onupgradeneeded = () => request.result.createObjectStore(this.STORE);
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    },
+
+    readStored: function() {
+        if (!window.indexedDB) return Promise.resolve(null);
+        return this.openDB()
+            .then(db => new Promise(resolve => {
+                const request = db.transaction(this.STORE).objectStore(this.STORE).get('ncm');
+                request.onsuccess = () => resolve(request.result || null);
+                request.onerror = () => resolve(null);
+            }))
+            .catch(() => null);
+    },
+
+    writeStored: function(payload) {
+        if (!window.indexedDB) return;
+        this.openDB()
+            .then(db => {
+                db.transaction(this.STORE, 'readwrite').objectStore(this.STORE).put(payload, 'ncm');
+            })
+            .catch(error => {
+                console.error('Error storing NCM catalogue:', error);
+            });
+    }
+};
+
+/**
+ * Load the offline NCM catalogue when the page declares one
+ */
+function loadNCMCatalogue() {
+    const element = document.getElementById('ncm-catalogue');
+    if (!element) return;
+
+    NCMCatalogue.load(element.dataset.version, element.dataset.url);
+}
+
+/**
+ * Split on whitespace, like Python's str.split()
+ */
+function splitWords(text) {
+    return text.split(/\s+/).filter(word => word.length > 0);
+}
+
 /**
  * Populate NCM suggestions
  */
@@ -261,55 +604,103 @@ function formatCurrencyInput(input) {
  * Setup auto-calculation for quick estimates
  */
 function setupAutoCalculation() {
-    const triggerInputs = document.querySelectorAll('#unit_value_usd, #quantity');
+    const triggerInputs = document.querySelectorAll('#unit_value_usd, #quantity, #ncm_code, #freight_usd, #insurance_usd, #destination_state, #origin_country, #ex');
     
     triggerInputs.forEach(input => {
         input.addEventListener('input', debounce(updateCalculationPreview, 500));
     });
+    document.getElementById('destination_state')?.addEventListener('change', updateCalculationPreview);
+    document.getElementById('customs_regime')?.addEventListener('change', updateCalculationPreview);
 }
 
 /**
- * Update calculation preview
+ * Load the rates resolved by the server for the preview (null on failure)
+ */
+function loadTaxRates(ncmCode, state, origin, ex, regime) {
+    const key = `${ncmCode}|${state}|${origin}|${ex}|${regime}`;
+    if (taxRatesCache.has(key)) {
+        return Promise.resolve(taxRatesCache.get(key));
+    }
+    const params = new URLSearchParams({ uf: state, origem: origin, ex: ex, regime: regime });
+    const request = fetch(`/api/aliquotas/${ncmCode}?${params}`)
+        .then(response => response.ok ? response.json() : null)
+        .then(payload => {
+            if (!payload || !payload.success) {
+                taxRatesCache.delete(key);
+                return null;
+            }
+            taxRatesCache.set(key, payload.data.rates);
+            if (taxRatesCache.size > TAX_RATES_CACHE_SIZE) {
+                taxRatesCache.delete(taxRatesCache.keys().next().value);
+            }
+            return payload.data.rates;
+        })
+        .catch(() => {
+            taxRatesCache.delete(key);
+            return null;
+        });
+    taxRatesCache.set(key, request);
+    return request;
+}
+
+/**
+ * Update calculation preview (taxes computed locally with the server's rates;
+ * approximate, from the embedded spec, until they are loaded)
  */
 function updateCalculationPreview() {
     const unitValue = parseFloat(document.getElementById('unit_value_usd')?.value) || 0;
     const quantity = parseInt(document.getElementById('quantity')?.value) || 1;
+    const ncmCode = document.getElementById('ncm_code')?.value.trim() || '';
+    const freight = parseFloat(document.getElementById('freight_usd')?.value) || 0;
+    const insurance = parseFloat(document.getElementById('insurance_usd')?.value) || 0;
+    const state = document.getElementById('destination_state')?.value || '';
+    const origin = document.getElementById('origin_country')?.value.trim() || '';
+    const ex = document.getElementById('ex')?.value.trim() || '';
+    const regime = document.getElementById('customs_regime')?.value || '';
     const rate = exchangeRateCache || 5.0;
     
-    if (unitValue > 0) {
-        const fobUSD = unitValue * quantity;
-        const fobBRL = fobUSD * rate;
-        
-        // Simple estimate (basic taxes)
-        const estimatedTaxes = fobBRL * 0.6; // Rough estimate
-        const estimatedTotal = fobBRL + estimatedTaxes;
-        
-        updatePreviewDisplay(fobBRL, estimatedTaxes, estimatedTotal);
+    if (unitValue > 0 && TaxCascade.load()) {
+        const cached = taxRatesCache.get(`${ncmCode}|${state}|${origin}|${ex}|${regime}`);
+        const resolvedRates = cached instanceof Promise ? undefined : cached;
+        const result = TaxCascade.calculateAllTaxes(unitValue, quantity, ncmCode, freight, insurance, rate, state,
+                                                    resolvedRates);
+        updatePreviewDisplay(
+            result.customs_values.cif_brl,
+            result.summary.total_taxes,
+            result.summary.total_cost,
+            result.approximate
+        );
+        if (!resolvedRates && /^\d{8}$/.test(ncmCode)) {
+            loadTaxRates(ncmCode, state, origin, ex, regime).then(rates => {
+                if (rates) {
+                    updateCalculationPreview();
+                }
+            });
+        }
     }
 }
 
 /**
  * Update preview display
  */
-function updatePreviewDisplay(fobBRL, taxes, total) {
-    // This would update a preview section if it exists
+function updatePreviewDisplay(cifBRL, taxes, total, approximate) {
     const previewSection = document.getElementById('calculation-preview');
     if (previewSection) {
         previewSection.innerHTML = `
             <div class="card">
                 <div class="card-body">
-                    <h6 class="card-title">Estimativa Rápida</h6>
+                    <h6 class="card-title">Prévia do Cálculo${approximate ? ' <small class="text-muted">(aproximada)</small>' : ''}</h6>
                     <div class="row">
                         <div class="col-4 text-center">
-                            <small class="text-muted">Valor FOB</small>
-                            <div class="fw-bold">R$ ${formatCurrency(fobBRL)}</div>
+                            <small class="text-muted">Valor CIF</small>
+                            <div class="fw-bold">R$ ${formatCurrency(cifBRL)}</div>
                         </div>
                         <div class="col-4 text-center">
-                            <small class="text-muted">Impostos (est.)</small>
+                            <small class="text-muted">Impostos</small>
                             <div class="fw-bold text-warning">R$ ${formatCurrency(taxes)}</div>
                         </div>
                         <div class="col-4 text-center">
-                            <small class="text-muted">Total (est.)</small>
+                            <small class="text-muted">Custo Total</small>
                             <div class="fw-bold text-success">R$ ${formatCurrency(total)}</div>
                         </div>
                     </div>
@@ -626,6 +1017,9 @@ const FormUtils = {
 
 // Export for use in other scripts
 window.Calculator = {
+    TaxCascade,
+    lookupNCMCodes,
+    abortNCMSearch,
     showNotification,
     formatCurrency,
     copyToClipboard,
@@ -0,0 +1,115 @@
+/**
+ * Import tax cascade shared by the calculation preview (calculator.js)
+ * and the golden-file parity tests (tests/js/check_tax_cascade.js).
+ */
+
+/**
+ * Import tax cascade, mirroring BrazilianTaxCalculator.calculate_all_taxes.
+ *
+ * Exact rates are the ones resolved by the server (/api/aliquotas: spec,
+ * RateStore versions, state ICMS and benefits), passed as `resolvedRates`.
+ * Until they arrive, rates come from the versioned spec in
+ * services/tax_spec.py and the IcmsMatrix (services/icms_matrix.py), both
+ * embedded in the page, and the result is flagged `approximate`.
+ * Operations are applied in the same order as the Python code so results
+ * match to the last floating-point digit.
+ */
+const TaxCascade = {
+    spec: null,
+    icmsMatrix: null,
+
+    /**
+     * Read the spec embedded in the page (null when absent)
+     */
+    load: function() {
+        const element = document.getElementById('tax-spec');
+        if (element && !this.spec) {
+            this.spec = JSON.parse(element.textContent);
+        }
+        const matrixElement = document.getElementById('icms-matrix');
+        if (matrixElement && !this.icmsMatrix) {
+            this.icmsMatrix = JSON.parse(matrixElement.textContent);
+        }
+        return this.spec;
+    },
+
+    getTaxRates: function(ncmCode) {
+        return this.spec.ncm_rates[ncmCode] || this.spec.default_rates;
+    },
+
+    /**
+     * ICMS rate (with FCP) and gross-up factor for the state, or null
+     */
+    getStateIcms: function(ncmCode, state) {
+        const matrix = this.icmsMatrix;
+        const stateIndex = matrix && state ? matrix.states.indexOf(state) : -1;
+        if (stateIndex < 0) {
+            return null;
+        }
+        const ncmClass = matrix.ncm_classes[ncmCode] || matrix.chapter_classes[ncmCode.slice(0, 2)] || 'GERAL';
+        const position = stateIndex * matrix.classes.length + matrix.classes.indexOf(ncmClass);
+        return { rate: matrix.rates[position], factor: matrix.factors[position] };
+    },
+
+    /**
+     * resolvedRates: rates from /api/aliquotas (BrazilianTaxCalculator.get_tax_rates);
+     * without them, spec and ICMS matrix rates (approximate result)
+     */
+    calculateAllTaxes: function(unitValueUSD, quantity, ncmCode, freightUSD, insuranceUSD, exchangeRate, state,
+                                resolvedRates) {
+        // 1. Customs value
+        const fobUSD = unitValueUSD * quantity;
+        const cifUSD = fobUSD + freightUSD + insuranceUSD;
+        const cifBRL = cifUSD * exchangeRate;
+
+        // 2. Rates
+        const rates = resolvedRates || this.getTaxRates(ncmCode);
+
+        // 3. Cascade
+        const ii = cifBRL * rates.II;
+        const ipiBase = cifBRL + ii;
+        const ipi = ipiBase * rates.IPI;
+        const pisCofinsBase = cifBRL + ii;
+        const pis = pisCofinsBase * rates.PIS;
+        const cofins = pisCofinsBase * rates.COFINS;
+        const icmsBaseWithoutIcms = cifBRL + ii + ipi + pis + cofins;
+        const stateIcms = resolvedRates
+            ? (rates.ICMS_FACTOR != null ? { rate: rates.ICMS, factor: rates.ICMS_FACTOR } : null)
+            : this.getStateIcms(ncmCode, state);
+        const icmsRate = stateIcms ? stateIcms.rate : rates.ICMS;
+        const icms = stateIcms
+            ? icmsBaseWithoutIcms * stateIcms.factor
+            : (icmsBaseWithoutIcms * rates.ICMS) / (1 - rates.ICMS);
+
+        const totalTaxes = ii + ipi + pis + cofins + icms;
+        const totalCost = cifBRL + totalTaxes;
+
+        return {
+            spec_version: this.spec.version,
+            approximate: !resolvedRates,
+            customs_values: {
+                fob_usd: fobUSD,
+                cif_usd: cifUSD,
+                cif_brl: cifBRL,
+                exchange_rate: exchangeRate
+            },
+            taxes: {
+                II: { base_value: cifBRL, rate: rates.II, amount: ii },
+                IPI: { base_value: ipiBase, rate: rates.IPI, amount: ipi },
+                PIS: { base_value: pisCofinsBase, rate: rates.PIS, amount: pis },
+                COFINS: { base_value: pisCofinsBase, rate: rates.COFINS, amount: cofins },
+                ICMS: { base_value: icmsBaseWithoutIcms + icms, rate: icmsRate, amount: icms }
+            },
+            summary: {
+                total_taxes: totalTaxes,
+                total_cost: totalCost,
+                effective_rate: (totalTaxes / cifBRL) * 100
+            }
+        };
+    }
+};
+
+// Node (tests): export the cascade; in the browser it stays a global
+if (typeof module !== 'undefined' && module.exports) {
+    module.exports = TaxCascade;
+}
@@ -0,0 +1,70 @@
+import os
+import sys
+
+import pytest
+
+# Testes importam os módulos da raiz do repositório (services, app, ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# app.py exige DATABASE_URL; os testes usam SQLite em memória
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+
+@pytest.fixture(scope='session')
+def app():
+    """Aplicação completa (rotas e API) sobre o banco SQLite em memória"""
+    import main  # noqa: F401 - registra rotas, API e comandos
+    from app import app as flask_app, db
+    flask_app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    with flask_app.app_context():
+        db.create_all()
+    return flask_app
+
+
+@pytest.fixture
+def app_context(app):
+    """Contexto da aplicação (e sessão do banco) compartilhado pelas fixtures do teste"""
+    with app.app_context():
+        yield
+
+
+@pytest.fixture
+def user(app_context):
+    """Usuário de teste, removido ao final"""
+    from app import db
+    from models import User
+    account = User(email='teste@example.com', name='Teste')
+    account.set_password('segredo1')
+    db.session.add(account)
+    db.session.commit()
+    yield account
+    if db.session.get(User, account.id) is not None:
+        db.session.delete(account)
+        db.session.commit()
+
+
+@pytest.fixture
+def client(app, user):
+    """Cliente com sessão do usuário de teste"""
+    test_client = app.test_client()
+    with test_client.session_transaction() as session:
+        session['_user_id'] = user.id
+        session['_fresh'] = True
+    return test_client
+
+
+@pytest.fixture
+def make_calculation(client, monkeypatch):
+    """Cria cálculos pela rota /calcular (cotação fixa de R$ 5,00) e retorna o Calculation gravado"""
+    from app import db
+    from models import Calculation
+    from routes import currency_service
+    monkeypatch.setattr(currency_service, 'get_usd_brl_rate', lambda: 5.0)
+
+    def make(**fields):
+        form = {'product_name': 'Smartphone', 'ncm_code': '85171200', 'unit_value_usd': 120.0, 'quantity': 100,
+                'origin_country': 'China', 'transport_mode': 'MARITIME', 'destination_state': 'SP',
+                'freight_usd': 500.0, 'insurance_usd': 50.0, **fields}
+        response = client.post('/calcular', data=form)
+        assert response.status_code == 302, response.get_data(as_text=True)
+        return db.session.get(Calculation, response.headers['Location'].rsplit('/', 1)[-1])
+    return make
@@ -0,0 +1,53 @@
+/**
+ * Golden-file check of static/js/tax_cascade.js.
+ *
+ * Reads from stdin {spec, icms_matrix, cases} (the same spec and ICMS matrix
+ * the page embeds, plus the cases of tests/golden/tax_cascade.json) and
+ * requires every amount to match the Python cascade exactly. Cases with
+ * resolved_rates use them as the rates served by /api/aliquotas.
+ *
+ * Usage: node tests/js/check_tax_cascade.js < payload.json
+ */
+const path = require('path');
+const TaxCascade = require(path.join(__dirname, '..', '..', 'static', 'js', 'tax_cascade.js'));
+
+let raw = '';
+process.stdin.on('data', chunk => { raw += chunk; });
+process.stdin.on('end', () => {
+    const payload = JSON.parse(raw);
+    TaxCascade.spec = payload.spec;
+    TaxCascade.icmsMatrix = payload.icms_matrix;
+
+    const failures = [];
+    payload.cases.forEach(testCase => {
+        const input = testCase.input;
+        const result = TaxCascade.calculateAllTaxes(
+            input.unit_value_usd, input.quantity, input.ncm_code, input.freight_usd,
+            input.insurance_usd, input.exchange_rate, input.destination_state, testCase.resolved_rates
+        );
+        if (result.approximate !== !testCase.resolved_rates) {
+            failures.push(`${testCase.name}: approximate = ${result.approximate}`);
+        }
+        const actual = {
+            cif_brl: result.customs_values.cif_brl,
+            II: result.taxes.II.amount,
+            IPI: result.taxes.IPI.amount,
+            PIS: result.taxes.PIS.amount,
+            COFINS: result.taxes.COFINS.amount,
+            ICMS: result.taxes.ICMS.amount,
+            total_taxes: result.summary.total_taxes,
+            total_cost: result.summary.total_cost
+        };
+        Object.keys(testCase.expected).forEach(field => {
+            if (actual[field] !== testCase.expected[field]) {
+                failures.push(`${testCase.name}: ${field} = ${actual[field]}, esperado ${testCase.expected[field]}`);
+            }
+        });
+    });
+
+    if (failures.length) {
+        console.error(failures.join('\n'));
+        process.exit(1);
+    }
+    console.log(`${payload.cases.length} casos conferidos`);
+});
@@ -0,0 +1,97 @@
+"""Exportação incremental em Parquet (AnalyticsExporter): marca d'água e arquivos particionados"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from models import Calculation, SystemConfig
+from routes import calculation_exporter
+from services.analytics_export import AnalyticsExporter
+
+pq = pytest.importorskip('pyarrow.parquet')
+
+
+@pytest.fixture
+def exporter(app_context):
+    yield AnalyticsExporter(calculation_exporter)
+    SystemConfig.query.filter_by(key=AnalyticsExporter.WATERMARK_KEY).delete()
+    db.session.commit()
+
+
+def _set_updated_at(calculation, updated_at):
+    Calculation.query.filter_by(id=calculation.id).update({'updated_at': updated_at}, synchronize_session=False)
+    db.session.commit()
+    db.session.refresh(calculation)
+
+
+def _exported_ids(summary):
+    return sorted(row['id'] for path in summary['files'] for row in pq.read_table(path).to_pylist())
+
+
+def test_parquet_partitions_and_schema(exporter, make_calculation, tmp_path):
+    first = make_calculation(product_name='Smartphone')
+    second = make_calculation(product_name='Roteador', ncm_code='85176200')
+    second.created_at = datetime(2025, 12, 31, 23)
+    db.session.commit()
+
+    summary = exporter.export(str(tmp_path), full=True)
+    assert summary['rows'] >= 2
+    months = {path.split('month=')[1].split('/')[0] for path in summary['files']}
+    assert {'2025-12', first.created_at.strftime('%Y-%m')} <= months
+    assert not list(tmp_path.rglob('*.tmp'))
+
+    table = pq.read_table(next(path for path in summary['files'] if 'month=2025-12' in path))
+    assert table.schema.field('ncm_code').type.value_type == 'string'
+    assert str(table.schema.field('ncm_code').type).startswith('dictionary')
+    assert str(table.schema.field('created_at').type) == 'timestamp[us]'
+    row = next(row for row in table.to_pylist() if row['id'] == second.id)
+    assert row['user_id'] == second.user_id
+    assert row['II_amount'] == second.tax_breakdown['II']['amount']
+    assert row['FREIGHT_brl'] == pytest.approx(500.0 * 5.0)
+
+
+def test_incremental_watermark(exporter, make_calculation, tmp_path):
+    calculation = make_calculation()
+    first = exporter.export(str(tmp_path / 'primeira'))
+    assert calculation.id in _exported_ids(first)
+    watermark, ids = exporter.get_watermark()
+    assert first['watermark'] == watermark.isoformat()
+    assert calculation.id in ids
+
+    # Nada mudou: nada exportado, marca d'água mantida
+    second = exporter.export(str(tmp_path / 'segunda'))
+    assert (second['rows'], second['files']) == (0, [])
+    assert exporter.get_watermark() == (watermark, ids)
+
+    # Cálculo alterado depois da exportação volta a sair
+    _set_updated_at(calculation, watermark + timedelta(seconds=1))
+    third = exporter.export(str(tmp_path / 'terceira'))
+    assert _exported_ids(third) == [calculation.id]
+    assert exporter.get_watermark() == (calculation.updated_at, [calculation.id])
+
+
+def test_same_updated_at_committed_after_export(exporter, make_calculation, tmp_path):
+    """Cálculo gravado após a exportação com o mesmo updated_at da marca d'água não é perdido"""
+    exported = make_calculation(product_name='Exportado')
+    exporter.export(str(tmp_path / 'primeira'))
+    watermark, _ = exporter.get_watermark()
+    _set_updated_at(exported, watermark)
+
+    late = make_calculation(product_name='Atrasado')
+    _set_updated_at(late, watermark)
+    summary = exporter.export(str(tmp_path / 'segunda'))
+    assert _exported_ids(summary) == [late.id]
+    new_watermark, ids = exporter.get_watermark()
+    assert new_watermark == watermark
+    assert {exported.id, late.id} <= set(ids)
+
+    assert exporter.export(str(tmp_path / 'terceira'))['rows'] == 0
+
+
+def test_legacy_watermark_format(exporter, make_calculation, tmp_path):
+    calculation = make_calculation()
+    db.session.add(SystemConfig(key=AnalyticsExporter.WATERMARK_KEY, value=calculation.updated_at.isoformat()))
+    db.session.commit()
+    assert exporter.get_watermark() == (calculation.updated_at, [])
+    # Sem ids, cálculos no próprio horário da marca d'água são reexportados (o consumidor deduplica por id)
+    assert calculation.id in _exported_ids(exporter.export(str(tmp_path)))
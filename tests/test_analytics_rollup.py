@@ -0,0 +1,107 @@
+"""Agregados do dashboard (AnalyticsRollup): upsert por cálculo, recálculo, leitura e carga inicial"""
+from datetime import datetime
+
+import pytest
+
+from app import db
+from models import CalculationArchive, CalculationRollup
+from routes import analytics_rollup, calculation_archiver
+from services.schema_migrations import SchemaMigrator
+
+
+@pytest.fixture
+def rollups(user):
+    yield
+    CalculationRollup.query.filter_by(user_id=user.id).delete()
+    CalculationArchive.query.filter_by(user_id=user.id).delete()
+    db.session.commit()
+
+
+@pytest.fixture
+def calculations(make_calculation, rollups):
+    """Três cálculos: dois do capítulo 85 da China (um arquivado, de 2020) e um do capítulo 62 do Vietnã"""
+    archived = make_calculation()
+    archived.created_at = datetime(2020, 5, 4, 10)
+    db.session.commit()
+    created = [archived, make_calculation(), make_calculation(product_name='Camisa', ncm_code='62034200',
+                                                            origin_country='Vietnã', destination_state='MG')]
+    # Os agregados de 2020 refletem a data corrigida acima
+    analytics_rollup.refresh(archived.user_id)
+    return created
+
+
+def _totals(calculations):
+    return {
+        'calculations': len(calculations),
+        'cif_brl': round(sum(calculation.total_cost_brl for calculation in calculations), 2),
+        'taxes_brl': round(sum(calculation.total_taxes_brl for calculation in calculations), 2),
+        'avg_effective_rate': round(sum(calculation.total_taxes_brl / calculation.total_cost_brl
+                                        for calculation in calculations) / len(calculations), 4)
+    }
+
+
+def _rows(user_id):
+    return sorted((row.month, row.ncm_chapter, row.origin_country, row.calculation_count,
+                   round(row.cif_brl_sum, 6), round(row.taxes_brl_sum, 6), round(row.effective_rate_sum, 9))
+                  for row in CalculationRollup.query.filter_by(user_id=user_id))
+
+
+def test_record_upserts_group(user, make_calculation, rollups):
+    first = make_calculation()
+    second = make_calculation()
+    other = make_calculation(origin_country='Vietnã')
+
+    rows = {(row.ncm_chapter, row.origin_country): row for row in CalculationRollup.query.filter_by(user_id=user.id)}
+    assert set(rows) == {('85', 'China'), ('85', 'Vietnã')}
+    china = rows[('85', 'China')]
+    assert china.month == first.created_at.strftime('%Y-%m')
+    assert china.calculation_count == 2
+    assert china.cif_brl_sum == pytest.approx(first.total_cost_brl + second.total_cost_brl)
+    assert rows[('85', 'Vietnã')].taxes_brl_sum == pytest.approx(other.total_taxes_brl)
+    assert analytics_rollup.totals(user.id) == _totals([first, second, other])
+
+
+def test_refresh_rebuilds_from_active_and_archived(user, calculations):
+    expected, totals = _rows(user.id), _totals(calculations)
+    assert calculation_archiver.archive(365) == 1
+
+    CalculationRollup.query.filter_by(user_id=user.id).delete()
+    db.session.commit()
+    assert analytics_rollup.refresh(user.id) == len(expected)
+    assert _rows(user.id) == expected
+    assert analytics_rollup.totals(user.id) == totals
+
+
+def test_summary_breakdowns(user, calculations):
+    archived, recent, shirt = calculations
+    summary = analytics_rollup.summary(user.id)
+    assert summary['totals'] == _totals(calculations)
+    assert [row['month'] for row in summary['by_month']] == ['2020-05', recent.created_at.strftime('%Y-%m')]
+    assert summary['by_ncm_chapter'][0] == {'ncm_chapter': '85', **_totals([archived, recent])}
+    assert {row['origin_country'] for row in summary['by_origin_country']} == {'China', 'Vietnã'}
+    assert len(analytics_rollup.summary(user.id, limit=1)['by_ncm_chapter']) == 1
+
+    since = analytics_rollup.summary(user.id, since_month='2021-01')
+    assert since['totals'] == _totals([recent, shirt])
+    assert analytics_rollup.totals(user.id, since_month='2021-01') == since['totals']
+
+
+def test_migrate_loads_missing_rollups(user, calculations):
+    expected = _rows(user.id)
+    # Cálculos anteriores aos agregados: nenhuma linha em calculation_rollups
+    CalculationRollup.query.filter_by(user_id=user.id).delete()
+    db.session.commit()
+    assert analytics_rollup.totals(user.id)['calculations'] == 0
+
+    summary = SchemaMigrator(analytics_rollup).migrate()
+    assert summary['rollups'] >= len(expected)
+    assert _rows(user.id) == expected
+    # Idempotente: quem já tem agregados não é recalculado
+    assert SchemaMigrator(analytics_rollup).migrate()['rollups'] == 0
+
+
+def test_dashboard_loads_missing_rollups(user, client, calculations):
+    CalculationRollup.query.filter_by(user_id=user.id).delete()
+    db.session.commit()
+    assert client.get('/dashboard').status_code == 200
+    assert analytics_rollup.totals(user.id) == _totals(calculations)
@@ -0,0 +1,57 @@
+"""Eixos da grade "e se" (/api/v1/scenarios/<id>/sweep)"""
+import pytest
+
+from app import db
+from models import ProductScenario
+
+
+@pytest.fixture
+def scenario(user):
+    record = ProductScenario(user_id=user.id, name='Smartphone', ncm_code='85171200', unit_value_usd=120.0,
+                             origin_country='CN', transport_mode='MARITIME', exchange_rate=5.0,
+                             default_quantity=100, freight_cost=500.0, insurance_cost=50.0)
+    db.session.add(record)
+    db.session.commit()
+    return record
+
+
+def _sweep(app, user, scenario, payload):
+    return app.test_client().post(f'/api/v1/scenarios/{scenario.id}/sweep', json=payload,
+                                  headers={'Authorization': f'Bearer {user.generate_api_token()}'})
+
+
+def test_selling_price_spread_requires_base(app, user, scenario):
+    response = _sweep(app, user, scenario, {'selling_price': {'spread_pct': 10, 'steps': 3}})
+    assert response.status_code == 400
+    assert 'base' in response.get_json()['error']
+
+
+def test_selling_price_spread_with_base(app, user, scenario):
+    response = _sweep(app, user, scenario, {'selling_price': {'base': 3000, 'spread_pct': 10, 'steps': 3}})
+    assert response.status_code == 200
+    assert response.get_json()['data']['axes']['selling_price'] == pytest.approx([2700, 3000, 3300])
+
+
+def test_exchange_rate_spread_uses_scenario_base(app, user, scenario):
+    response = _sweep(app, user, scenario, {'exchange_rate': {'spread_pct': 10, 'steps': 3}})
+    assert response.status_code == 200
+    assert response.get_json()['data']['axes']['exchange_rate'] == pytest.approx([4.5, 5.0, 5.5])
+
+
+def test_net_margin_uses_destination_state_sale_icms(app, user, scenario):
+    from routes import tax_calculator
+
+    scenario.destination_state = 'RJ'
+    db.session.commit()
+    additional_costs = {'storage': 200.0, 'marketing': 100.0, 'platform_fees_rate': 12.0}
+    response = _sweep(app, user, scenario, {'selling_price': [600, 900], 'additional_costs': additional_costs})
+    assert response.status_code == 200
+    data = response.get_json()['data']
+
+    sale_icms_rate = tax_calculator.get_sale_icms_rate('85171200', 'RJ')
+    assert sale_icms_rate != tax_calculator.SALE_RATES['ICMS']
+    assert data['sale_icms_rate'] == sale_icms_rate
+    expected = [round(tax_calculator.calculate_profitability(data['total_cost'][0], price * 100, additional_costs,
+                                                             sale_icms_rate)['net_margin'], 2)
+                for price in (600, 900)]
+    assert data['net_margin'] == pytest.approx(expected, abs=0.01)
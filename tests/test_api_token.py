@@ -0,0 +1,64 @@
+"""Tokens da API JSON: validade, revogação por troca de senha e usuário excluído"""
+import time
+
+import pytest
+
+import api
+from app import db
+from models import User
+
+
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    api._token_cache.clear()
+    yield
+    api._token_cache.clear()
+
+
+def _get_shipments(app, token):
+    return app.test_client().get('/api/v1/shipments', headers={'Authorization': f'Bearer {token}'})
+
+
+def test_valid_token(app, user):
+    token = user.generate_api_token()
+    assert User.verify_api_token(token) == user.id
+    assert _get_shipments(app, token).status_code == 200
+
+
+def test_tampered_token(app, user):
+    token = user.generate_api_token()
+    assert User.verify_api_token(token[:-2] + 'xx') is None
+    assert _get_shipments(app, 'invalido').status_code == 401
+
+
+def test_expired_token(app, user, monkeypatch):
+    token = user.generate_api_token()
+    monkeypatch.setitem(app.config, 'API_TOKEN_MAX_AGE', -1)
+    assert User.verify_api_token(token) is None
+
+
+def test_password_change_revokes_token(app, user):
+    token = user.generate_api_token()
+    user.set_password('outra-senha')
+    db.session.commit()
+    assert User.verify_api_token(token) is None
+    assert _get_shipments(app, token).status_code == 401
+
+
+def test_deleted_user_token(app, user):
+    token = user.generate_api_token()
+    db.session.delete(user)
+    db.session.commit()
+    assert User.verify_api_token(token) is None
+    assert _get_shipments(app, token).status_code == 401
+
+
+def test_cache_expires(app, user, monkeypatch):
+    token = user.generate_api_token()
+    assert _get_shipments(app, token).status_code == 200
+    db.session.delete(user)
+    db.session.commit()
+    # Dentro do TTL o token memorizado ainda vale; depois dele, é verificado de novo
+    assert _get_shipments(app, token).status_code == 200
+    monkeypatch.setattr(time, 'monotonic', lambda: api._token_cache[token][1] + 1)
+    assert _get_shipments(app, token).status_code == 401
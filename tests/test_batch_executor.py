@@ -0,0 +1,22 @@
+"""Cotação em lote (BatchExecutor)"""
+import pytest
+
+from services.batch_executor import BatchExecutor
+from services.tax_calculator import BrazilianTaxCalculator
+
+ITEM = {'unit_value_usd': 120.0, 'quantity': 10, 'ncm_code': '85171200', 'freight_usd': 50.0,
+        'exchange_rate': 5.37, 'destination_state': 'SP'}
+
+
+def test_matches_calculate_all_taxes():
+    result = BatchExecutor().calculate([ITEM])
+    expected = BrazilianTaxCalculator().calculate_all_taxes(120.0, 10, '85171200', 50.0, 0, 5.37,
+                                                            destination_state='SP')
+    assert result['total_cost'] == [expected['summary']['total_cost']]
+
+
+@pytest.mark.parametrize('exchange_rate', [None, 0, -5.0])
+def test_missing_exchange_rate(exchange_rate):
+    items = [ITEM, {**ITEM, 'exchange_rate': exchange_rate}]
+    with pytest.raises(ValueError, match='Item 1: exchange_rate'):
+        BatchExecutor().calculate(items)
@@ -0,0 +1,93 @@
+"""Arquivamento de cálculos antigos (CalculationArchiver)"""
+from datetime import datetime
+
+import models
+from app import db
+from models import Calculation, CalculationArchive, User
+from routes import calculation_archiver
+
+
+def test_archive_several_months_in_one_batch(app, user):
+    other = User(email='outro@example.com', name='Outro')
+    other.set_password('segredo2')
+    db.session.add(other)
+    months = [datetime(2020, month, 10, 12) for month in (1, 2, 3)]
+    for owner in (user, other):
+        for index, created_at in enumerate(months):
+            db.session.add(Calculation(
+                id=f'{owner.email}-{index}', user_id=owner.id, product_name='Smartphone', ncm_code='85171200',
+                unit_value_usd=120.0, quantity=10, origin_country='CN', transport_mode='MARITIME',
+                exchange_rate=5.0, total_cost_usd=1200.0, total_cost_brl=6000.0, total_taxes_brl=5500.0,
+                final_cost_brl=11500.0, created_at=created_at))
+    db.session.commit()
+
+    try:
+        # Um único lote gera seis registros de arquivo (2 usuários × 3 meses) antes do flush
+        assert calculation_archiver.archive(365) == 6
+        archives = CalculationArchive.query.all()
+        assert len(archives) == 6
+        assert len({archive.id for archive in archives}) == 6
+        assert calculation_archiver.list_months(user.id) == [
+            {'month': '2020-03', 'count': 1}, {'month': '2020-02', 'count': 1}, {'month': '2020-01', 'count': 1}]
+        rows = [row for chunk in calculation_archiver.iter_chunks(user.id) for row in chunk]
+        assert [row['id'] for row in rows] == [f'{user.email}-{index}' for index in range(3)]
+    finally:
+        CalculationArchive.query.delete()
+        db.session.delete(other)
+        db.session.commit()
+
+
+def test_archive_ids_are_unique_within_a_flush(monkeypatch):
+    # Relógio parado (resolução grossa): ids derivados do horário colidiriam
+    frozen = datetime(2024, 1, 31, 23, 59, 59)
+    frozen_clock = type('FrozenDatetime', (datetime,), {'now': classmethod(lambda cls: frozen)})
+    monkeypatch.setattr(models, 'datetime', frozen_clock)
+    new_id = CalculationArchive.__table__.c.id.default.arg
+    assert len({new_id(None) for _ in range(1000)}) == 1000
+
+
+def _archive_days(user, days):
+    for day in days:
+        db.session.add(Calculation(
+            id=f'arquivo-{day}', user_id=user.id, product_name=f'Produto {day}', ncm_code='85171200',
+            unit_value_usd=120.0, quantity=10, origin_country='CN', transport_mode='MARITIME',
+            exchange_rate=5.0, total_cost_usd=1200.0, total_cost_brl=6000.0, total_taxes_brl=5500.0,
+            final_cost_brl=11500.0, created_at=datetime(2020, 1, day, 12)))
+    db.session.commit()
+    # Lotes de 2: o mês fica em três registros de arquivo (dias 1-2, 3-4 e 5)
+    assert calculation_archiver.archive(365, batch_size=2) == len(days)
+
+
+def test_page_loads_only_needed_archives(user, monkeypatch):
+    _archive_days(user, range(1, 6))
+    loaded = []
+    load = calculation_archiver._load
+    monkeypatch.setattr(calculation_archiver, '_load', lambda archive_id: loaded.append(archive_id) or load(archive_id))
+    try:
+        page = calculation_archiver.page(user.id, '2020-01', page=2, per_page=2)
+        assert [row['id'] for row in page['rows']] == ['arquivo-3', 'arquivo-2']
+        assert (page['total'], page['pages']) == (5, 3)
+        assert len(loaded) == 2
+
+        last = calculation_archiver.page(user.id, '2020-01', page=3, per_page=2)
+        assert [row['id'] for row in last['rows']] == ['arquivo-1']
+        assert calculation_archiver.page(user.id, '2020-01', page=4, per_page=2)['rows'] == []
+    finally:
+        CalculationArchive.query.delete()
+        db.session.commit()
+
+
+def test_archive_page_route(client, user):
+    _archive_days(user, range(1, 6))
+    try:
+        response = client.get('/historico/arquivo/2020-01')
+        assert response.status_code == 200
+        assert 'Produto 5' in response.get_data(as_text=True)
+
+        for month in ('2020-13', '2020-1', 'janeiro', '2020-02'):
+            response = client.get(f'/historico/arquivo/{month}')
+            assert response.status_code == 302
+            assert response.headers['Location'].endswith('/historico')
+    finally:
+        CalculationArchive.query.delete()
+        db.session.commit()
@@ -0,0 +1,114 @@
+"""Exportação do histórico (CSV, NDJSON e XLSX) pela interface web e pela API, com cálculos arquivados"""
+import csv
+import io
+import json
+import zipfile
+from datetime import datetime
+from xml.etree import ElementTree
+
+import pytest
+
+from app import db
+from models import CalculationArchive
+from routes import calculation_archiver, export_calculations
+from services.calculation_export import CalculationExporter
+
+SHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+
+@pytest.fixture
+def history(user, make_calculation):
+    """Um cálculo arquivado (2020) e dois ativos, na ordem em que a exportação os emite"""
+    archived = make_calculation(product_name='Arquivado', clearance_fees_brl=300.0)
+    archived.created_at = datetime(2020, 1, 15, 10)
+    db.session.commit()
+    expected = [_expected(archived)]
+    assert calculation_archiver.archive(365) == 1
+
+    for name, fees in (('Roteador', 150.0), ('Notebook', 0)):
+        expected.append(_expected(make_calculation(product_name=name, ncm_code='85176200', clearance_fees_brl=fees)))
+    yield expected
+    CalculationArchive.query.filter_by(user_id=user.id).delete()
+    db.session.commit()
+
+
+def _expected(calculation):
+    clearance = sum(cost.amount_brl for cost in calculation.costs if cost.cost_type == 'CLEARANCE_FEES')
+    return {
+        'id': calculation.id,
+        'product_name': calculation.product_name,
+        'ncm_code': calculation.ncm_code,
+        'final_cost_brl': calculation.final_cost_brl,
+        'II_amount': calculation.tax_breakdown['II']['amount'],
+        'ICMS_rate': calculation.tax_breakdown['ICMS']['rate'],
+        'CLEARANCE_FEES_brl': clearance or None
+    }
+
+
+def _parse(export_format, data):
+    """Linhas exportadas como dicionários de COLUMNS (valores numéricos como float)"""
+    if export_format == 'ndjson':
+        return [json.loads(line) for line in data.decode('utf-8').splitlines()]
+    if export_format == 'csv':
+        reader = csv.reader(io.StringIO(data.decode('utf-8-sig')))
+        assert next(reader) == CalculationExporter.COLUMNS
+        rows = [row for row in reader]
+    else:
+        with zipfile.ZipFile(io.BytesIO(data)) as package:
+            assert package.testzip() is None
+            sheet = ElementTree.fromstring(package.read('xl/worksheets/sheet1.xml'))
+        rows = [[cell.findtext(f'{SHEET_NS}v') or cell.findtext(f'{SHEET_NS}is/{SHEET_NS}t') or ''
+                 for cell in row] for row in sheet.iter(f'{SHEET_NS}row')]
+        assert rows.pop(0) == CalculationExporter.COLUMNS
+    parsed = []
+    for row in rows:
+        assert len(row) == len(CalculationExporter.COLUMNS)
+        parsed.append(dict(zip(CalculationExporter.COLUMNS, row)))
+    return parsed
+
+
+def _check(export_format, data, expected):
+    rows = _parse(export_format, data)
+    assert [row['id'] for row in rows] == [row['id'] for row in expected]
+    for row, wanted in zip(rows, expected):
+        for column, value in wanted.items():
+            actual = row[column]
+            if isinstance(value, float):
+                assert float(actual) == value, column
+            elif value is None:
+                assert actual in (None, ''), column
+            else:
+                assert actual == value, column
+
+
+@pytest.mark.parametrize('export_format', list(CalculationExporter.FORMATS))
+def test_web_export_round_trip(client, history, export_format):
+    response = client.get(f'/historico/exportar?formato={export_format}')
+    assert response.status_code == 200
+    assert response.mimetype == CalculationExporter.FORMATS[export_format][0].split(';')[0]
+    assert response.headers['Content-Disposition'].endswith(f'.{export_format}"')
+    _check(export_format, response.data, history)
+
+
+@pytest.mark.parametrize('export_format', list(CalculationExporter.FORMATS))
+def test_api_export_round_trip(app, user, history, export_format):
+    response = app.test_client().get(f'/api/v1/calculations/export?format={export_format}',
+                                     headers={'Authorization': f'Bearer {user.generate_api_token()}'})
+    assert response.status_code == 200
+    _check(export_format, response.data, history)
+
+
+def test_export_streams_in_chunks(user, history, monkeypatch):
+    monkeypatch.setattr(CalculationExporter, 'CHUNK_SIZE', 1)
+    chunks = list(export_calculations(user.id, 'ndjson'))
+    # Um bloco do arquivo e um por cálculo ativo
+    assert len(chunks) == 3
+    _check('ndjson', b''.join(chunks), history)
+
+
+def test_invalid_format(app, user, client):
+    response = app.test_client().get('/api/v1/calculations/export?format=pdf',
+                                     headers={'Authorization': f'Bearer {user.generate_api_token()}'})
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+    assert client.get('/historico/exportar?formato=pdf').status_code == 302
@@ -0,0 +1,83 @@
+"""Requisições condicionais (ETag / Last-Modified) do catálogo NCM, das alíquotas e da cotação"""
+from datetime import date, datetime, timezone
+
+import pytest
+
+from app import db
+from models import SystemConfig, TaxBenefit, TaxRateVersion
+from routes import benefit_engine, currency_service, rate_store
+
+
+@pytest.fixture
+def clean_versions(app_context):
+    yield
+    TaxRateVersion.query.delete()
+    TaxBenefit.query.delete()
+    SystemConfig.query.filter(SystemConfig.key.in_([rate_store.VERSION_KEY, benefit_engine.VERSION_KEY])).delete()
+    db.session.commit()
+    rate_store._index = None
+    benefit_engine._index = None
+
+
+@pytest.fixture
+def fixed_rate(monkeypatch):
+    timestamp = datetime(2026, 3, 2, 12, 30, tzinfo=timezone.utc)
+    monkeypatch.setattr(currency_service, 'get_usd_brl_rate', lambda: 5.4321)
+    monkeypatch.setattr(currency_service, 'get_rate_timestamp', lambda: timestamp)
+    monkeypatch.setattr(currency_service, 'get_cache_remaining_seconds', lambda: 120)
+    return timestamp
+
+
+def test_catalogue_if_none_match(app):
+    client = app.test_client()
+    first = client.get('/api/ncm/catalogo')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    second = client.get('/api/ncm/catalogo', headers={'If-None-Match': etag})
+    assert second.status_code == 304
+    assert second.headers['ETag'] == etag
+    assert second.data == b''
+
+
+def test_tax_rates_if_none_match(client):
+    etag = client.get('/api/aliquotas/85171200?uf=SP').headers['ETag']
+    assert client.get('/api/aliquotas/85171200?uf=SP', headers={'If-None-Match': etag}).status_code == 304
+    # Outra UF, outra representação
+    assert client.get('/api/aliquotas/85171200?uf=RJ', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_tax_rates_etag_follows_benefit_version(client, clean_versions):
+    etag = client.get('/api/aliquotas/85171200').headers['ETag']
+    benefit_engine.load_rules([{'kind': 'EX_TARIFARIO', 'ncm_prefix': '851712', 'tax_type': 'II',
+                                'rate': 0.0, 'ex': 1}])
+    response = client.get('/api/aliquotas/85171200', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_tax_rates_etag_follows_rate_store_version(client, clean_versions):
+    etag = client.get('/api/aliquotas/85171200').headers['ETag']
+    rate_store.add_versions('IPI', {'85171200': 0.1}, date(2020, 1, 1), source='teste')
+    response = client.get('/api/aliquotas/85171200', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_exchange_rate_conditional(client, fixed_rate):
+    first = client.get('/api/cotacao')
+    assert first.status_code == 200
+    assert first.get_json()['rate'] == 5.4321
+    assert first.last_modified == fixed_rate
+    etag = first.headers['ETag']
+    assert client.get('/api/cotacao', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/api/cotacao', headers={'If-Modified-Since': first.headers['Last-Modified']}).status_code == 304
+    assert client.get('/api/cotacao', headers={'If-Modified-Since': 'Mon, 02 Mar 2026 12:29:59 GMT'}).status_code == 200
+
+
+def test_exchange_rate_fallback_not_cached(client, monkeypatch):
+    monkeypatch.setattr(currency_service, 'get_usd_brl_rate', lambda: 5.0)
+    monkeypatch.setattr(currency_service, 'get_rate_timestamp', lambda: None)
+    response = client.get('/api/cotacao', headers={'If-None-Match': '*'})
+    assert response.status_code == 200
+    assert response.cache_control.no_cache
+    assert 'ETag' not in response.headers
@@ -0,0 +1,144 @@
+"""Estimativa de frete e seguro (FreightEstimator e /api/v1/freight/estimate)"""
+import json
+
+import pytest
+
+from services.freight_estimator import FreightEstimator
+
+
+@pytest.fixture
+def estimator():
+    return FreightEstimator()
+
+
+def _tariff(mode, origin):
+    return FreightEstimator.DEFAULT_TARIFFS[mode][origin]
+
+
+@pytest.mark.parametrize('mode, origin_country, origin', [
+    ('MARITIME', 'China', 'ASIA'),
+    ('MARITIME', 'Austrália', '*'),
+    ('AIR', 'Alemanha', 'EUROPE'),
+    ('AIR', 'Estados Unidos', 'NORTH_AMERICA'),
+    ('ROAD', 'Argentina', 'SOUTH_AMERICA')
+])
+def test_each_mode_applies_origin_tariff(estimator, mode, origin_country, origin):
+    tariff = _tariff(mode, origin)
+    fob, weight = 50_000.0, 4_000.0
+    result = estimator.estimate(mode, origin_country, fob, gross_weight_kg=weight)
+
+    freight = round(max(weight * tariff['per_kg'] + fob * tariff['ad_valorem'], tariff['minimum']), 2)
+    assert result['transport_mode'] == mode
+    assert result['tariff'] == {field: float(tariff[field]) for field in FreightEstimator.FIELDS}
+    assert result['chargeable_weight_kg'] == weight
+    assert result['freight_usd'] == freight
+    assert result['insurance_usd'] == round(max((fob + freight) * tariff['insurance_rate'],
+                                                tariff['insurance_minimum']), 2)
+
+
+def test_road_without_tariff_for_origin(estimator):
+    with pytest.raises(ValueError, match='Sem tarifa de frete ROAD'):
+        estimator.estimate('ROAD', 'China', 1_000.0, gross_weight_kg=100)
+
+
+@pytest.mark.parametrize('mode, weight, volume, chargeable', [
+    # Marítimo W/M: 2 m³ = 2.000 kg > 500 kg
+    ('MARITIME', 500.0, 2.0, 2_000.0),
+    # Marítimo: peso real maior que o volume convertido
+    ('MARITIME', 3_000.0, 2.0, 3_000.0),
+    # Aéreo IATA 1:6000 (167 kg/m³): 1,5 m³ = 250,5 kg > 100 kg
+    ('AIR', 100.0, 1.5, 250.5),
+    ('AIR', 400.0, 1.5, 400.0)
+])
+def test_chargeable_weight(estimator, mode, weight, volume, chargeable):
+    result = estimator.estimate(mode, 'China', 10_000.0, gross_weight_kg=weight, volume_m3=volume)
+    assert result['chargeable_weight_kg'] == pytest.approx(chargeable)
+    assert result['freight_usd'] == round(max(chargeable * _tariff(mode, 'ASIA')['per_kg'],
+                                              _tariff(mode, 'ASIA')['minimum']), 2)
+
+
+def test_minimum_freight_and_insurance(estimator):
+    tariff = _tariff('MARITIME', 'ASIA')
+    result = estimator.estimate('MARITIME', 'China', 100.0, gross_weight_kg=10)
+    assert result['freight_usd'] == tariff['minimum']
+    assert result['insurance_usd'] == tariff['insurance_minimum']
+
+
+def test_estimate_columns_matches_single_estimates(estimator):
+    rows = [('MARITIME', 'China', 8_000.0, 1_200.0, 3.0), ('AIR', 'Japão', 2_500.0, 40.0, 0.5),
+            ('ROAD', 'Uruguai', 30_000.0, 9_000.0, 20.0), ('MARITIME', 'China', 90.0, 5.0, 0.0)]
+    columns = estimator.estimate_columns(*zip(*rows))
+    for index, (mode, origin, fob, weight, volume) in enumerate(rows):
+        single = estimator.estimate(mode, origin, fob, weight, volume)
+        assert columns['freight_usd'][index] == single['freight_usd']
+        assert columns['insurance_usd'][index] == single['insurance_usd']
+
+
+@pytest.mark.parametrize('tariffs, message', [
+    ({'RAIL': {'*': _tariff('ROAD', 'SOUTH_AMERICA')}}, 'Modal de transporte inválido'),
+    ({'AIR': {'*': {'per_kg': 1.0}}}, 'valor inválido para kg_per_m3'),
+    ({'AIR': {'*': {**_tariff('AIR', '*'), 'minimum': -1}}}, 'minimum fora do intervalo'),
+    ({'AIR': {'*': {**_tariff('AIR', '*'), 'kg_per_m3': 0}}}, 'kg_per_m3 fora do intervalo')
+])
+def test_invalid_tariffs(tariffs, message):
+    with pytest.raises(ValueError, match=message):
+        FreightEstimator(tariffs)
+
+
+def test_from_file(tmp_path):
+    path = tmp_path / 'fretes.json'
+    path.write_text(json.dumps({'tariffs': {'AIR': {'CN': {**_tariff('AIR', '*'), 'per_kg': 7.0}}}}),
+                    encoding='utf-8')
+    estimator = FreightEstimator.from_file(str(path))
+    assert estimator.estimate('AIR', 'China', 1_000.0, gross_weight_kg=100)['freight_usd'] == 700.0
+    with pytest.raises(ValueError, match='Sem tarifa de frete MARITIME'):
+        estimator.estimate('MARITIME', 'China', 1_000.0)
+
+    path.write_text(json.dumps({'regions': {}}), encoding='utf-8')
+    with pytest.raises(ValueError, match='sem a chave tariffs'):
+        FreightEstimator.from_file(str(path))
+
+
+def _post(app, user, payload):
+    return app.test_client().post('/api/v1/freight/estimate', json=payload,
+                                  headers={'Authorization': f'Bearer {user.generate_api_token()}'})
+
+
+def test_api_estimate(app, user, estimator):
+    response = _post(app, user, {'transport_mode': 'AIR', 'origin_country': 'China', 'items': [
+        {'fob_usd': 2_000, 'gross_weight_kg': 100, 'volume_m3': 1.5},
+        {'fob_usd': 9_000, 'gross_weight_kg': 800, 'transport_mode': 'maritime', 'origin_country': 'Alemanha'}
+    ]})
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    expected = [estimator.estimate('AIR', 'China', 2_000, 100, 1.5),
+                estimator.estimate('MARITIME', 'Alemanha', 9_000, 800)]
+    assert [item['freight_usd'] for item in data['items']] == [item['freight_usd'] for item in expected]
+    assert [item['chargeable_weight_kg'] for item in data['items']] == [250.5, 800.0]
+    assert data['total_insurance_usd'] == round(sum(item['insurance_usd'] for item in expected), 2)
+
+
+@pytest.mark.parametrize('payload, message', [
+    ({}, 'items deve ser uma lista não vazia'),
+    ({'items': []}, 'items deve ser uma lista não vazia'),
+    ({'items': ['frete']}, 'objeto JSON'),
+    ({'items': [{'fob_usd': 100}], 'transport_mode': 'RAIL'}, 'Modal de transporte inválido'),
+    ({'items': [{'gross_weight_kg': 10}]}, 'fob_usd'),
+    ({'items': [{'fob_usd': -1}]}, 'fob_usd'),
+    ({'items': [{'fob_usd': 100, 'volume_m3': 'abc'}]}, 'volume_m3'),
+    ({'items': [{'fob_usd': 100, 'transport_mode': 'ROAD', 'origin_country': 'China'}]}, 'Sem tarifa de frete')
+])
+def test_api_validation_errors(app, user, payload, message):
+    response = _post(app, user, payload)
+    assert response.status_code == 400
+    body = response.get_json()
+    assert body['success'] is False
+    assert message in body['error']
+
+
+def test_api_item_limit(app, user, monkeypatch):
+    import api
+    monkeypatch.setattr(api, 'FREIGHT_MAX_ITEMS', 2)
+    response = _post(app, user, {'items': [{'fob_usd': 100}] * 3})
+    assert response.status_code == 400
+    assert 'Máximo de 2 itens' in response.get_json()['error']
@@ -0,0 +1,188 @@
+"""Fila de tarefas em segundo plano (JobQueue) sobre o SQLite dos testes"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, update
+
+from app import db
+from models import Job, JobResultChunk
+from services.job_queue import JobQueue
+
+
+class Failure(Exception):
+    pass
+
+
+@pytest.fixture
+def queue(app_context):
+    job_queue = JobQueue()
+
+    @job_queue.handler('echo')
+    def echo(job, payload):
+        return {'echo': payload}
+
+    @job_queue.handler('fail')
+    def fail(job, payload):
+        raise Failure('falha simulada')
+
+    @job_queue.handler('stream')
+    def stream(job, payload):
+        return (f'linha {number}\n'.encode('utf-8') for number in range(payload['lines'])), 'text/plain'
+
+    yield job_queue
+    JobResultChunk.query.delete()
+    Job.query.delete()
+    db.session.commit()
+
+
+def _make_due(job):
+    job.run_after = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+
+def test_enqueue_claim_complete(queue):
+    job = queue.enqueue('echo', {'a': 1}, max_attempts=2)
+    assert job.status == 'PENDING'
+
+    claimed = queue.claim('worker-1')
+    assert claimed.id == job.id
+    assert (claimed.status, claimed.locked_by, claimed.attempts) == ('RUNNING', 'worker-1', 1)
+    assert queue.claim('worker-2') is None
+
+    queue.run(claimed)
+    assert claimed.status == 'SUCCEEDED'
+    assert claimed.locked_by is None
+    assert claimed.progress == 1.0
+    assert claimed.result_content_type == 'application/json'
+    assert b''.join(queue.iter_result(claimed)) == b'{"echo": {"a": 1}}'
+    assert claimed.to_dict()['has_result']
+
+
+def test_unknown_kind_rejected(queue):
+    with pytest.raises(ValueError):
+        queue.enqueue('desconhecida', {})
+
+
+def test_claim_skips_job_taken_by_another_worker(queue):
+    """O UPDATE condicional ao status PENDING perde a corrida sem reservar a tarefa"""
+    job = queue.enqueue('echo', {})
+    session = db.session()
+    raced = []
+
+    def other_worker_wins(state):
+        if not state.is_select or raced:
+            return None
+        # Outro processo reserva a tarefa entre o SELECT e o UPDATE desta reserva
+        result = state.invoke_statement().freeze()
+        state.session.connection().execute(
+            update(Job.__table__).where(Job.__table__.c.id == job.id).values(status='RUNNING', locked_by='outro'))
+        raced.append(True)
+        return result()
+
+    event.listen(session, 'do_orm_execute', other_worker_wins)
+    try:
+        assert queue.claim('worker-1') is None
+    finally:
+        event.remove(session, 'do_orm_execute', other_worker_wins)
+    db.session.refresh(job)
+    assert (job.status, job.locked_by, job.attempts) == ('RUNNING', 'outro', 0)
+
+
+def test_retry_with_backoff(queue):
+    job = queue.enqueue('fail', {}, max_attempts=3)
+
+    queue.run(queue.claim('worker-1'))
+    assert job.status == 'PENDING'
+    assert job.error == 'falha simulada'
+    delay = (job.run_after - datetime.utcnow()).total_seconds()
+    assert queue.RETRY_DELAY - 5 < delay <= queue.RETRY_DELAY
+    # Reagendada: ainda não pode ser reservada
+    assert queue.claim('worker-1') is None
+
+    _make_due(job)
+    queue.run(queue.claim('worker-1'))
+    assert job.attempts == 2
+    delay = (job.run_after - datetime.utcnow()).total_seconds()
+    assert 2 * queue.RETRY_DELAY - 5 < delay <= 2 * queue.RETRY_DELAY
+
+
+def test_max_attempts_exhausted(queue):
+    job = queue.enqueue('fail', {}, max_attempts=2)
+    queue.run(queue.claim('worker-1'))
+    _make_due(job)
+    queue.run(queue.claim('worker-1'))
+    assert job.status == 'FAILED'
+    assert job.attempts == 2
+    assert job.finished_at is not None
+    assert job.error == 'falha simulada'
+    _make_due(job)
+    assert queue.claim('worker-1') is None
+
+
+def test_stale_lease_requeued(queue):
+    retried = queue.enqueue('echo', {}, max_attempts=2)
+    exhausted = queue.enqueue('echo', {}, max_attempts=1)
+    for _ in range(2):
+        queue.claim('worker-morto')
+    fresh = queue.enqueue('echo', {})
+    queue.claim('worker-vivo')
+
+    stale_at = datetime.utcnow() - timedelta(seconds=queue.LOCK_TIMEOUT + 1)
+    Job.query.filter(Job.id.in_([retried.id, exhausted.id])).update({'locked_at': stale_at},
+                                                                    synchronize_session=False)
+    db.session.commit()
+
+    assert queue.requeue_stale() == 2
+    for job in (retried, exhausted, fresh):
+        db.session.refresh(job)
+    assert (retried.status, retried.locked_by) == ('PENDING', None)
+    assert exhausted.status == 'FAILED'
+    assert fresh.status == 'RUNNING'
+
+    reclaimed = queue.claim('worker-1')
+    assert reclaimed.id == retried.id
+    assert reclaimed.attempts == 2
+
+
+def test_streamed_result_stored_in_chunks(queue):
+    queue.RESULT_CHUNK_SIZE = 64
+    job = queue.enqueue('stream', {'lines': 100})
+    queue.run(queue.claim('worker-1'))
+
+    expected = ''.join(f'linha {number}\n' for number in range(100)).encode('utf-8')
+    assert job.status == 'SUCCEEDED'
+    assert job.result is None
+    assert job.result_size == len(expected)
+    assert job.result_content_type == 'text/plain'
+    chunks = JobResultChunk.query.filter_by(job_id=job.id).order_by(JobResultChunk.position).all()
+    assert len(chunks) > 1
+    assert all(len(chunk.data) >= queue.RESULT_CHUNK_SIZE for chunk in chunks[:-1])
+    assert b''.join(queue.iter_result(job)) == expected
+
+
+def test_export_job_result_streamed(app, user, make_calculation):
+    from api import job_queue
+    from routes import export_calculations
+
+    calculations = [make_calculation(product_name=f'Produto {number}') for number in range(3)]
+    headers = {'Authorization': f'Bearer {user.generate_api_token()}'}
+    client = app.test_client()
+    try:
+        response = client.post('/api/v1/jobs', json={'kind': 'export_calculations', 'payload': {'format': 'ndjson'}},
+                               headers=headers)
+        assert response.status_code == 202
+        job_id = response.get_json()['data']['id']
+        assert job_queue.work(worker_id='worker-1', once=True) == 1
+
+        job = db.session.get(Job, job_id)
+        assert job.status == 'SUCCEEDED'
+        assert job.result is None
+        result = client.get(f'/api/v1/jobs/{job_id}/result', headers=headers)
+        assert result.status_code == 200
+        assert result.mimetype == 'application/x-ndjson'
+        assert result.data == b''.join(export_calculations(user.id, 'ndjson'))
+        assert result.data.count(b'\n') == len(calculations)
+    finally:
+        JobResultChunk.query.delete()
+        Job.query.delete()
+        db.session.commit()
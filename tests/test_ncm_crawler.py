@@ -0,0 +1,166 @@
+"""Coleta de páginas de NCM (NcmCrawler) contra um servidor HTTP local"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from services.ncm_crawler import NcmCrawler
+
+LAST_MODIFIED = 'Tue, 01 Apr 2025 12:00:00 GMT'
+
+
+class FixtureServer(ThreadingHTTPServer):
+    """
+    Páginas /etag/<código> (ETag) e /lm/<código> (só Last-Modified), com
+    respostas condicionais 304; /limited responde 429 com Retry-After na
+    primeira requisição. Caminhos em `failing` respondem 503.
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FixtureHandler)
+        self.lock = threading.Lock()
+        self.requests = []
+        self.failing = set()
+        self.limited_served = False
+
+    def url(self, path):
+        return f'http://127.0.0.1:{self.server_address[1]}{path}'
+
+    def paths(self):
+        with self.lock:
+            return [path for path, _, _ in self.requests]
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, dict(self.headers), time.monotonic()))
+        if self.path in server.failing:
+            return self._send(503, b'')
+        if self.path == '/limited':
+            with server.lock:
+                first, server.limited_served = not server.limited_served, True
+            if first:
+                return self._send(429, b'', {'Retry-After': '0.3'})
+            return self._send(200, b'liberado')
+
+        body = f'<html><body><p>NCM {self.path.rsplit("/", 1)[-1]}</p></body></html>'.encode()
+        if self.path.startswith('/etag/'):
+            etag = f'"v1-{self.path.rsplit("/", 1)[-1]}"'
+            if self.headers.get('If-None-Match') == etag:
+                return self._send(304, None, {'ETag': etag})
+            return self._send(200, body, {'ETag': etag})
+        if self.path.startswith('/lm/'):
+            if self.headers.get('If-Modified-Since') == LAST_MODIFIED:
+                return self._send(304, None, {'Last-Modified': LAST_MODIFIED})
+            return self._send(200, body, {'Last-Modified': LAST_MODIFIED})
+        self._send(404, b'')
+
+    def _send(self, status, body, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if body is not None:
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    fixture_server = FixtureServer()
+    thread = threading.Thread(target=fixture_server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield fixture_server
+    fixture_server.shutdown()
+    fixture_server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(NcmCrawler, 'RETRY_DELAY', 0.01)
+
+
+def test_rate_limit_per_host(server, tmp_path):
+    crawler = NcmCrawler(str(tmp_path), max_workers=4, requests_per_second=20)
+    results = crawler.crawl([server.url(f'/etag/{code}') for code in range(8)])
+    assert [result.status for result in results] == [200] * 8
+    times = sorted(moment for _, _, moment in server.requests)
+    # 8 requisições a 20/s: ao menos 7 intervalos de 50 ms, mesmo com 4 threads
+    assert times[-1] - times[0] >= 7 * 0.05 * 0.9
+    assert min(later - earlier for earlier, later in zip(times, times[1:])) >= 0.05 * 0.5
+
+
+def test_retry_after_delays_host(server, tmp_path):
+    crawler = NcmCrawler(str(tmp_path), max_workers=1, requests_per_second=0)
+    result = crawler.fetch(server.url('/limited'))
+    assert (result.status, result.body, result.error) == (200, b'liberado', None)
+    (_, _, first), (_, _, second) = server.requests
+    assert second - first >= 0.3 * 0.9
+
+
+@pytest.mark.parametrize('prefix, header', [('/etag/', 'If-None-Match'), ('/lm/', 'If-Modified-Since')])
+def test_conditional_get_uses_cache_on_304(server, tmp_path, prefix, header):
+    crawler = NcmCrawler(str(tmp_path), requests_per_second=0)
+    url = server.url(f'{prefix}85171200')
+    first = crawler.fetch(url)
+    assert (first.status, first.from_cache) == (200, False)
+
+    second = crawler.fetch(url)
+    assert (second.status, second.from_cache, second.body) == (200, True, first.body)
+    path, headers, _ = server.requests[-1]
+    assert header in headers
+
+
+def test_checkpoint_skips_requests(server, tmp_path):
+    urls = [server.url(f'/etag/{code}') for code in range(5)]
+    crawler = NcmCrawler(str(tmp_path), requests_per_second=0)
+    first = crawler.crawl(urls, checkpoint='teste', parse=lambda url, body: body.decode())
+    assert len(server.requests) == 5
+
+    second = crawler.crawl(urls, checkpoint='teste', parse=lambda url, body: body.decode())
+    assert len(server.requests) == 5
+    assert all(result.from_cache for result in second)
+    assert [result.data for result in second] == [result.data for result in first]
+
+
+def test_errors_are_retried_on_resume(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(NcmCrawler, 'MAX_ATTEMPTS', 1)
+    urls = [server.url(f'/etag/{code}') for code in range(4)]
+    server.failing = {'/etag/1', '/etag/3'}
+    crawler = NcmCrawler(str(tmp_path), requests_per_second=0)
+    results = crawler.crawl(urls, checkpoint='teste')
+    assert [result.error for result in results] == [None, 'HTTP 503', None, 'HTTP 503']
+
+    server.failing = set()
+    del server.requests[:]
+    results = crawler.crawl(urls, checkpoint='teste')
+    assert [result.error for result in results] == [None] * 4
+    assert sorted(server.paths()) == ['/etag/1', '/etag/3']
+
+
+def test_resume_after_interrupted_crawl(server, tmp_path):
+    urls = [server.url(f'/lm/{code}') for code in range(6)]
+    crawler = NcmCrawler(str(tmp_path), max_workers=1, requests_per_second=0)
+
+    def interrupt(completed, total):
+        if completed == 2:
+            raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        crawler.crawl(urls, checkpoint='teste', progress=interrupt)
+    assert len(crawler.load_checkpoint('teste')) == 2
+
+    # Retomada: as concluídas vêm do checkpoint, sem requisição; as demais são requisitadas
+    del server.requests[:]
+    results = NcmCrawler(str(tmp_path), requests_per_second=0).crawl(urls, checkpoint='teste')
+    assert [result.status for result in results] == [200] * 6
+    assert len(server.requests) == 4
+    assert crawler.load_checkpoint('teste') == set(urls)
@@ -0,0 +1,83 @@
+"""Sincronização da tabela oficial de NCM (NcmIngestion) com arquivos locais"""
+import os
+from datetime import date
+
+import pytest
+
+from app import db
+from models import NcmEntry, SystemConfig, TaxRateVersion
+from services.ncm_ingestion import NcmIngestion
+from services.rate_store import RateStore
+from services.tax_calculator import BrazilianTaxCalculator
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'ncm')
+NOMENCLATURE = os.path.join(FIXTURES, 'nomenclatura.json')
+TEC = os.path.join(FIXTURES, 'tec.csv')
+TIPI = os.path.join(FIXTURES, 'tipi.csv')
+
+
+@pytest.fixture
+def ingestion(app_context):
+    yield NcmIngestion()
+    for model in (NcmEntry, TaxRateVersion, SystemConfig):
+        model.query.delete()
+    db.session.commit()
+
+
+def _read(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def test_parse_nomenclature():
+    descriptions = NcmIngestion().parse_nomenclature(_read(NOMENCLATURE))
+    assert descriptions == {
+        '85171200': 'Telefones inteligentes e outros telefones para redes celulares',
+        '85176241': 'Roteadores digitais',
+        '85176299': 'Aparelhos para recepção, conversão e transmissão de voz, imagens ou outros dados - Outros',
+        '62034200': 'De algodão'
+    }
+
+
+def test_parse_rates_csv():
+    ingestion = NcmIngestion()
+    assert ingestion.parse_rates_csv(_read(TEC), ('TEC', 'II')) == {
+        '85171200': 0.16, '85176241': 0.14, '85176299': 0.16, '62034200': 0.35, '99999999': 0.10}
+    assert ingestion.parse_rates_csv(_read(TIPI), ('IPI', 'ALÍQUOTA', 'ALIQUOTA')) == {
+        '85171200': 0.0975, '85176241': 0.15, '85176299': 0.15, '62034200': 0.0}
+
+
+def test_sync_writes_catalogue_and_rate_versions(ingestion):
+    rate_store = RateStore()
+    summary = ingestion.sync(NOMENCLATURE, tec=TEC, tipi=TIPI, rate_store=rate_store, valid_from=date(2025, 4, 1))
+    assert (summary['codes'], summary['added'], summary['changed'], summary['removed']) == (4, 4, 0, 0)
+    # Código da TEC fora da nomenclatura não vira versão
+    assert summary['rate_versions'] == {'II': 4, 'IPI': 4}
+    assert db.session.get(NcmEntry, '85176241').ii_rate == 0.14
+
+    # As alíquotas ingeridas são as usadas no cálculo a partir da vigência
+    calculator = BrazilianTaxCalculator(rate_store=rate_store)
+    rates = calculator.get_tax_rates('85171200', date(2025, 5, 1))
+    assert (rates['II'], rates['IPI']) == (0.16, 0.0975)
+    assert calculator.get_tax_rates('62034200', date(2025, 5, 1))['IPI'] == 0.0
+    assert calculator.get_tax_rates('85171200', date(2025, 3, 31))['IPI'] == 0.15
+
+    # Nova sincronização sem mudanças: nada é regravado
+    summary = ingestion.sync(NOMENCLATURE, tec=TEC, tipi=TIPI, rate_store=rate_store, valid_from=date(2025, 6, 1))
+    assert (summary['added'], summary['changed'], summary['rate_versions']) == (0, 0, {'II': 0, 'IPI': 0})
+    assert TaxRateVersion.query.count() == 8
+
+
+def test_sync_dry_run(ingestion):
+    summary = ingestion.sync(NOMENCLATURE, tec=TEC, dry_run=True, rate_store=RateStore())
+    assert summary['added'] == 4 and summary['rate_versions'] == {}
+    assert NcmEntry.query.count() == 0
+    assert TaxRateVersion.query.count() == 0
+
+
+def test_sync_cli(app, ingestion):
+    result = app.test_cli_runner().invoke(args=[
+        'sync-ncm', '--nomenclature', NOMENCLATURE, '--tec', TEC, '--valid-from', '2025-04-01'])
+    assert result.exit_code == 0, result.output
+    assert '4 alíquota(s) de II gravada(s)' in result.output
+    assert TaxRateVersion.query.filter_by(tax_type='IPI').count() == 0
@@ -0,0 +1,161 @@
+"""
+UF de destino e contexto da operação (origem, ex-tarifário e regime) na grade
+"e se", na simulação de risco, na reprecificação e nas alíquotas da prévia
+"""
+from datetime import date
+
+import pytest
+
+from app import db
+from models import ProductScenario, SystemConfig, TaxBenefit, TradePreference
+from routes import benefit_engine, currency_service, tax_calculator, trade_agreements
+from services.risk_simulation import RiskSimulation
+from services.scenario_repricing import ScenarioRepricer
+from services.tax_calculator import BenefitContext
+
+CONTEXT = BenefitContext.build('Argentina')
+BENEFIT_CONTEXT = BenefitContext.build('China', 1, 'ZFM')
+
+
+@pytest.fixture
+def mercosul(app_context):
+    trade_agreements.load(trade_agreements.default_preferences(), replace=True)
+    yield
+    TradePreference.query.delete()
+    SystemConfig.query.filter_by(key=trade_agreements.VERSION_KEY).delete()
+    db.session.commit()
+    trade_agreements._index = None
+
+
+@pytest.fixture
+def benefits(app_context):
+    benefit_engine.load_rules([
+        {'kind': 'EX_TARIFARIO', 'ncm_prefix': '851712', 'tax_type': 'II', 'rate': 0.0, 'ex': 1},
+        {'kind': 'REGIME', 'ncm_prefix': '8517', 'tax_type': 'ICMS', 'rate': 0.07, 'regime': 'ZFM'}
+    ], replace=True)
+    yield
+    TaxBenefit.query.delete()
+    SystemConfig.query.filter_by(key=benefit_engine.VERSION_KEY).delete()
+    db.session.commit()
+    benefit_engine._index = None
+
+
+@pytest.fixture
+def scenario(user):
+    record = ProductScenario(user_id=user.id, name='Smartphone', ncm_code='85171200', unit_value_usd=120.0,
+                             origin_country='Argentina', transport_mode='ROAD', exchange_rate=5.0,
+                             default_quantity=100, freight_cost=500.0, insurance_cost=50.0,
+                             destination_state='RJ')
+    db.session.add(record)
+    db.session.commit()
+    return record
+
+
+@pytest.fixture
+def benefit_scenario(user):
+    record = ProductScenario(user_id=user.id, name='Smartphone ZFM', ncm_code='85171200', unit_value_usd=120.0,
+                             origin_country='China', transport_mode='MARITIME', exchange_rate=5.0,
+                             default_quantity=100, freight_cost=500.0, insurance_cost=50.0,
+                             destination_state='AM', ex=1, customs_regime='ZFM')
+    db.session.add(record)
+    db.session.commit()
+    yield record
+    db.session.delete(record)
+    db.session.commit()
+
+
+def _expected_total_cost(quantity=100, exchange_rate=5.0):
+    return tax_calculator.calculate_all_taxes(120.0, quantity, '85171200', 500.0, 50.0, exchange_rate,
+                                              destination_state='RJ', context=CONTEXT)['summary']['total_cost']
+
+
+def test_sweep_applies_origin_and_state(app, user, scenario, mercosul):
+    response = app.test_client().post(f'/api/v1/scenarios/{scenario.id}/sweep', json={},
+                                      headers={'Authorization': f'Bearer {user.generate_api_token()}'})
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    assert data['rates']['II'] == 0
+    assert data['rates']['ICMS'] == tax_calculator.icms_matrix.internal_rate('85171200', 'RJ')
+    assert data['trade_preference']['country_code'] == 'AR'
+    assert data['total_cost'] == [pytest.approx(_expected_total_cost(), abs=0.01)]
+
+
+def test_risk_simulation_applies_origin_and_state(app, mercosul):
+    history = [5.0 + 0.01 * (day % 7) for day in range(60)]
+    result = RiskSimulation(tax_calculator).run(
+        120.0, 100, '85171200', 500.0, 50.0, 5.0, history, draws=100, seed=1,
+        destination_state='RJ', context=CONTEXT)
+    assert result['base_total_cost'] == _expected_total_cost()
+
+
+def test_repricer_applies_origin_and_state(app, user, scenario, mercosul):
+    result = ScenarioRepricer(tax_calculator, currency_service).reprice(date.today(), user_id=user.id)
+    assert result['items'][0]['total_cost_after'] == round(_expected_total_cost(), 2)
+
+
+def test_tax_rates_api_applies_origin(client, mercosul):
+    data = client.get('/api/aliquotas/85171200?uf=RJ&origem=Argentina').get_json()['data']
+    assert data['origin_country'] == 'AR'
+    assert data['rates'] == tax_calculator.get_tax_rates('85171200', date.today(), 'RJ', CONTEXT)
+    assert data['rates']['II'] == 0
+
+
+def _expected_benefit_total_cost():
+    return tax_calculator.calculate_all_taxes(120.0, 100, '85171200', 500.0, 50.0, 5.0, destination_state='AM',
+                                              context=BENEFIT_CONTEXT)['summary']['total_cost']
+
+
+def test_sweep_applies_ex_and_regime(app, user, benefit_scenario, benefits):
+    response = app.test_client().post(f'/api/v1/scenarios/{benefit_scenario.id}/sweep', json={},
+                                      headers={'Authorization': f'Bearer {user.generate_api_token()}'})
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    assert data['rates']['II'] == 0
+    assert data['rates']['ICMS'] == 0.07
+    assert data['total_cost'] == [pytest.approx(_expected_benefit_total_cost(), abs=0.01)]
+
+
+def test_repricer_applies_ex_and_regime(app, user, benefit_scenario, benefits):
+    result = ScenarioRepricer(tax_calculator, currency_service).reprice(date.today(), user_id=user.id)
+    item = next(item for item in result['items'] if item['scenario_id'] == benefit_scenario.id)
+    assert item['total_cost_after'] == round(_expected_benefit_total_cost(), 2)
+
+
+def test_tax_rates_api_applies_ex_and_regime(client, benefits):
+    data = client.get('/api/aliquotas/85171200?uf=AM&origem=China&ex=1&regime=zfm').get_json()['data']
+    assert data['rates'] == tax_calculator.get_tax_rates('85171200', date.today(), 'AM', BENEFIT_CONTEXT)
+    assert data['rates']['ICMS'] == 0.07
+    assert 'ICMS_FACTOR' not in data['rates']
+    assert {benefit['tax_type'] for benefit in data['benefits']} == {'II', 'ICMS'}
+
+
+@pytest.mark.parametrize('query', ['ex=0', 'ex=1.5', 'regime=XYZ'])
+def test_tax_rates_api_rejects_invalid_context(client, query):
+    response = client.get(f'/api/aliquotas/85171200?{query}')
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+
+@pytest.fixture
+def chile(app_context):
+    """Preferência parcial do Chile (40%) para o capítulo 85"""
+    trade_agreements.load([{'agreement': 'ACE-35 Mercosul-Chile', 'country_code': 'CL', 'ncm_prefix': '85',
+                            'margin': 0.4}], replace=True)
+    yield
+    TradePreference.query.delete()
+    SystemConfig.query.filter_by(key=trade_agreements.VERSION_KEY).delete()
+    db.session.commit()
+    trade_agreements._index = None
+
+
+@pytest.mark.parametrize('benefit_ii, expected_ii', [(0.10, 0.16 * 0.6), (0.02, 0.02)])
+def test_benefit_and_preference_do_not_stack(benefits, chile, benefit_ii, expected_ii):
+    """A preferência reduz o II da TEC (16%); com o ex-tarifário do II, vale a menor alíquota"""
+    benefit_engine.load_rules([
+        {'kind': 'EX_TARIFARIO', 'ncm_prefix': '851712', 'tax_type': 'II', 'rate': benefit_ii, 'ex': 1}
+    ], replace=True)
+    assert tax_calculator.get_tax_rates('85171200', context=BenefitContext.build('Chile'))['II'] == \
+        pytest.approx(0.16 * 0.6)
+    assert tax_calculator.get_tax_rates('85171200', context=BenefitContext.build('Chile', 1))['II'] == \
+        pytest.approx(expected_ii)
@@ -0,0 +1,84 @@
+"""SchemaMigrator: colunas novas, backfill de tax_breakdown e visão tax_details_compat"""
+import pytest
+from sqlalchemy import inspect, text
+
+from app import db
+from models import Calculation, TaxDetail
+from services.schema_migrations import SchemaMigrator
+
+TAX_FIELDS = ('tax_type', 'rate', 'base_value', 'amount')
+
+
+def _make_legacy(calculation):
+    """Cálculo anterior à coluna tax_breakdown: só as linhas de tax_details"""
+    Calculation.query.filter_by(id=calculation.id).update(
+        {'tax_breakdown': None, 'updated_at': calculation.updated_at}, synchronize_session=False)
+    db.session.commit()
+    db.session.refresh(calculation)
+    assert calculation.tax_breakdown is None
+
+
+def _view_rows(calculation_id):
+    rows = db.session.execute(text(
+        f'SELECT tax_type, rate, base_value, amount FROM {SchemaMigrator.TAX_DETAILS_VIEW} '
+        'WHERE calculation_id = :calculation_id'), {'calculation_id': calculation_id})
+    return sorted(tuple(row) for row in rows)
+
+
+def _tax_detail_rows(calculation_id):
+    return sorted(tuple(getattr(tax, field) for field in TAX_FIELDS)
+                  for tax in TaxDetail.query.filter_by(calculation_id=calculation_id))
+
+
+def test_migrate_backfills_old_calculations(make_calculation):
+    calculation = make_calculation()
+    expected = calculation.tax_breakdown
+    updated_at = calculation.updated_at
+    _make_legacy(calculation)
+
+    summary = SchemaMigrator().migrate()
+    assert summary['tax_breakdowns'] >= 1
+    db.session.refresh(calculation)
+    assert calculation.tax_breakdown == expected
+    # updated_at preservado: a exportação incremental não reexporta o histórico
+    assert calculation.updated_at == updated_at
+
+    # Idempotente
+    assert SchemaMigrator().migrate()['tax_breakdowns'] == 0
+
+
+def test_migrate_adds_missing_columns(app_context):
+    with db.engine.begin() as connection:
+        connection.execute(text('ALTER TABLE product_scenarios DROP COLUMN customs_regime'))
+    summary = SchemaMigrator().migrate()
+    assert 'product_scenarios.customs_regime' in summary['columns']
+    columns = {column['name'] for column in inspect(db.engine).get_columns('product_scenarios')}
+    assert 'customs_regime' in columns
+
+
+def test_tax_detail_rows_disabled(app, make_calculation, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'TAX_DETAIL_ROWS', False)
+    calculation = make_calculation()
+    assert TaxDetail.query.filter_by(calculation_id=calculation.id).count() == 0
+    assert set(calculation.tax_breakdown) == {'II', 'IPI', 'PIS', 'COFINS', 'ICMS'}
+    assert calculation.get_tax_breakdown() == calculation.tax_breakdown
+
+    response = client.get(f'/resultados/{calculation.id}')
+    assert response.status_code == 200
+
+
+def test_compat_view_matches_tax_details(app, make_calculation, monkeypatch):
+    with_rows = make_calculation()
+    legacy = make_calculation()
+    _make_legacy(legacy)
+    monkeypatch.setitem(app.config, 'TAX_DETAIL_ROWS', False)
+    without_rows = make_calculation()
+    SchemaMigrator().create_tax_details_view()
+
+    # Cálculo com linhas: a visão devolve as próprias linhas de tax_details, sem duplicar pelo tax_breakdown
+    assert _view_rows(with_rows.id) == _tax_detail_rows(with_rows.id)
+    assert len(_view_rows(with_rows.id)) == 5
+    # Cálculo antigo, ainda sem tax_breakdown
+    assert _view_rows(legacy.id) == _tax_detail_rows(legacy.id)
+    # Cálculo sem linhas (TAX_DETAIL_ROWS desligado): mesmas linhas que a leitura antiga teria
+    assert _view_rows(without_rows.id) == pytest.approx(_tax_detail_rows(with_rows.id))
@@ -0,0 +1,191 @@
+"""Custeio de remessas (ShipmentCosting, allocate) e /api/v1/shipments"""
+import pytest
+
+from app import db
+from models import Shipment
+from services.shipment_costing import ShipmentCosting, allocate
+from services.tax_calculator import BenefitContext, BrazilianTaxCalculator
+
+LINES = [
+    {'ncm_code': '85171200', 'unit_value_usd': 120.0, 'quantity': 100, 'gross_weight_kg': 35.0},
+    {'ncm_code': '62034200', 'unit_value_usd': 18.75, 'quantity': 333, 'gross_weight_kg': 120.5},
+    {'ncm_code': '85171200', 'unit_value_usd': 7.3, 'quantity': 7, 'gross_weight_kg': 0.8, 'ex': 1}
+]
+
+
+@pytest.mark.parametrize('total, weights', [
+    (1000.0, [1, 1, 1]),
+    (18_450.37, [3.2, 0.0, 7.7, 1.1, 9.9]),
+    (0.05, [1, 1, 1, 1, 1, 1, 1]),
+    (1203.11, [120.0 * 100, 18.75 * 333, 7.3 * 7])
+])
+def test_allocate_sums_exactly_to_total(total, weights):
+    shares = allocate(total, weights)
+    assert len(shares) == len(weights)
+    assert sum(round(share * 100) for share in shares) == round(total * 100)
+    assert all(round(share * 100) == share * 100 for share in shares)
+
+
+def test_allocate_largest_remainder():
+    # 100 / 3 = 33,333...: o centavo que sobra vai à primeira linha (empate)
+    assert allocate(100.0, [1, 1, 1]) == [33.34, 33.33, 33.33]
+    # 10 centavos em 1:2:4 = 1,43 / 2,86 / 5,71: truncados somam 8; as duas sobras vão aos restos 0,86 e 0,71
+    assert allocate(0.1, [1, 2, 4]) == [0.01, 0.03, 0.06]
+    # Decimais pedidos: 1 décimo em três partes iguais
+    assert allocate(0.1, [1, 1, 1], decimals=1) == [0.1, 0.0, 0.0]
+
+
+def test_allocate_zero_weights_split_equally():
+    assert allocate(10.0, [0, 0, 0, 0]) == [2.5, 2.5, 2.5, 2.5]
+    assert allocate(0.1, [0, 0, 0]) == [0.04, 0.03, 0.03]
+
+
+def test_allocate_single_line_and_empty():
+    assert allocate(987.654, [3.0]) == [987.65]
+    assert allocate(987.654, [0]) == [987.65]
+    assert allocate(100.0, []) == []
+
+
+@pytest.fixture(scope='module')
+def calculator():
+    return BrazilianTaxCalculator()
+
+
+@pytest.mark.parametrize('basis', ShipmentCosting.ALLOCATION_BASES)
+def test_price_lines_match_calculate_all_taxes(calculator, basis):
+    result = ShipmentCosting(calculator).price(
+        LINES, exchange_rate=5.25, freight_usd=1_845.37, insurance_usd=120.31, fees_brl=987.65, basis=basis,
+        origin_country='China', destination_state='RJ')
+    columns = result['lines']
+    assert result['allocation_basis'] == basis
+    assert result['freight_estimate'] is None
+    for column, total in (('freight_usd', 1_845.37), ('insurance_usd', 120.31), ('fees_brl', 987.65)):
+        assert round(sum(columns[column]) * 100) == round(total * 100), column
+
+    for index, line in enumerate(LINES):
+        expected = calculator.calculate_all_taxes(
+            line['unit_value_usd'], line['quantity'], line['ncm_code'], columns['freight_usd'][index],
+            columns['insurance_usd'][index], 5.25, destination_state='RJ',
+            context=BenefitContext.build('China', line.get('ex'))
+        )
+        assert columns['II'][index] == pytest.approx(expected['taxes']['II']['amount'])
+        assert columns['total_cost'][index] == pytest.approx(expected['summary']['total_cost'])
+        landed_cost = expected['summary']['total_cost'] + columns['fees_brl'][index]
+        assert columns['landed_cost'][index] == pytest.approx(landed_cost)
+        assert columns['unit_landed_cost'][index] == pytest.approx(landed_cost / line['quantity'])
+
+    totals = result['totals']
+    assert totals['lines'] == len(LINES)
+    assert totals['landed_cost'] == round(sum(columns['landed_cost']), 2)
+
+
+def test_price_allocation_bases(calculator):
+    costing = ShipmentCosting(calculator)
+    by_weight = costing.price(LINES, 5.0, freight_usd=1000.0, insurance_usd=0, basis='weight')['lines']
+    assert by_weight['freight_usd'] == allocate(1000.0, [line['gross_weight_kg'] for line in LINES])
+    by_quantity = costing.price(LINES, 5.0, freight_usd=1000.0, insurance_usd=0, basis='QUANTITY')['lines']
+    assert by_quantity['freight_usd'] == allocate(1000.0, [line['quantity'] for line in LINES])
+
+    with pytest.raises(ValueError, match='gross_weight_kg'):
+        costing.price([{**LINES[0], 'gross_weight_kg': None}], 5.0, freight_usd=10.0, basis='WEIGHT')
+    with pytest.raises(ValueError, match='Base de rateio inválida'):
+        costing.price(LINES, 5.0, freight_usd=10.0, basis='VOLUME')
+    with pytest.raises(ValueError, match='ao menos uma linha'):
+        costing.price([], 5.0)
+
+
+def test_price_estimates_missing_freight(calculator):
+    costing = ShipmentCosting(calculator)
+    result = costing.price(LINES, 5.0, transport_mode='AIR', origin_country='China', volume_m3=1.2)
+    fob = sum(line['unit_value_usd'] * line['quantity'] for line in LINES)
+    weight = sum(line['gross_weight_kg'] for line in LINES)
+    estimate = costing.freight_estimator.estimate('AIR', 'China', fob, weight, 1.2)
+    assert result['freight_estimate'] == estimate
+    assert result['totals']['freight_usd'] == estimate['freight_usd']
+    assert result['totals']['insurance_usd'] == estimate['insurance_usd']
+
+    # Sem peso nem volume: frete e seguro zerados
+    no_cargo = [{key: value for key, value in line.items() if key != 'gross_weight_kg'} for line in LINES]
+    result = costing.price(no_cargo, 5.0)
+    assert (result['freight_estimate'], result['totals']['freight_usd']) == (None, 0.0)
+
+
+@pytest.fixture
+def shipments(user):
+    yield
+    for shipment in Shipment.query.filter_by(user_id=user.id):
+        db.session.delete(shipment)
+    db.session.commit()
+
+
+def _headers(user):
+    return {'Authorization': f'Bearer {user.generate_api_token()}'}
+
+
+def _payload(**fields):
+    return {
+        'reference': 'PO-123', 'origin_country': 'China', 'transport_mode': 'MARITIME', 'destination_state': 'sp',
+        'exchange_rate': 5.25, 'allocation_basis': 'weight', 'freight_usd': 1_845.37, 'insurance_usd': 120.31,
+        'clearance_fees_brl': 600.0, 'broker_fees_brl': 387.65,
+        'items': [{'product_name': f'Linha {index}', **line} for index, line in enumerate(LINES, start=1)],
+        **fields
+    }
+
+
+def test_api_quote_matches_costing(app, user):
+    response = app.test_client().post('/api/v1/shipments/quote', json=_payload(), headers=_headers(user))
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    assert (data['destination_state'], data['allocation_basis']) == ('SP', 'WEIGHT')
+
+    from routes import tax_calculator
+    expected = ShipmentCosting(tax_calculator).price(
+        LINES, 5.25, 1_845.37, 120.31, 987.65, 'WEIGHT', origin_country='China', destination_state='SP')
+    assert data['totals'] == expected['totals']
+    assert [item['total_cost_brl'] for item in data['items']] == \
+        [round(value, 2) for value in expected['lines']['landed_cost']]
+    assert [item['ex'] for item in data['items']] == [None, None, 1]
+    assert Shipment.query.filter_by(user_id=user.id).count() == 0
+
+
+def test_api_create_list_and_get(app, user, shipments):
+    client = app.test_client()
+    response = client.post('/api/v1/shipments', json=_payload(), headers=_headers(user))
+    assert response.status_code == 201
+    created = response.get_json()['data']
+    assert created['reference'] == 'PO-123'
+    assert created['total_cost_brl'] == created['totals']['landed_cost']
+    assert created['freight_usd'] == 1_845.37
+
+    listed = client.get('/api/v1/shipments', headers=_headers(user)).get_json()['data']
+    assert created['id'] in [shipment['id'] for shipment in listed]
+
+    response = client.get(f"/api/v1/shipments/{created['id']}", headers=_headers(user))
+    assert response.status_code == 200
+    items = response.get_json()['data']['items']
+    assert [item['line'] for item in items] == [1, 2, 3]
+    assert round(sum(item['freight_usd'] for item in items) * 100) == 184_537
+    assert round(sum(item['fees_brl'] for item in items) * 100) == 98_765
+    assert sum(item['total_cost_brl'] for item in items) == pytest.approx(created['total_cost_brl'], abs=0.02)
+
+    assert client.get('/api/v1/shipments/inexistente', headers=_headers(user)).status_code == 404
+
+
+@pytest.mark.parametrize('fields, message', [
+    ({'items': []}, 'items deve ser uma lista não vazia'),
+    ({'items': ['linha']}, 'objeto JSON'),
+    ({'items': [{'unit_value_usd': 10, 'quantity': 1}]}, 'ncm_code'),
+    ({'items': [{'ncm_code': '85171200', 'unit_value_usd': 10, 'quantity': 0}]}, 'quantity'),
+    ({'allocation_basis': 'VOLUME'}, 'Base de rateio inválida'),
+    ({'transport_mode': 'RAIL'}, 'Modal de transporte inválido'),
+    ({'destination_state': 'XX'}, 'UF inválida'),
+    ({'freight_usd': -1}, 'freight_usd'),
+    ({'origin_country': 123}, 'origin_country')
+])
+def test_api_validation_errors(app, user, shipments, fields, message):
+    response = app.test_client().post('/api/v1/shipments', json=_payload(**fields), headers=_headers(user))
+    assert response.status_code == 400
+    body = response.get_json()
+    assert body['success'] is False
+    assert message in body['error']
+    assert Shipment.query.filter_by(user_id=user.id).count() == 0
@@ -0,0 +1,64 @@
+"""Preço alvo de um cálculo (/api/preco-alvo/<id>)"""
+import pytest
+
+from app import db
+from models import Calculation
+
+
+@pytest.fixture
+def calculation(user):
+    record = Calculation(user_id=user.id, product_name='Smartphone', ncm_code='85171200', unit_value_usd=120.0,
+                         quantity=100, origin_country='CN', transport_mode='MARITIME', exchange_rate=5.0,
+                         total_cost_usd=12_000.0, total_cost_brl=60_000.0, total_taxes_brl=55_000.0,
+                         final_cost_brl=115_000.0)
+    db.session.add(record)
+    db.session.commit()
+    return record
+
+
+def test_target_price(client, calculation):
+    response = client.get(f'/api/preco-alvo/{calculation.id}?margem=20&roi=30&taxa_plataforma=12')
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    assert data['price_for_target_margin'] > data['break_even_price'] > 0
+    assert data['price_for_target_roi'] > data['break_even_price']
+
+
+@pytest.mark.parametrize('query', [
+    'margem=abc', 'margem=100', 'margem=nan', 'roi=-100', 'taxa_plataforma=-1', 'taxa_plataforma=101',
+    'armazenagem=-5'
+])
+def test_invalid_parameters(client, calculation, query):
+    response = client.get(f'/api/preco-alvo/{calculation.id}?{query}')
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def test_batch_pricing_uses_each_destination_state(app, user, calculation):
+    from routes import tax_calculator
+
+    other = Calculation(user_id=user.id, product_name='Smartphone RJ', ncm_code='85171200', unit_value_usd=120.0,
+                        quantity=100, origin_country='CN', transport_mode='MARITIME', exchange_rate=5.0,
+                        destination_state='RJ', total_cost_usd=12_000.0, total_cost_brl=60_000.0,
+                        total_taxes_brl=55_000.0, final_cost_brl=115_000.0)
+    db.session.add(other)
+    db.session.commit()
+    additional_costs = {'storage': 500.0, 'platform_fees_rate': 10.0}
+    response = app.test_client().post('/api/v1/pricing', json={
+        'calculation_ids': [other.id, calculation.id], 'total_costs_brl': [50_000], 'destination_state': 'rj',
+        'target_net_margin': 15, 'additional_costs': additional_costs
+    }, headers={'Authorization': f'Bearer {user.generate_api_token()}'})
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    assert [item.get('calculation_id') for item in data] == [other.id, calculation.id, None]
+
+    rj_rate = tax_calculator.get_sale_icms_rate('85171200', 'RJ')
+    expected = [
+        tax_calculator.solve_selling_price(115_000.0, additional_costs, 15, sale_icms_rate=rj_rate),
+        tax_calculator.solve_selling_price(115_000.0, additional_costs, 15),
+        tax_calculator.solve_selling_price(50_000.0, additional_costs, 15,
+                                           sale_icms_rate=tax_calculator.get_sale_icms_rate(None, 'RJ'))
+    ]
+    for item, wanted in zip(data, expected):
+        assert item['price_for_target_margin'] == pytest.approx(wanted['price_for_target_margin'])
+    assert data[0]['price_for_target_margin'] > data[1]['price_for_target_margin']
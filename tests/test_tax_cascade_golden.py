@@ -0,0 +1,140 @@
+"""
+Paridade da cascata de impostos entre Python e JavaScript
+
+Os casos de tests/golden/tax_cascade.json foram gerados por
+BrazilianTaxCalculator.calculate_all_taxes; os dois lados devem reproduzi-los
+exatamente (mesma ordem de operações, mesmos valores de ponto flutuante).
+Casos com rate_versions simulam versões do RateStore, casos com
+origin_country e trade_preference_margin, a preferência tarifária da origem, e
+casos com ex, regime e benefit_overrides, os benefícios fiscais da operação
+(com preferência e benefício do II, vale a menor das duas alíquotas):
+o Python deve resolver as alíquotas de resolved_rates (as servidas por
+/api/aliquotas) e o JavaScript calcula a partir delas. Qualquer mudança de alíquota ou fórmula
+exige regenerar o arquivo e incrementar TAX_SPEC_VERSION.
+"""
+import json
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from services.icms_matrix import IcmsMatrix
+from services.tax_calculator import BenefitContext, BrazilianTaxCalculator
+from services.tax_spec import TAX_SPEC
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+GOLDEN_FILE = os.path.join(TESTS_DIR, 'golden', 'tax_cascade.json')
+NODE_CHECK = os.path.join(TESTS_DIR, 'js', 'check_tax_cascade.js')
+
+with open(GOLDEN_FILE, encoding='utf-8') as golden_file:
+    GOLDEN = json.load(golden_file)
+CASES = GOLDEN['cases']
+
+
+class FixedRateStore:
+    """Versões do RateStore fixas, vigentes em qualquer data"""
+    version = 'golden'
+
+    def __init__(self, rates):
+        self.rates = rates
+
+    def get_rates(self, ncm_code, as_of):
+        return dict(self.rates)
+
+
+class FixedTradeAgreements:
+    """Preferência tarifária fixa para qualquer país de origem e NCM"""
+    version = 'golden'
+
+    def __init__(self, margin):
+        self.margin = margin
+
+    def lookup(self, country_code, ncm_code, as_of=None):
+        margin = self.margin
+        return type('Preference', (), {'to_dict': lambda self: {'country_code': country_code, 'margin': margin}})()
+
+
+class FixedBenefitEngine:
+    """Benefícios fixos, aplicados só à operação com o ex-tarifário e o regime do caso"""
+    version = 'golden'
+
+    def __init__(self, overrides, ex, regime):
+        self.rates = overrides
+        self.ex = ex
+        self.regime = regime
+
+    def overrides(self, ncm_code, context=None, as_of=None):
+        if context is None or (context.ex, context.regime) != (self.ex, self.regime):
+            return {}
+        return dict(self.rates)
+
+    def applicable(self, ncm_code, context=None, as_of=None):
+        return [{'tax_type': tax_type, 'rate': rate}
+                for tax_type, rate in self.overrides(ncm_code, context, as_of).items()]
+
+
+def _calculator(case):
+    data = case['input']
+    versions = data.get('rate_versions')
+    margin = data.get('trade_preference_margin')
+    overrides = data.get('benefit_overrides')
+    return BrazilianTaxCalculator(
+        rate_store=FixedRateStore(versions) if versions else None,
+        benefit_engine=FixedBenefitEngine(overrides, data.get('ex'), data.get('regime')) if overrides else None,
+        trade_agreements=FixedTradeAgreements(margin) if margin is not None else None
+    )
+
+
+def _context(case):
+    data = case['input']
+    return BenefitContext.build(data.get('origin_country'), data.get('ex'), data.get('regime'))
+
+
+def test_golden_file_matches_spec_version():
+    assert GOLDEN['spec_version'] == TAX_SPEC['version']
+
+
+@pytest.mark.parametrize('case', CASES, ids=[case['name'] for case in CASES])
+def test_calculate_all_taxes(case):
+    data = case['input']
+    result = _calculator(case).calculate_all_taxes(
+        data['unit_value_usd'], data['quantity'], data['ncm_code'], data['freight_usd'],
+        data['insurance_usd'], data['exchange_rate'], destination_state=data['destination_state'],
+        context=_context(case)
+    )
+    actual = {
+        'cif_brl': result['customs_values']['cif_brl'],
+        **{tax: result['taxes'][tax]['amount'] for tax in ('II', 'IPI', 'PIS', 'COFINS', 'ICMS')},
+        'total_taxes': result['summary']['total_taxes'],
+        'total_cost': result['summary']['total_cost']
+    }
+    assert actual == case['expected']
+
+
+@pytest.mark.parametrize('case', [case for case in CASES if 'resolved_rates' in case],
+                         ids=[case['name'] for case in CASES if 'resolved_rates' in case])
+def test_resolved_rates(case):
+    data = case['input']
+    rates = _calculator(case).get_tax_rates(data['ncm_code'], state=data['destination_state'], context=_context(case))
+    assert rates == case['resolved_rates']
+
+
+@pytest.mark.parametrize('case', CASES, ids=[case['name'] for case in CASES])
+def test_calculate_taxes_batch(case):
+    data = case['input']
+    columns = _calculator(case).calculate_taxes_batch(
+        *([data[field]] for field in (
+            'unit_value_usd', 'quantity', 'ncm_code', 'freight_usd', 'insurance_usd', 'exchange_rate')),
+        states=[data['destination_state']],
+        contexts=[_context(case)]
+    )
+    assert {column: columns[column][0] for column in case['expected']} == case['expected']
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='node não instalado')
+def test_tax_cascade_js():
+    payload = {'spec': TAX_SPEC, 'icms_matrix': IcmsMatrix().to_dict(), 'cases': CASES}
+    result = subprocess.run(['node', NODE_CHECK], input=json.dumps(payload),
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
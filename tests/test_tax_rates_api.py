@@ -0,0 +1,45 @@
+"""Alíquotas resolvidas para a prévia de cálculo (/api/aliquotas/<ncm>)"""
+from datetime import date
+
+import pytest
+
+from app import db
+from models import SystemConfig, TaxRateVersion
+from routes import rate_store, tax_calculator
+
+
+@pytest.fixture
+def clean_rates(app_context):
+    yield
+    TaxRateVersion.query.delete()
+    SystemConfig.query.filter_by(key=rate_store.VERSION_KEY).delete()
+    db.session.commit()
+    rate_store._index = None
+
+
+def test_rates_match_calculator(client):
+    response = client.get('/api/aliquotas/85171200?uf=sp')
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    assert data['destination_state'] == 'SP'
+    assert data['rates'] == tax_calculator.get_tax_rates('85171200', date.today(), 'SP')
+    assert 'ICMS_FACTOR' in data['rates']
+
+
+@pytest.mark.parametrize('path', ['/api/aliquotas/8517', '/api/aliquotas/85171200?uf=XX'])
+def test_invalid_request(client, path):
+    response = client.get(path)
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def test_rate_versions_change_etag_and_rates(client, clean_rates):
+    first = client.get('/api/aliquotas/85171200')
+    etag = first.headers['ETag']
+    assert client.get('/api/aliquotas/85171200', headers={'If-None-Match': etag}).status_code == 304
+
+    rate_store.add_versions('II', {'85171200': 0.2}, date(2020, 1, 1), source='teste')
+    second = client.get('/api/aliquotas/85171200', headers={'If-None-Match': etag})
+    assert second.status_code == 200
+    assert second.headers['ETag'] != etag
+    assert second.get_json()['data']['rates']['II'] == 0.2
@@ -1,7 +1,7 @@
-import trafilatura
+import hashlib
 import requests
 import logging
-from typing import Dict, List
+from typing import Dict, List, Optional
 from urllib.parse import urljoin
 import time
 
@@ -15,6 +15,9 @@ def get_website_text_content(url: str) -> str:
     Some common website to crawl information from:
     MLB scores: https://www.mlb.com/scores/YYYY-MM-DD
     """
+    # Importado sob demanda: trafilatura (e lxml) custam ~90 ms de import
+    import trafilatura
+
     # Send a request to the website
     downloaded = trafilatura.fetch_url(url)
     text = trafilatura.extract(downloaded)
@@ -32,6 +35,30 @@ class NCMScraper:
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
     
+    def crawl_ncm_pages(self, codes: List[str], url_template: str, cache_dir: str,
+                        max_workers: int = 8, requests_per_second: float = 2.0,
+                        restart: bool = False) -> Dict[str, Optional[str]]:
+        """
+        Coleta as páginas de detalhe dos códigos (url_template com {code}) em
+        paralelo e retorna o texto principal de cada uma (None se falhou).
+        A coleta retoma do checkpoint anterior, a menos que restart=True.
+        """
+        from services.ncm_crawler import NcmCrawler
+
+        crawler = NcmCrawler(cache_dir, max_workers=max_workers, requests_per_second=requests_per_second,
+                             user_agent=self.session.headers['User-Agent'])
+        checkpoint = 'ncm-' + hashlib.sha1(url_template.encode('utf-8')).hexdigest()[:10]
+        if restart:
+            crawler.reset_checkpoint(checkpoint)
+        urls = {url_template.format(code=code): code for code in codes}
+        results = crawler.crawl(urls, checkpoint=checkpoint, parse=self._extract_text)
+        return {urls[result.url]: result.data for result in results}
+
+    @staticmethod
+    def _extract_text(url: str, body: bytes) -> Optional[str]:
+        import trafilatura
+        return trafilatura.extract(body, url=url)
+
     def get_expanded_ncm_database(self) -> Dict[str, Dict]:
         """
         Retorna base massivamente expandida de códigos NCM com foco em eletrônicos, químicos, farmacêuticos e domésticos